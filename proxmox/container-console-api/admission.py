@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Global execution slots, per-container/per-client rate limits and backpressure
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterable, Iterator, Optional
+
+# Idle buckets are dropped once this many are tracked
+MAX_TRACKED_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused to protect the host
+
+    ``retry_after`` is the number of seconds after which a retry is likely to
+    be admitted, suitable for a ``Retry-After`` header.
+    """
+
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens/second"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = max(now - self.updated, 0.0)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = max(now, self.updated)
+
+    def wait_time(self, cost: float) -> float:
+        """Seconds until ``cost`` tokens are available (0 if they are now)"""
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Decides whether, and when, a command may spawn a ``pct exec`` process
+
+    * At most ``max_concurrent`` commands run at once, host-wide.
+    * Interactive callers wait up to ``max_wait`` seconds for a slot, and at
+      most ``max_waiting`` of them may wait; beyond that they are rejected.
+      Background work (jobs, deployments, batches) is already bounded by its
+      own worker pool and waits for a slot without a deadline.
+    * Token buckets limit the request rate per client and the command rate
+      per container.
+
+    A rate of 0 disables the corresponding bucket.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_waiting: int = 64,
+        max_wait: float = 10.0,
+        container_rate: float = 5.0,
+        container_burst: float = 20.0,
+        client_rate: float = 10.0,
+        client_burst: float = 40.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.container_rate = container_rate
+        self.container_burst = container_burst
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._running = 0
+        self._waiting = 0
+        # Waiters with a deadline; only these count against max_waiting
+        self._waiting_bounded = 0
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._average_hold = 1.0
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Create a controller from CONTAINER_CONSOLE_* admission variables"""
+        return cls(
+            max_concurrent=int(os.getenv("CONTAINER_CONSOLE_MAX_CONCURRENT", "32")),
+            max_waiting=int(os.getenv("CONTAINER_CONSOLE_MAX_WAITING", "64")),
+            max_wait=float(os.getenv("CONTAINER_CONSOLE_MAX_WAIT", "10")),
+            container_rate=float(os.getenv("CONTAINER_CONSOLE_CONTAINER_RATE", "5")),
+            container_burst=float(os.getenv("CONTAINER_CONSOLE_CONTAINER_BURST", "20")),
+            client_rate=float(os.getenv("CONTAINER_CONSOLE_CLIENT_RATE", "10")),
+            client_burst=float(os.getenv("CONTAINER_CONSOLE_CLIENT_BURST", "40")),
+        )
+
+    @property
+    def running(self) -> int:
+        """Commands holding an execution slot"""
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        """Commands waiting for an execution slot"""
+        return self._waiting
+
+    @property
+    def saturated(self) -> bool:
+        """True when an interactive request would be rejected right now"""
+        return (
+            self._running >= self.max_concurrent
+            and self._waiting_bounded >= self.max_waiting
+        )
+
+    # Rate limits -------------------------------------------------------
+
+    def _bucket(self, key: Hashable, rate: float, burst: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_BUCKETS:
+                now = time.monotonic()
+                for stale_key, stale in list(self._buckets.items()):
+                    stale.refill(now)
+                    if stale.tokens >= stale.burst:
+                        del self._buckets[stale_key]
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def check_rate(
+        self,
+        client: Optional[str] = None,
+        container_ids: Iterable[int] = (),
+    ) -> None:
+        """Charge one request to the client and one command per container ID
+
+        Either every bucket is charged or none is; raises AdmissionRejected
+        with the time until all of them could be charged.
+        """
+        container_ids = list(container_ids)
+        costs: Dict[Hashable, float] = {}
+        if client and self.client_rate > 0:
+            costs[("client", client)] = 1
+        if self.container_rate > 0:
+            for container_id in container_ids:
+                key = ("container", container_id)
+                costs[key] = costs.get(key, 0) + 1
+
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            wait = 0.0
+            for key, cost in costs.items():
+                if key[0] == "client":
+                    bucket = self._bucket(key, self.client_rate, self.client_burst)
+                else:
+                    bucket = self._bucket(
+                        key, self.container_rate, self.container_burst
+                    )
+                bucket.refill(now)
+                buckets[key] = bucket
+                # A batch larger than the burst may run once the bucket is full
+                costs[key] = min(cost, bucket.burst)
+                wait = max(wait, bucket.wait_time(costs[key]))
+            if wait > 0:
+                limited = [key for key, b in buckets.items() if b.wait_time(costs[key])]
+                kind, name = limited[0]
+                raise AdmissionRejected(
+                    f"Rate limit exceeded for {kind} {name}", wait, f"{kind}_rate"
+                )
+            for key, bucket in buckets.items():
+                bucket.tokens -= costs[key]
+
+    # Execution slots ---------------------------------------------------
+
+    @contextmanager
+    def slot(self, max_wait: Optional[float] = None) -> Iterator[None]:
+        """Hold one of the global execution slots
+
+        With ``max_wait`` the caller joins the bounded wait queue and is
+        rejected if it is full or no slot frees up in time. Without it the
+        caller waits as long as needed.
+        """
+        with self._lock:
+            if self._running >= self.max_concurrent:
+                bounded = max_wait is not None
+                if bounded and self._waiting_bounded >= self.max_waiting:
+                    raise AdmissionRejected(
+                        "Too many commands waiting to run",
+                        self._retry_after_locked(),
+                        "queue_full",
+                    )
+                self._waiting += 1
+                self._waiting_bounded += bounded
+                try:
+                    admitted = self._slot_freed.wait_for(
+                        lambda: self._running < self.max_concurrent, max_wait
+                    )
+                finally:
+                    self._waiting -= 1
+                    self._waiting_bounded -= bounded
+                if not admitted:
+                    raise AdmissionRejected(
+                        f"No execution slot became free within {max_wait:g}s",
+                        self._retry_after_locked(),
+                        "wait_timeout",
+                    )
+            self._running += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - started
+            with self._lock:
+                self._running -= 1
+                self._average_hold += 0.1 * (held - self._average_hold)
+                self._slot_freed.notify()
+
+    def _retry_after_locked(self) -> float:
+        # Time for the slots to work through everyone already waiting
+        return self._average_hold * (self._waiting + 1) / self.max_concurrent
+
+    def stats(self) -> Dict[str, float]:
+        """Current slot usage"""
+        return {
+            "running": self._running,
+            "waiting": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "average_hold_seconds": round(self._average_hold, 3),
+        }
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Artifact Cache
+Host-side cache of apt packages, the Docker install and Docker images,
+restored into containers instead of downloading them again
+"""
+
+import json
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from file_transfer import file_sha256
+
+if TYPE_CHECKING:
+    from container_console_service import CommandResult, ContainerConsoleManager
+
+APT = "apt"
+DOCKER = "docker"
+IMAGE = "image"
+KINDS = (APT, DOCKER, IMAGE)
+
+TRANSFER_TIMEOUT = 1800
+
+# Packages get.docker.com installs from Docker's apt repository
+DOCKER_PACKAGES = (
+    "docker-ce",
+    "docker-ce-cli",
+    "containerd.io",
+    "docker-buildx-plugin",
+    "docker-compose-plugin",
+)
+
+# Keep what apt downloads so a deployed container can seed the cache
+KEEP_DEBS_CONF = "/etc/apt/apt.conf.d/90container-console-keep-debs"
+KEEP_DEBS = (
+    'APT::Keep-Downloaded-Packages "true";\n'
+    'Binary::apt::APT::Keep-Downloaded-Packages "true";\n'
+)
+
+# Docker's repository, keyring, lists and packages, relative to /
+DOCKER_FILES = (
+    "etc/apt/sources.list.d/docker.* etc/apt/keyrings/docker.* "
+    "var/lib/apt/lists/*docker* var/cache/apt/archives/*docker*.deb "
+    "var/cache/apt/archives/containerd.io_*.deb"
+)
+
+# Reported when a container has nothing worth harvesting
+NOTHING_TO_HARVEST = 3
+
+# Progress lines for the deployment job
+EmitCallback = Callable[[str], None]
+
+
+class ArtifactError(Exception):
+    """Raised when an artifact cannot be restored or harvested"""
+
+    pass
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value)
+
+
+class ArtifactCache:
+    """Deployment artifacts kept on the Proxmox host and pushed into containers
+
+    Three kinds of artifact are cached, each as a tarball with a JSON record:
+
+    - ``apt``: downloaded ``.deb`` files and package lists, keyed by the
+      container's OS release and architecture (e.g. ``debian-12-amd64``)
+    - ``docker``: Docker's apt repository, keyring and packages, keyed the
+      same way, so Docker installs with apt instead of get.docker.com
+    - ``image``: ``docker save`` output, keyed by image digest
+
+    Nothing is fetched by the host itself. The first container deployed
+    without a cached artifact downloads as usual, and :meth:`harvest` then
+    copies what it downloaded back to the host. :meth:`stage` restores the
+    cached artifacts into later containers before their deployment runs;
+    with ``offline`` set they also skip ``apt update``. An image reference
+    keeps resolving to the copy cached first until that copy is removed.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        directory: str,
+        container_dir: str = "/var/cache/container-console/artifacts",
+        offline: bool = False,
+    ):
+        self.manager = manager
+        self.directory = directory
+        self.container_dir = container_dir.rstrip("/")
+        self.offline = offline
+        self._lock = threading.Lock()
+        # (kind, key) -> record
+        self._artifacts: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._harvesting: Set[Tuple[str, str]] = set()
+        for kind in KINDS:
+            os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        self._load()
+
+    @classmethod
+    def from_env(cls, manager: "ContainerConsoleManager") -> Optional["ArtifactCache"]:
+        """A cache if CONTAINER_CONSOLE_ARTIFACT_CACHE is enabled"""
+        if os.getenv("CONTAINER_CONSOLE_ARTIFACT_CACHE", "0").lower() in (
+            "0",
+            "false",
+            "no",
+        ):
+            return None
+        directory = os.getenv(
+            "CONTAINER_CONSOLE_ARTIFACT_DIR", "/var/cache/container-console/artifacts"
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            directory = os.path.join(
+                tempfile.gettempdir(), "container-console-artifacts"
+            )
+            print(f"⚠️  Artifact directory unavailable ({e}), using {directory}")
+        return cls(
+            manager,
+            directory,
+            offline=os.getenv("CONTAINER_CONSOLE_ARTIFACT_OFFLINE", "0").lower()
+            not in ("0", "false", "no"),
+        )
+
+    def _load(self) -> None:
+        for kind in KINDS:
+            kind_dir = os.path.join(self.directory, kind)
+            for name in os.listdir(kind_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(kind_dir, name)) as f:
+                        record = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Skipping unreadable artifact record {name}: {e}")
+                    continue
+                if os.path.exists(self._host_path(kind, record["key"])):
+                    self._artifacts[(kind, record["key"])] = record
+
+    def _host_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.tar")
+
+    def image_path(self, image: str) -> str:
+        """Where a cached image tarball is placed inside containers"""
+        return f"{self.container_dir}/images/{_slug(image)}.tar"
+
+    def _marker(self, record: Dict[str, Any]) -> str:
+        # Restoring a rebuilt artifact must not be skipped, so key by content
+        return f"{record['kind']}-{record['sha256'][:16]}.restored"
+
+    # Queries -----------------------------------------------------------
+
+    def get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._artifacts.get((kind, key))
+            return dict(record) if record else None
+
+    def find_image(self, image: str) -> Optional[Dict[str, Any]]:
+        """The newest cached copy of an image reference"""
+        with self._lock:
+            records = [
+                record
+                for (kind, _), record in self._artifacts.items()
+                if kind == IMAGE and record.get("image") == image
+            ]
+        if not records:
+            return None
+        return dict(max(records, key=lambda record: record["created_at"]))
+
+    def list_artifacts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(record) for record in self._artifacts.values()]
+
+    def remove(self, kind: str, key: str) -> bool:
+        """Delete an artifact so the next deployment harvests a fresh one"""
+        with self._lock:
+            record = self._artifacts.pop((kind, key), None)
+        if record is None:
+            return False
+        for path in (
+            self._host_path(kind, key),
+            os.path.join(self.directory, kind, f"{key}.json"),
+        ):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        print(f"🗑️  Removed cached {kind} artifact {key}")
+        return True
+
+    # Container side ----------------------------------------------------
+
+    def _run(self, container_id: int, command: str) -> "CommandResult":
+        return self.manager.execute_command(
+            container_id, command, timeout=TRANSFER_TIMEOUT
+        )
+
+    def _check(self, result: "CommandResult", action: str) -> "CommandResult":
+        if result.exit_code != 0:
+            raise ArtifactError(
+                f"{action} failed: {(result.error or result.output).strip()}"
+            )
+        return result
+
+    def _pct(self, *args: str) -> None:
+        with self.manager.command_slot():
+            try:
+                result = subprocess.run(
+                    ["pct", *args],
+                    capture_output=True,
+                    text=True,
+                    timeout=TRANSFER_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                raise ArtifactError(
+                    f"pct {args[0]} timed out after {TRANSFER_TIMEOUT}s"
+                )
+        if result.returncode != 0:
+            raise ArtifactError(f"pct {args[0]} failed: {result.stderr.strip()}")
+
+    def container_key(self, container_id: int) -> str:
+        """Cache key for the apt and Docker artifacts of a container"""
+        # Plain reads rather than one shell snippet, so they pass as read-only
+        release = self._check(
+            self.manager.execute_command(
+                container_id, "cat /etc/os-release", timeout=30, read_only=True
+            ),
+            "Reading the OS release",
+        )
+        architecture = self._check(
+            self.manager.execute_command(
+                container_id, "dpkg --print-architecture", timeout=30, read_only=True
+            ),
+            "Reading the architecture",
+        )
+        fields = dict(
+            line.split("=", 1) for line in release.output.splitlines() if "=" in line
+        )
+        os_id, version_id = (
+            fields.get(name, "").strip().strip("\"'") for name in ("ID", "VERSION_ID")
+        )
+        return _slug(f"{os_id}-{version_id}-{architecture.output.strip()}")
+
+    def stage(
+        self,
+        container_id: int,
+        images: Sequence[str] = (),
+        emit: Optional[EmitCallback] = None,
+    ) -> Dict[str, Any]:
+        """Restore the cached artifacts for a container before it is deployed
+
+        apt and Docker artifacts are unpacked into place; image tarballs are
+        left at :meth:`image_path` for the deployment to ``docker load``.
+        Artifacts already restored into the container are not pushed again.
+        Returns the key and the artifacts restored.
+        """
+        emit = emit or (lambda line: None)
+        container_dir = shlex.quote(self.container_dir)
+        prepared = self._check(
+            self._run(
+                container_id,
+                f"mkdir -p {container_dir}/images && "
+                f"printf %s {shlex.quote(KEEP_DEBS)} > {KEEP_DEBS_CONF} && "
+                + (
+                    f"touch {container_dir}/offline && "
+                    if self.offline
+                    else f"rm -f {container_dir}/offline && "
+                )
+                + f"ls {container_dir}",
+            ),
+            "Preparing the artifact directory",
+        )
+        present = set(prepared.output.split())
+        key = self.container_key(container_id)
+
+        candidates = [self.get(APT, key), self.get(DOCKER, key)]
+        candidates += [self.find_image(image) for image in images]
+        restored = []
+        for record in candidates:
+            if record is None:
+                continue
+            marker = f"{self.container_dir}/{self._marker(record)}"
+            if self._marker(record) in present:
+                continue
+            if record["kind"] == IMAGE:
+                target = self.image_path(record["image"])
+            else:
+                target = f"{self.container_dir}/{record['kind']}.tar"
+            emit(
+                f"Restoring {record['kind']} artifact {record['key']} "
+                f"({record['size'] / 1024 / 1024:.0f} MiB)"
+            )
+            self._pct(
+                "push",
+                str(container_id),
+                self._host_path(record["kind"], record["key"]),
+                target,
+            )
+            unpack = (
+                ""
+                if record["kind"] == IMAGE
+                else f"tar -xf {shlex.quote(target)} -C / && "
+                f"rm -f {shlex.quote(target)} && "
+            )
+            self._check(
+                self._run(
+                    container_id,
+                    f"echo {shlex.quote(record['sha256'] + '  ' + target)} | "
+                    f"sha256sum -c --status && {unpack}touch {shlex.quote(marker)}",
+                ),
+                f"Restoring {record['kind']} artifact {record['key']}",
+            )
+            restored.append(f"{record['kind']}/{record['key']}")
+        if not restored:
+            emit(f"No cached artifacts to restore for {key}")
+        return {"key": key, "restored": restored, "offline": self.offline}
+
+    def harvest(
+        self,
+        container_id: int,
+        images: Sequence[str] = (),
+        emit: Optional[EmitCallback] = None,
+    ) -> List[str]:
+        """Copy artifacts the host does not have yet out of a deployed container
+
+        Returns the artifacts added to the cache.
+        """
+        emit = emit or (lambda line: None)
+        key = self.container_key(container_id)
+        harvested = []
+        archives = "/var/cache/apt/archives"
+        for kind, command in (
+            (
+                APT,
+                f"ls {archives}/*.deb >/dev/null 2>&1 || exit {NOTHING_TO_HARVEST}; "
+                "tar -cf {target} -C / --exclude='*/partial' --exclude='*/lock' "
+                "--exclude='*docker*' --exclude='containerd.io_*' "
+                "var/cache/apt/archives var/lib/apt/lists",
+            ),
+            (
+                DOCKER,
+                f"ls {archives}/docker-ce_*.deb >/dev/null 2>&1 "
+                f"|| exit {NOTHING_TO_HARVEST}; "
+                f"cd / && tar -cf {{target}} $(ls -d {DOCKER_FILES} 2>/dev/null)",
+            ),
+        ):
+            if self.get(kind, key) is None:
+                record = self._harvest(container_id, kind, key, command)
+                if record is not None:
+                    harvested.append(f"{kind}/{key}")
+
+        for image in images:
+            if self.find_image(image) is not None:
+                # Pinned until removed; a loaded copy would not keep its digest
+                continue
+            result = self.manager.execute_command(
+                container_id,
+                "docker image inspect --format "
+                "'{{if .RepoDigests}}{{index .RepoDigests 0}}{{else}}{{.Id}}{{end}}' "
+                + shlex.quote(image),
+                timeout=30,
+                read_only=True,
+            )
+            digest = result.output.strip().rsplit("@", 1)[-1]
+            if result.exit_code != 0 or not digest.startswith("sha256:"):
+                continue
+            digest_key = digest.split(":", 1)[1]
+            if self.get(IMAGE, digest_key) is None:
+                record = self._harvest(
+                    container_id,
+                    IMAGE,
+                    digest_key,
+                    f"docker save -o {{target}} {shlex.quote(image)}",
+                    image=image,
+                    digest=digest,
+                )
+                if record is not None:
+                    harvested.append(f"{IMAGE}/{digest_key}")
+
+        for artifact in harvested:
+            emit(f"Cached {artifact}")
+        return harvested
+
+    def _harvest(
+        self, container_id: int, kind: str, key: str, command: str, **extra: Any
+    ) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if (kind, key) in self._harvesting:
+                # Another deployment is already copying the same artifact
+                return None
+            self._harvesting.add((kind, key))
+        target = f"{self.container_dir}/harvest-{kind}-{key}.tar"
+        host_path = self._host_path(kind, key)
+        try:
+            result = self._run(
+                container_id,
+                f"mkdir -p {shlex.quote(self.container_dir)} && "
+                + command.format(target=shlex.quote(target)),
+            )
+            if result.exit_code == NOTHING_TO_HARVEST:
+                return None
+            self._check(result, f"Packing {kind} artifact {key}")
+            try:
+                self._pct("pull", str(container_id), target, f"{host_path}.tmp")
+            finally:
+                self._run(container_id, f"rm -f {shlex.quote(target)}")
+            record = {
+                "artifact_id": f"{kind}/{key}",
+                "kind": kind,
+                "key": key,
+                "sha256": file_sha256(f"{host_path}.tmp"),
+                "size": os.path.getsize(f"{host_path}.tmp"),
+                "source_container_id": container_id,
+                "created_at": datetime.now().isoformat(),
+                **extra,
+            }
+            os.replace(f"{host_path}.tmp", host_path)
+            record_path = os.path.join(self.directory, kind, f"{key}.json")
+            with open(f"{record_path}.tmp", "w") as f:
+                json.dump(record, f, indent=2)
+            os.replace(f"{record_path}.tmp", record_path)
+            with self._lock:
+                self._artifacts[(kind, key)] = record
+        finally:
+            with self._lock:
+                self._harvesting.discard((kind, key))
+            if os.path.exists(f"{host_path}.tmp"):
+                os.remove(f"{host_path}.tmp")
+        print(
+            f"📦 Cached {kind} artifact {key} from container {container_id} "
+            f"({record['size'] / 1024 / 1024:.0f} MiB)"
+        )
+        return record
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Async Container Client
+asyncio client for the container console API with pooled connections
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+import httpx
+
+from cursor_container_client import COMMAND_TIMEOUT_MARGIN, default_timeout
+
+T = TypeVar("T")
+
+
+class AsyncCursorContainerClient:
+    """Async counterpart of CursorContainerClient built on httpx.AsyncClient
+
+    All requests share one connection pool, so fanning out over many
+    containers reuses keep-alive connections instead of opening one per call.
+    ``concurrency`` bounds how many requests the gather helpers have in
+    flight; keep it at or below ``pool_size`` so requests do not queue for a
+    connection, and below the server's admission limits to avoid 429s.
+
+    Use as an async context manager, or call :meth:`aclose` when done::
+
+        async with AsyncCursorContainerClient() as client:
+            info = await client.info_for_all()
+    """
+
+    def __init__(
+        self,
+        api_base_url: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        pool_size: int = 20,
+        keepalive: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ):
+        if api_base_url is None:
+            api_base_url = os.getenv(
+                "CONTAINER_CONSOLE_API_URL", "http://localhost:5000"
+            )
+        default_connect, default_read = default_timeout()
+        self.api_base_url = api_base_url
+        self.connect_timeout = (
+            default_connect if connect_timeout is None else connect_timeout
+        )
+        self.read_timeout = default_read if read_timeout is None else read_timeout
+        self.concurrency = concurrency or pool_size
+        self.client = httpx.AsyncClient(
+            base_url=api_base_url,
+            timeout=httpx.Timeout(
+                self.read_timeout, connect=self.connect_timeout, pool=None
+            ),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size if keepalive is None else keepalive,
+            ),
+        )
+
+    async def __aenter__(self) -> "AsyncCursorContainerClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close all pooled connections"""
+        await self.client.aclose()
+
+    def _command_timeout(self, command_timeout: float) -> httpx.Timeout:
+        """Client timeout with the read part stretched to fit a command"""
+        read = max(self.read_timeout, command_timeout + COMMAND_TIMEOUT_MARGIN)
+        return httpx.Timeout(read, connect=self.connect_timeout, pool=None)
+
+    async def _get_json(self, path: str, **kwargs: Any) -> Dict[str, Any]:
+        response = await self.client.get(path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def _post_json(self, path: str, **kwargs: Any) -> Dict[str, Any]:
+        response = await self.client.post(path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    # Single requests -------------------------------------------------------
+
+    async def test_connection(self) -> bool:
+        """Test connection to the container console API"""
+        try:
+            data = await self._get_json("/health")
+            print(f"✅ Connected to Container Console API: {data['status']}")
+            return True
+        except httpx.TimeoutException as e:
+            print(f"❌ Timeout connecting to {self.api_base_url}: {e!r}")
+            return False
+        except Exception as e:
+            print(f"❌ API connection failed: {e}")
+            return False
+
+    async def list_containers(self) -> List[Dict[str, Any]]:
+        """List all available containers"""
+        try:
+            data = await self._get_json("/containers")
+            if data["success"]:
+                return data["containers"]
+            print(f"❌ Failed to list containers: {data.get('error', 'Unknown error')}")
+        except Exception as e:
+            print(f"❌ Error listing containers: {e}")
+        return []
+
+    async def get_container_info(self, container_id: int) -> Optional[Dict[str, Any]]:
+        """Get information about a specific container"""
+        try:
+            data = await self._get_json(f"/containers/{container_id}/info")
+            if data["success"]:
+                return data["container_info"]
+            print(
+                f"❌ Failed to get info for container {container_id}: "
+                f"{data.get('error', 'Unknown error')}"
+            )
+        except Exception as e:
+            print(f"❌ Error getting info for container {container_id}: {e}")
+        return None
+
+    async def test_container_access(self, container_id: int) -> bool:
+        """Test if a container is accessible"""
+        try:
+            data = await self._get_json(f"/containers/{container_id}/test")
+            if data["success"]:
+                return data["accessible"]
+            print(
+                f"❌ Failed to test access to container {container_id}: "
+                f"{data.get('error', 'Unknown error')}"
+            )
+        except Exception as e:
+            print(f"❌ Error testing access to container {container_id}: {e}")
+        return False
+
+    async def execute_command(
+        self,
+        container_id: int,
+        command: str,
+        timeout: int = 30,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Execute a command in a container and return its result"""
+        try:
+            headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+            data = await self._post_json(
+                f"/containers/{container_id}/execute",
+                json={"command": command, "timeout": timeout},
+                headers=headers,
+                timeout=self._command_timeout(timeout),
+            )
+            if data["success"]:
+                return data["result"]
+            print(
+                f"❌ Command failed in container {container_id}: "
+                f"{data.get('error', 'Unknown error')}"
+            )
+        except Exception as e:
+            print(f"❌ Error executing command in container {container_id}: {e}")
+        return None
+
+    async def execute_batch(
+        self, items: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Execute many ``{container_id, command, timeout}`` items in one request
+
+        The server runs the items concurrently; results are in input order.
+        """
+        try:
+            timeouts = [item.get("timeout", 30) for item in items]
+            data = await self._post_json(
+                "/execute/batch",
+                json={"items": items},
+                timeout=self._command_timeout(sum(timeouts)),
+            )
+            if data["success"]:
+                return data["results"]
+            print(f"❌ Batch failed: {data.get('error', 'Unknown error')}")
+        except Exception as e:
+            print(f"❌ Error executing batch: {e}")
+        return None
+
+    # Fan-out helpers -------------------------------------------------------
+
+    async def gather(
+        self,
+        container_ids: Iterable[int],
+        function: Callable[[int], Awaitable[T]],
+    ) -> Dict[int, T]:
+        """Call ``function(container_id)`` for every container concurrently
+
+        At most ``concurrency`` calls are in flight. Returns the results keyed
+        by container ID, in the order the IDs were given.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(container_id: int) -> T:
+            async with semaphore:
+                return await function(container_id)
+
+        container_ids = list(container_ids)
+        results = await asyncio.gather(*(limited(ct) for ct in container_ids))
+        return dict(zip(container_ids, results))
+
+    async def _resolve(self, container_ids: Optional[Iterable[int]]) -> List[int]:
+        if container_ids is not None:
+            return list(container_ids)
+        return [
+            int(container["id"])
+            for container in await self.list_containers()
+            if "error" not in container
+        ]
+
+    async def info_for_all(
+        self, container_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Container info for the given containers, or every listed container"""
+        return await self.gather(
+            await self._resolve(container_ids), self.get_container_info
+        )
+
+    async def test_access_for_all(
+        self, container_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, bool]:
+        """Access test for the given containers, or every listed container"""
+        return await self.gather(
+            await self._resolve(container_ids), self.test_container_access
+        )
+
+    async def execute_on_all(
+        self,
+        command: str,
+        container_ids: Optional[Iterable[int]] = None,
+        timeout: int = 30,
+    ) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Run the same command in several containers concurrently
+
+        Each container gets its own request, so one slow container does not
+        hold back the results of the others. Prefer :meth:`execute_batch` to
+        send everything in a single request instead.
+        """
+        return await self.gather(
+            await self._resolve(container_ids),
+            lambda container_id: self.execute_command(container_id, command, timeout),
+        )
+
+
+async def _main() -> None:
+    async with AsyncCursorContainerClient() as client:
+        if not await client.test_connection():
+            return
+        access = await client.test_access_for_all()
+        print(f"🔍 Checked {len(access)} container(s):")
+        for container_id, accessible in access.items():
+            status = "✅ Accessible" if accessible else "❌ Not accessible"
+            print(f"   - {container_id}: {status}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
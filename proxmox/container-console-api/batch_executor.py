@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Batch Executor
+Concurrent execution of many (container, command) pairs under a shared limit
+"""
+
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """One command of a batch"""
+
+    container_id: int
+    command: str
+    timeout: int = 30
+    read_only: bool = False
+    priority: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Any, default_timeout: int = 30) -> "BatchItem":
+        """Validate a request item, raising ValueError when it is malformed"""
+        if not isinstance(data, dict):
+            raise ValueError("Batch items must be objects")
+        if "container_id" not in data or not data.get("command"):
+            raise ValueError("Batch items require container_id and command")
+        try:
+            return cls(
+                container_id=int(data["container_id"]),
+                command=str(data["command"]),
+                timeout=int(data.get("timeout", default_timeout)),
+                read_only=bool(data.get("read_only", False)),
+                priority=int(data.get("priority", 0)),
+            )
+        except (TypeError, ValueError):
+            raise ValueError("container_id, timeout and priority must be integers")
+
+
+class BatchExecutor:
+    """Runs batches of commands on a thread pool shared by all requests
+
+    ``max_concurrency`` caps the number of batch commands running at once
+    across every batch, so one large request cannot spawn hundreds of
+    ``pct exec`` processes; excess items wait for a free worker.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        max_concurrency: int = 16,
+        max_items: int = 500,
+    ):
+        self.manager = manager
+        self.max_concurrency = max_concurrency
+        self.max_items = max_items
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="batch"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @classmethod
+    def from_env(cls, manager: "ContainerConsoleManager") -> "BatchExecutor":
+        """Create a batch executor from CONTAINER_CONSOLE_BATCH_* variables"""
+        return cls(
+            manager,
+            max_concurrency=int(os.getenv("CONTAINER_CONSOLE_BATCH_CONCURRENCY", "16")),
+            max_items=int(os.getenv("CONTAINER_CONSOLE_BATCH_MAX_ITEMS", "500")),
+        )
+
+    @property
+    def pending(self) -> int:
+        """Batch items waiting for a free worker"""
+        return self._pending
+
+    def _started(self, count: int = 1) -> None:
+        with self._lock:
+            self._pending -= count
+
+    def parse(self, items: Any, default_timeout: int = 30) -> List[BatchItem]:
+        """Validate the ``items`` of a batch request"""
+        if not isinstance(items, list) or not items:
+            raise ValueError("items must be a non-empty list")
+        if len(items) > self.max_items:
+            raise ValueError(f"Batch exceeds the limit of {self.max_items} items")
+        return [BatchItem.from_dict(item, default_timeout) for item in items]
+
+    def _execute(self, item: BatchItem) -> Dict[str, Any]:
+        self._started()
+        try:
+            result = self.manager.execute_command(
+                item.container_id,
+                item.command,
+                item.timeout,
+                read_only=item.read_only,
+                priority=item.priority,
+            )
+            return {"success": True, "result": result.to_dict()}
+        except Exception as e:
+            return {
+                "success": False,
+                "container_id": item.container_id,
+                "command": item.command,
+                "error": str(e),
+            }
+
+    def _submit(self, items: List[BatchItem]) -> Dict[Future, int]:
+        futures: Dict[Future, int] = {}
+        for index, item in enumerate(items):
+            with self._lock:
+                self._pending += 1
+            try:
+                futures[self._pool.submit(self._execute, item)] = index
+            except Exception:
+                # E.g. shut down while draining: drop what this batch queued
+                self._started(1 + sum(1 for future in futures if future.cancel()))
+                raise
+        return futures
+
+    @staticmethod
+    def _outcome(future: Future, item: BatchItem) -> Dict[str, Any]:
+        try:
+            return future.result()
+        except CancelledError:
+            # Dropped from the queue by shutdown before it started
+            return {
+                "success": False,
+                "container_id": item.container_id,
+                "command": item.command,
+                "error": "cancelled",
+            }
+
+    def run(self, items: List[BatchItem]) -> List[Dict[str, Any]]:
+        """Execute all items and return their results in input order"""
+        futures = self._submit(items)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        try:
+            for future, index in futures.items():
+                outcome = self._outcome(future, items[index])
+                results[index] = {"index": index, **outcome}
+        finally:
+            # Items cancelled by shutdown never ran to mark themselves started
+            self._started(sum(1 for future in futures if future.cancel()))
+        return results  # type: ignore[return-value]
+
+    def iter_completed(
+        self, items: List[BatchItem]
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield ``(index, result)`` pairs as items finish
+
+        Items that have not started are dropped if the consumer stops early,
+        e.g. because the client disconnected.
+        """
+        futures = self._submit(items)
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                yield index, self._outcome(future, items[index])
+        finally:
+            self._started(sum(1 for future in futures if future.cancel()))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting batches; queued items are dropped"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Benchmark Console API
+Load generator reporting throughput and latency percentiles of the API
+
+By default a private API server is started against ``fake_pct.py``, so the
+numbers measure the API itself and can be compared between commits::
+
+    python3 benchmark_console_api.py --concurrency 32 --duration 20
+    python3 benchmark_console_api.py --rate 200 --mix execute=1 --pct-latency 0.2
+    python3 benchmark_console_api.py --url http://proxmox:5000 --mix containers=1
+
+The JSON report goes to stdout (or ``--output``); progress goes to stderr.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from cursor_container_client import CursorContainerClient, RetryPolicy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ("containers", "info", "test", "execute")
+DEFAULT_MIX = "containers=1,info=1,test=1,execute=4"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    """Parse ``name=weight,...`` into a list of endpoint weights"""
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(
+                f"unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}"
+            )
+        mix.append((name, float(weight or 1)))
+    if not any(weight > 0 for _, weight in mix):
+        raise argparse.ArgumentTypeError("mix needs a positive weight")
+    return mix
+
+
+class FakeApiServer:
+    """API server subprocess whose ``pct`` is the fake_pct.py stand-in"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.directory = tempfile.mkdtemp(prefix="console-bench-")
+        self.port = self._free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process: Optional[subprocess.Popen] = None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start(self) -> None:
+        shim = os.path.join(self.directory, "pct")
+        with open(shim, "w") as f:
+            f.write(
+                f'#!/bin/sh\nexec "{sys.executable}" -S '
+                f'"{os.path.join(HERE, "fake_pct.py")}" "$@"\n'
+            )
+        os.chmod(shim, 0o755)
+
+        env = dict(os.environ)
+        env.update(
+            {
+                "PATH": f"{self.directory}{os.pathsep}{env.get('PATH', '')}",
+                "FAKE_PCT_CONTAINERS": str(self.args.containers),
+                "FAKE_PCT_LATENCY": str(self.args.pct_latency),
+                "FAKE_PCT_JITTER": str(self.args.pct_jitter),
+                "FAKE_PCT_OUTPUT_BYTES": str(self.args.pct_output_bytes),
+                "FAKE_PCT_ERROR_RATE": str(self.args.pct_error_rate),
+                "CONTAINER_CONSOLE_HISTORY_DB": "",
+                "CONTAINER_CONSOLE_STATE_DIR": os.path.join(self.directory, "state"),
+            }
+        )
+        if not self.args.rate_limits:
+            # All benchmark traffic comes from one client address
+            env.setdefault("CONTAINER_CONSOLE_CLIENT_RATE", "0")
+            env.setdefault("CONTAINER_CONSOLE_CONTAINER_RATE", "0")
+        if self.args.spawner is not None:
+            env["CONTAINER_CONSOLE_SPAWNER"] = self.args.spawner
+
+        log = open(os.path.join(self.directory, "server.log"), "wb")
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(HERE, "container_console_api.py"),
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--workers",
+                str(self.args.server_workers),
+                "--threads",
+                str(self.args.server_threads),
+            ],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        log.close()
+
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f"API server exited, see {self.directory}/server.log"
+                )
+            try:
+                if requests.get(f"{self.url}/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("API server did not become healthy within 30s")
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class LoadGenerator:
+    """Sends a weighted mix of requests from ``concurrency`` worker threads
+
+    With a ``rate`` the requests follow a fixed schedule (open loop) and
+    latency is measured from each request's scheduled start, so time spent
+    waiting behind a slow API counts against it. Without a rate every worker
+    sends its next request as soon as the previous one returns (closed loop).
+    """
+
+    def __init__(self, url: str, args: argparse.Namespace, container_ids: List[int]):
+        self.url = url
+        self.args = args
+        self.container_ids = container_ids
+        self.names = [name for name, _ in args.mix]
+        self.weights = [weight for _, weight in args.mix]
+        self._lock = threading.Lock()
+        self._sent = 0
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._statuses: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+
+    def _claim(self, started: float) -> Optional[float]:
+        """Return the scheduled start of the next request, or None when done"""
+        with self._lock:
+            index = self._sent
+            if self.args.requests and index >= self.args.requests:
+                return None
+            self._sent += 1
+        if self.args.rate:
+            scheduled = started + index / self.args.rate
+        else:
+            scheduled = time.perf_counter()
+        if not self.args.requests and scheduled - started >= self.args.duration:
+            return None
+        return scheduled
+
+    def _send(self, client: CursorContainerClient, name: str) -> str:
+        """Send one request and return its outcome (status code or error)"""
+        base = client.api_base_url
+        container_id = random.choice(self.container_ids)
+        try:
+            if name == "containers":
+                response = client.session.get(f"{base}/containers")
+            elif name == "info":
+                response = client.session.get(f"{base}/containers/{container_id}/info")
+            elif name == "test":
+                response = client.session.get(f"{base}/containers/{container_id}/test")
+            else:
+                response = client.session.post(
+                    f"{base}/containers/{container_id}/execute",
+                    json={
+                        "command": self.args.command,
+                        "timeout": self.args.exec_timeout,
+                    },
+                )
+            # Include the time to download the body
+            response.content
+            if response.ok and name == "execute":
+                # A command that failed is an error even though the request worked
+                if response.json()["result"]["exit_code"] != 0:
+                    return "exit_nonzero"
+            return str(response.status_code)
+        except requests.Timeout:
+            return "timeout"
+        except requests.RequestException as e:
+            return type(e).__name__
+
+    def _worker(self, started: float) -> None:
+        client = CursorContainerClient(
+            self.url,
+            timeout=(5, self.args.exec_timeout + 30),
+            retry_policy=RetryPolicy(attempts=self.args.retries + 1),
+        )
+        while True:
+            scheduled = self._claim(started)
+            if scheduled is None:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = random.choices(self.names, self.weights)[0]
+            outcome = self._send(client, name)
+            latency = time.perf_counter() - scheduled
+            with self._lock:
+                self._latencies[name].append(latency)
+                self._statuses[name][outcome] += 1
+        client.session.close()
+
+    def run(self) -> Dict[str, object]:
+        started = time.perf_counter()
+        workers = [
+            threading.Thread(target=self._worker, args=(started,), daemon=True)
+            for _ in range(self.args.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        return self._report(elapsed)
+
+    @staticmethod
+    def _summary(
+        latencies: List[float], statuses: Dict[str, int], elapsed: float
+    ) -> Dict[str, object]:
+        latencies = sorted(latencies)
+        total = len(latencies)
+        errors = sum(
+            count for outcome, count in statuses.items() if not outcome.startswith("2")
+        )
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "outcomes": dict(sorted(statuses.items())),
+            "latency_ms": {
+                "mean": round(1000 * sum(latencies) / total, 2) if total else 0.0,
+                "p50": round(1000 * percentile(latencies, 0.50), 2),
+                "p95": round(1000 * percentile(latencies, 0.95), 2),
+                "p99": round(1000 * percentile(latencies, 0.99), 2),
+                "max": round(1000 * latencies[-1], 2) if latencies else 0.0,
+            },
+        }
+
+    def _report(self, elapsed: float) -> Dict[str, object]:
+        all_latencies: List[float] = []
+        all_statuses: Dict[str, int] = defaultdict(int)
+        endpoints = {}
+        for name in self.names:
+            for outcome, count in self._statuses[name].items():
+                all_statuses[outcome] += count
+            all_latencies.extend(self._latencies[name])
+            endpoints[name] = self._summary(
+                self._latencies[name], self._statuses[name], elapsed
+            )
+        return {
+            "duration_s": round(elapsed, 3),
+            **self._summary(all_latencies, all_statuses, elapsed),
+            "endpoints": endpoints,
+        }
+
+
+def main():
+    """Run the benchmark and print the JSON report"""
+    parser = argparse.ArgumentParser(description="Container Console API benchmark")
+    parser.add_argument("--url", help="Benchmark a running API instead of a fake one")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Requests per second (0: closed loop)"
+    )
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=0,
+        help="Stop after this many (overrides --duration)",
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix(DEFAULT_MIX),
+        help=f"Endpoint weights (default {DEFAULT_MIX})",
+    )
+    parser.add_argument("--command", default="echo benchmark")
+    parser.add_argument("--exec-timeout", type=int, default=30)
+    parser.add_argument(
+        "--container-ids", help="Comma-separated IDs (default: running containers)"
+    )
+    parser.add_argument("--retries", type=int, default=0, help="Client retries")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+
+    fake = parser.add_argument_group("fake API server (without --url)")
+    fake.add_argument("--containers", type=int, default=4)
+    fake.add_argument("--pct-latency", type=float, default=0.05)
+    fake.add_argument("--pct-jitter", type=float, default=0.2)
+    fake.add_argument("--pct-output-bytes", type=int, default=256)
+    fake.add_argument("--pct-error-rate", type=float, default=0.0)
+    fake.add_argument("--server-workers", type=int, default=1)
+    fake.add_argument("--server-threads", type=int, default=64)
+    fake.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="Keep the per-client/per-container rate limits enabled",
+    )
+    fake.add_argument(
+        "--spawner",
+        choices=("auto", "0", "1"),
+        help="Start pct through the spawner helper (CONTAINER_CONSOLE_SPAWNER)",
+    )
+    args = parser.parse_args()
+
+    server = None if args.url else FakeApiServer(args)
+    try:
+        if server is not None:
+            print(f"🚀 Starting fake API server on {server.url}", file=sys.stderr)
+            server.start()
+        url = args.url or server.url
+
+        if args.container_ids:
+            container_ids = [int(ct) for ct in args.container_ids.split(",")]
+        else:
+            containers = requests.get(f"{url}/containers", timeout=30).json()
+            container_ids = [
+                int(container["id"])
+                for container in containers["containers"]
+                if container.get("status") == "running"
+            ]
+        if not container_ids:
+            print("❌ No running containers to benchmark", file=sys.stderr)
+            sys.exit(1)
+
+        limit = f"{args.requests} requests" if args.requests else f"{args.duration}s"
+        pacing = f"{args.rate:g} req/s" if args.rate else "closed loop"
+        print(
+            f"⏱️  {limit} at concurrency {args.concurrency}, {pacing}, "
+            f"{len(container_ids)} container(s)",
+            file=sys.stderr,
+        )
+        report = LoadGenerator(url, args, container_ids).run()
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "config": {
+            "url": args.url or "fake",
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "mix": dict(args.mix),
+            "command": args.command,
+            "containers": len(container_ids),
+            **(
+                {}
+                if args.url
+                else {
+                    "pct_latency": args.pct_latency,
+                    "pct_jitter": args.pct_jitter,
+                    "pct_output_bytes": args.pct_output_bytes,
+                    "pct_error_rate": args.pct_error_rate,
+                    "server_workers": args.server_workers,
+                    "server_threads": args.server_threads,
+                }
+            ),
+        },
+        **report,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"📄 Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
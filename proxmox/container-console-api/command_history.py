@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Command History
+Persistent, queryable store of command results for the container console service
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+if TYPE_CHECKING:
+    from container_console_service import CommandResult
+
+# Outputs shorter than this are stored as-is; compressing them costs more than
+# it saves.
+MIN_COMPRESS_BYTES = 128
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    container_id INTEGER NOT NULL,
+    command TEXT NOT NULL,
+    exit_code INTEGER NOT NULL,
+    execution_time REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    codec TEXT NOT NULL,
+    output BLOB,
+    error BLOB,
+    stored_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_container_time
+    ON command_history (container_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_time ON command_history (timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_exit_code
+    ON command_history (exit_code, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_command ON command_history (command);
+"""
+
+# Resource usage columns, added to existing databases on open
+USAGE_COLUMNS = (
+    ("user_cpu_time", "REAL"),
+    ("system_cpu_time", "REAL"),
+    ("max_rss_kb", "INTEGER"),
+    ("block_input_ops", "INTEGER"),
+    ("block_output_ops", "INTEGER"),
+)
+
+
+class HistoryRecord:
+    """Compact in-memory copy of a command result"""
+
+    __slots__ = (
+        "container_id",
+        "command",
+        "output",
+        "error",
+        "exit_code",
+        "execution_time",
+        "timestamp",
+        "resource_usage",
+    )
+
+    def __init__(
+        self,
+        container_id: int,
+        command: str,
+        output: str,
+        error: str,
+        exit_code: int,
+        execution_time: float,
+        timestamp: float,
+        resource_usage: Optional[Dict[str, Any]] = None,
+    ):
+        self.container_id = container_id
+        self.command = command
+        self.output = output
+        self.error = error
+        self.exit_code = exit_code
+        self.execution_time = execution_time
+        self.timestamp = timestamp
+        self.resource_usage = resource_usage
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert record to a JSON-serializable dictionary"""
+        return {
+            "container_id": self.container_id,
+            "command": self.command,
+            "output": self.output,
+            "error": self.error,
+            "exit_code": self.exit_code,
+            "execution_time": self.execution_time,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "resource_usage": self.resource_usage,
+        }
+
+
+class RecentResults:
+    """Fixed-size ring buffer holding the most recent command results"""
+
+    __slots__ = ("_items", "_next", "_count", "_lock")
+
+    def __init__(self, capacity: int = 256):
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be at least 1")
+        self._items: List[Optional[HistoryRecord]] = [None] * capacity
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, record: HistoryRecord) -> None:
+        """Add a record, overwriting the oldest one when full"""
+        with self._lock:
+            self._items[self._next] = record
+            self._next = (self._next + 1) % len(self._items)
+            self._count = min(self._count + 1, len(self._items))
+
+    def snapshot(
+        self, container_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[HistoryRecord]:
+        """Return records newest first, optionally filtered by container"""
+        with self._lock:
+            capacity = len(self._items)
+            ordered = [
+                self._items[(self._next - 1 - i) % capacity] for i in range(self._count)
+            ]
+
+        records = [
+            record
+            for record in ordered
+            if record is not None
+            and (container_id is None or record.container_id == container_id)
+        ]
+        return records[:limit] if limit is not None else records
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _to_epoch(value: Union[datetime, float, int, str, None]) -> Optional[float]:
+    """Normalise a timestamp given as datetime, epoch or ISO 8601 string"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class CommandHistory:
+    """Append-only command history with compressed SQLite storage
+
+    The most recent results are always kept in memory. When ``db_path`` is
+    given, every result is also appended to SQLite with compressed outputs and
+    pruned by age (``retention_seconds``) and total stored size (``max_bytes``).
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        retention_seconds: float = 30 * 24 * 3600,
+        recent_capacity: int = 256,
+        prune_interval: float = 60.0,
+    ):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self.recent = RecentResults(recent_capacity)
+        self.codec = "zstd" if zstandard is not None else "zlib"
+
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._stored_bytes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(SCHEMA)
+            existing = {
+                row[1]
+                for row in self._conn.execute("PRAGMA table_info(command_history)")
+            }
+            for name, sql_type in USAGE_COLUMNS:
+                if name not in existing:
+                    self._conn.execute(
+                        f"ALTER TABLE command_history ADD COLUMN {name} {sql_type}"
+                    )
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(stored_bytes), 0) FROM command_history"
+            ).fetchone()
+            self._stored_bytes = row[0]
+
+    @classmethod
+    def from_env(cls) -> "CommandHistory":
+        """Create a history store from CONTAINER_CONSOLE_HISTORY_* variables"""
+        db_path = os.getenv(
+            "CONTAINER_CONSOLE_HISTORY_DB",
+            "/var/lib/container-console/history.db",
+        )
+        kwargs = {
+            "max_bytes": int(
+                os.getenv("CONTAINER_CONSOLE_HISTORY_MAX_BYTES", str(256 * 1024**2))
+            ),
+            "retention_seconds": float(
+                os.getenv("CONTAINER_CONSOLE_HISTORY_RETENTION", str(30 * 24 * 3600))
+            ),
+            "recent_capacity": int(
+                os.getenv("CONTAINER_CONSOLE_HISTORY_RECENT", "256")
+            ),
+        }
+        try:
+            return cls(db_path or None, **kwargs)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Command history database unavailable ({e}), memory only")
+            return cls(None, **kwargs)
+
+    # Compression -------------------------------------------------------
+
+    def _compress(self, text: str) -> bytes:
+        data = text.encode("utf-8", errors="replace")
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return zlib.compress(data, 6)
+
+    @staticmethod
+    def _decompress(codec: str, blob: Optional[bytes]) -> str:
+        if not blob:
+            return ""
+        if codec == "zstd":
+            if zstandard is None:
+                return "<zstd-compressed output; install zstandard to read>"
+            data = zstandard.ZstdDecompressor().decompress(blob)
+        elif codec == "zlib":
+            data = zlib.decompress(blob)
+        else:
+            data = blob
+        return data.decode("utf-8", errors="replace")
+
+    # Writing -----------------------------------------------------------
+
+    def record(self, result: "CommandResult") -> None:
+        """Append a command result to the in-memory tier and the database"""
+        timestamp = result.timestamp.timestamp()
+        usage = result.resource_usage
+        self.recent.append(
+            HistoryRecord(
+                container_id=result.container_id,
+                command=result.command,
+                output=result.output,
+                error=result.error,
+                exit_code=result.exit_code,
+                execution_time=result.execution_time,
+                timestamp=timestamp,
+                resource_usage=usage.to_dict() if usage else None,
+            )
+        )
+
+        if self._conn is None:
+            return
+
+        raw_size = len(result.output) + len(result.error)
+        if raw_size >= MIN_COMPRESS_BYTES:
+            codec = self.codec
+            output = self._compress(result.output)
+            error = self._compress(result.error)
+        else:
+            codec = "raw"
+            output = result.output.encode("utf-8", errors="replace")
+            error = result.error.encode("utf-8", errors="replace")
+        stored_bytes = len(output) + len(error) + len(result.command)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO command_history (container_id, command, exit_code, "
+                "execution_time, timestamp, codec, output, error, stored_bytes, "
+                "user_cpu_time, system_cpu_time, max_rss_kb, block_input_ops, "
+                "block_output_ops) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result.container_id,
+                    result.command,
+                    result.exit_code,
+                    result.execution_time,
+                    timestamp,
+                    codec,
+                    output,
+                    error,
+                    stored_bytes,
+                    usage.user_cpu_time if usage else None,
+                    usage.system_cpu_time if usage else None,
+                    usage.max_rss_kb if usage else None,
+                    usage.block_input_ops if usage else None,
+                    usage.block_output_ops if usage else None,
+                ),
+            )
+            self._conn.commit()
+            self._stored_bytes += stored_bytes
+
+            if (
+                self._stored_bytes > self.max_bytes
+                or time.time() - self._last_prune >= self.prune_interval
+            ):
+                self._prune_locked()
+
+    def prune(self) -> int:
+        """Apply retention and size limits now; returns rows removed"""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            return self._prune_locked()
+
+    def _prune_locked(self) -> int:
+        assert self._conn is not None
+        removed = 0
+        self._last_prune = time.time()
+
+        if self.retention_seconds > 0:
+            cutoff = self._last_prune - self.retention_seconds
+            cursor = self._conn.execute(
+                "DELETE FROM command_history WHERE timestamp < ?", (cutoff,)
+            )
+            removed += cursor.rowcount
+
+        if removed:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(stored_bytes), 0) FROM command_history"
+            ).fetchone()
+            self._stored_bytes = row[0]
+
+        if self._stored_bytes > self.max_bytes:
+            # Drop the oldest rows until we are back under 90% of the budget
+            target = int(self.max_bytes * 0.9)
+            rows = self._conn.execute(
+                "SELECT id, stored_bytes FROM command_history ORDER BY id"
+            ).fetchall()
+            excess = self._stored_bytes - target
+            last_id = None
+            for row_id, size in rows:
+                if excess <= 0:
+                    break
+                excess -= size
+                last_id = row_id
+            if last_id is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM command_history WHERE id <= ?", (last_id,)
+                )
+                removed += cursor.rowcount
+                row = self._conn.execute(
+                    "SELECT COALESCE(SUM(stored_bytes), 0) FROM command_history"
+                ).fetchone()
+                self._stored_bytes = row[0]
+
+        self._conn.commit()
+        if removed:
+            self._conn.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    # Reading -----------------------------------------------------------
+
+    def query(
+        self,
+        container_id: Optional[int] = None,
+        since: Union[datetime, float, str, None] = None,
+        until: Union[datetime, float, str, None] = None,
+        exit_code: Optional[int] = None,
+        command_prefix: Optional[str] = None,
+        limit: int = 100,
+        include_output: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Query stored results, newest first"""
+        since_ts = _to_epoch(since)
+        until_ts = _to_epoch(until)
+
+        if self._conn is None:
+            records = self.recent.snapshot(container_id=container_id)
+            matches = []
+            for record in records:
+                if since_ts is not None and record.timestamp < since_ts:
+                    continue
+                if until_ts is not None and record.timestamp > until_ts:
+                    continue
+                if exit_code is not None and record.exit_code != exit_code:
+                    continue
+                if command_prefix and not record.command.startswith(command_prefix):
+                    continue
+                entry = record.to_dict()
+                if not include_output:
+                    entry.pop("output")
+                    entry.pop("error")
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+            return matches
+
+        clauses = []
+        params: List[Any] = []
+        if container_id is not None:
+            clauses.append("container_id = ?")
+            params.append(container_id)
+        if since_ts is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("timestamp <= ?")
+            params.append(until_ts)
+        if exit_code is not None:
+            clauses.append("exit_code = ?")
+            params.append(exit_code)
+        if command_prefix:
+            # Range comparison instead of LIKE so the command index is used
+            clauses.append("command >= ? AND command < ?")
+            params.extend([command_prefix, _prefix_upper_bound(command_prefix)])
+
+        columns = (
+            "id, container_id, command, exit_code, execution_time, timestamp, "
+            "user_cpu_time, system_cpu_time, max_rss_kb, block_input_ops, "
+            "block_output_ops"
+        )
+        if include_output:
+            columns += ", codec, output, error"
+        sql = f"SELECT {columns} FROM command_history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        entries = []
+        for row in rows:
+            entry = {
+                "id": row[0],
+                "container_id": row[1],
+                "command": row[2],
+                "exit_code": row[3],
+                "execution_time": row[4],
+                "timestamp": datetime.fromtimestamp(row[5]).isoformat(),
+                "resource_usage": (
+                    {
+                        "user_cpu_time": row[6],
+                        "system_cpu_time": row[7],
+                        "cpu_time": row[6] + row[7],
+                        "max_rss_kb": row[8],
+                        "block_input_ops": row[9],
+                        "block_output_ops": row[10],
+                    }
+                    if row[6] is not None
+                    else None
+                ),
+            }
+            if include_output:
+                entry["output"] = self._decompress(row[11], row[12])
+                entry["error"] = self._decompress(row[11], row[13])
+            entries.append(entry)
+        return entries
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary of what the store currently holds"""
+        stats: Dict[str, Any] = {
+            "recent_count": len(self.recent),
+            "persistent": self._conn is not None,
+            "codec": self.codec,
+        }
+        if self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT COUNT(*), MIN(timestamp) FROM command_history"
+                ).fetchone()
+            stats.update(
+                {
+                    "db_path": self.db_path,
+                    "stored_count": row[0],
+                    "stored_bytes": self._stored_bytes,
+                    "max_bytes": self.max_bytes,
+                    "oldest": (
+                        datetime.fromtimestamp(row[1]).isoformat() if row[1] else None
+                    ),
+                }
+            )
+        return stats
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Container Attach
+Fast path into running containers with lxc-attach instead of pct exec
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+LXC_ATTACH = "lxc-attach"
+PCT = "pct"
+
+RESOLVE_TIMEOUT = 5
+
+# pct exec starts commands with a clean environment and this PATH
+CONTAINER_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+
+
+def _start_time(pid: int) -> Optional[int]:
+    """Start time of a process in clock ticks, or None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces; fields resume after its ")"
+    return int(stat.rsplit(")", 1)[1].split()[19])
+
+
+class ContainerAttach:
+    """Builds the command line that runs a command inside a container
+
+    ``pct exec`` loads Proxmox's Perl tooling and the container config on
+    every call. With ``method`` set to ``lxc-attach`` a running container
+    is entered directly instead, under the same cgroup, AppArmor and
+    seccomp confinement ``pct exec`` applies.
+
+    ``lxc-attach`` addresses the container by name; the init PID cached
+    here only tells cheaply whether the container is running. It is looked
+    up once with ``lxc-info`` and kept with the process start time, so a
+    stopped or restarted container (gone init, or a reused PID) is noticed
+    on the next command without asking LXC again. Stopped or unknown
+    containers use ``pct exec``, which also produces the usual error
+    messages. The choice is made before the command runs: ``lxc-attach``
+    exits with 1 both when it cannot attach and when the command does, so
+    a command that went through it is never repeated with ``pct exec``.
+    """
+
+    def __init__(self, method: str = LXC_ATTACH):
+        # nsenter is deliberately not offered: it would run commands outside
+        # the container's cgroup, AppArmor profile and seccomp filter
+        if method != LXC_ATTACH:
+            raise ValueError(f"Unknown attach method: {method}")
+        self.method = method
+        self.available = bool(shutil.which(method) and shutil.which("lxc-info"))
+        self._lock = threading.Lock()
+        # container ID -> (init PID, its start time)
+        self._init: Dict[int, Tuple[int, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["ContainerAttach"]:
+        """The fast path selected by CONTAINER_CONSOLE_ATTACH, if any
+
+        ``pct`` (the default) always uses ``pct exec``.
+        """
+        method = os.getenv("CONTAINER_CONSOLE_ATTACH", PCT)
+        if method == PCT:
+            return None
+        if method != LXC_ATTACH:
+            print(f"⚠️  Unsupported CONTAINER_CONSOLE_ATTACH={method}, using pct exec")
+            return None
+        attach = cls(method)
+        if not attach.available:
+            print(f"⚠️  {method} or lxc-info not found, using pct exec")
+            return None
+        return attach
+
+    def init_pid(self, container_id: int) -> Optional[int]:
+        """PID of the container's init process, or None if it is not running"""
+        with self._lock:
+            cached = self._init.get(container_id)
+        if cached is not None and _start_time(cached[0]) == cached[1]:
+            return cached[0]
+
+        try:
+            result = subprocess.run(
+                ["lxc-info", "-n", str(container_id), "-p", "-H"],
+                capture_output=True,
+                text=True,
+                timeout=RESOLVE_TIMEOUT,
+            )
+            pid = int(result.stdout.strip()) if result.returncode == 0 else None
+        except (subprocess.TimeoutExpired, ValueError):
+            pid = None
+        started = _start_time(pid) if pid else None
+        with self._lock:
+            if started is None:
+                self._init.pop(container_id, None)
+                return None
+            self._init[container_id] = (pid, started)  # type: ignore[assignment]
+        return pid
+
+    def forget(self, container_id: int) -> None:
+        """Drop the cached init PID, e.g. after a shell failed to attach"""
+        with self._lock:
+            self._init.pop(container_id, None)
+
+    def argv(self, container_id: int, command: str) -> Optional[List[str]]:
+        """Fast-path command line, or None to use ``pct exec``"""
+        pid = self.init_pid(container_id)
+        if pid is None:
+            return None
+        # What pct exec runs, without loading the Proxmox tooling first
+        return [
+            LXC_ATTACH,
+            "-n",
+            str(container_id),
+            "--clear-env",
+            "--set-var",
+            f"PATH={CONTAINER_PATH}",
+            "--",
+            "bash",
+            "-c",
+            command,
+        ]
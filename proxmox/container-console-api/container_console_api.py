@@ -4,13 +4,54 @@ Container Console API
 Flask API service to bridge between Cursor and container console manager
 """
 
+import argparse
+import json
 import logging
+import os
+import signal
+import sys
+import threading
+import time
 from datetime import datetime
+from typing import Optional
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
+from werkzeug.wsgi import wrap_file
 
+from admission import AdmissionController, AdmissionRejected
+from batch_executor import BatchExecutor
+from command_history import CommandHistory
+from container_attach import ContainerAttach
 from container_console_service import ContainerConsoleManager
+from container_scheduler import ContainerScheduler, QueueTimeout
+from file_transfer import (
+    ChecksumMismatch,
+    FileTransferManager,
+    TransferError,
+    UploadConflict,
+)
+from fleet_rollout import FleetRollout
+from idempotency import IdempotencyCache, IdempotencyConflict
+from job_queue import QUEUED, JobQueue, JobQueueFull
+from librechat_deployment import DeploymentConflict, LibreChatDeployer
+from metrics import ConsoleMetrics
+from output_stream import OutputStream
+from process_spawner import ProcessSpawner
+from query_cache import QueryCache
+from response_helpers import (
+    StateCache,
+    command_params,
+    compress_response,
+    conditional_json,
+    json_etag,
+    list_params,
+    paginate,
+    select_fields,
+)
+from script_registry import ScriptError, ScriptRegistry
+from shell_session import SessionBusy, SessionClosed, SessionManager
+from template_baker import TemplateBaker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +60,270 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for cross-origin requests
 
-# Initialize the container console manager
-console_manager = ContainerConsoleManager()
+# Services are created on first use rather than at import time, so each
+# gunicorn worker builds its own after forking and imports stay cheap.
+_services_lock = threading.Lock()
+_console_manager: Optional[ContainerConsoleManager] = None
+_job_queue: Optional[JobQueue] = None
+_deployer: Optional[LibreChatDeployer] = None
+_fleet_rollout: Optional[FleetRollout] = None
+_template_baker: Optional[TemplateBaker] = None
+_batch_executor: Optional[BatchExecutor] = None
+_metrics: Optional[ConsoleMetrics] = None
+_session_manager: Optional[SessionManager] = None
+_file_transfers: Optional[FileTransferManager] = None
+_script_registry: Optional[ScriptRegistry] = None
+_idempotency_cache: Optional[IdempotencyCache] = None
+
+# Short-lived cache of pct lookups shared by pollers of the read endpoints
+state_cache = StateCache(ttl=float(os.getenv("CONTAINER_CONSOLE_STATE_TTL", "2")))
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+COMPRESS_MIN_BYTES = int(os.getenv("CONTAINER_CONSOLE_COMPRESS_MIN_BYTES", "1024"))
+
+
+def get_console_manager() -> ContainerConsoleManager:
+    """Return the process-wide container console manager"""
+    global _console_manager
+    if _console_manager is None:
+        with _services_lock:
+            if _console_manager is None:
+                _console_manager = ContainerConsoleManager(
+                    history=CommandHistory.from_env(),
+                    admission=AdmissionController.from_env(),
+                    query_cache=QueryCache.from_env(),
+                    scheduler=ContainerScheduler.from_env(),
+                    spawner=ProcessSpawner.from_env(),
+                    attach=ContainerAttach.from_env(),
+                )
+    return _console_manager
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    """Return the cache of execute results sent with an Idempotency-Key"""
+    global _idempotency_cache
+    if _idempotency_cache is None:
+        with _services_lock:
+            if _idempotency_cache is None:
+                _idempotency_cache = IdempotencyCache.from_env()
+    return _idempotency_cache
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide background job queue"""
+    global _job_queue
+    if _job_queue is None:
+        with _services_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue.from_env()
+    return _job_queue
+
+
+def get_deployer() -> LibreChatDeployer:
+    """Return the process-wide LibreChat deployer"""
+    global _deployer
+    if _deployer is None:
+        console_manager, job_queue = get_console_manager(), get_job_queue()
+        with _services_lock:
+            if _deployer is None:
+                _deployer = LibreChatDeployer.from_env(console_manager, job_queue)
+    return _deployer
+
+
+def get_fleet_rollout() -> FleetRollout:
+    """Return the process-wide fleet rollout engine"""
+    global _fleet_rollout
+    if _fleet_rollout is None:
+        deployer = get_deployer()
+        with _services_lock:
+            if _fleet_rollout is None:
+                _fleet_rollout = FleetRollout(
+                    deployer.manager, deployer.job_queue, deployer
+                )
+    return _fleet_rollout
+
+
+def get_template_baker() -> TemplateBaker:
+    """Return the process-wide golden template baker"""
+    global _template_baker
+    if _template_baker is None:
+        deployer = get_deployer()
+        with _services_lock:
+            if _template_baker is None:
+                _template_baker = TemplateBaker.from_env(
+                    deployer.manager, deployer.job_queue, deployer
+                )
+    return _template_baker
+
+
+def get_batch_executor() -> BatchExecutor:
+    """Return the process-wide batch executor"""
+    global _batch_executor
+    if _batch_executor is None:
+        console_manager = get_console_manager()
+        with _services_lock:
+            if _batch_executor is None:
+                _batch_executor = BatchExecutor.from_env(console_manager)
+    return _batch_executor
+
+
+def get_session_manager() -> SessionManager:
+    """Return the process-wide shell session manager"""
+    global _session_manager
+    if _session_manager is None:
+        console_manager = get_console_manager()
+        with _services_lock:
+            if _session_manager is None:
+                _session_manager = SessionManager.from_env(console_manager)
+    return _session_manager
+
+
+def get_file_transfers() -> FileTransferManager:
+    """Return the process-wide file transfer manager"""
+    global _file_transfers
+    if _file_transfers is None:
+        console_manager = get_console_manager()
+        with _services_lock:
+            if _file_transfers is None:
+                _file_transfers = FileTransferManager.from_env(console_manager)
+    return _file_transfers
+
+
+def get_script_registry() -> ScriptRegistry:
+    """Return the process-wide script registry"""
+    global _script_registry
+    if _script_registry is None:
+        console_manager = get_console_manager()
+        with _services_lock:
+            if _script_registry is None:
+                _script_registry = ScriptRegistry.from_env(console_manager)
+    return _script_registry
+
+
+def get_metrics() -> ConsoleMetrics:
+    """Return the process-wide metrics, hooked into the console manager"""
+    global _metrics
+    if _metrics is None:
+        console_manager, job_queue = get_console_manager(), get_job_queue()
+        with _services_lock:
+            if _metrics is None:
+                _metrics = ConsoleMetrics(
+                    inflight_commands=lambda: console_manager.inflight_commands,
+                    queued_commands=lambda: (
+                        job_queue.counts().get(QUEUED, 0)
+                        + (_batch_executor.pending if _batch_executor else 0)
+                        + console_manager.admission.waiting
+                        + console_manager.scheduler.waiting_count()
+                    ),
+                    active_sessions=lambda: len(console_manager.active_sessions),
+                    job_counts=job_queue.counts,
+                )
+                console_manager.add_result_listener(_metrics.observe_command)
+    return _metrics
+
+
+def shutdown_services(timeout: float = 60.0) -> None:
+    """Drain background jobs and in-flight commands before the process exits"""
+    deadline = time.time() + timeout
+    with _services_lock:
+        job_queue, console_manager = _job_queue, _console_manager
+        batch_executor, session_manager = _batch_executor, _session_manager
+        idempotency_cache = _idempotency_cache
+
+    if batch_executor is not None:
+        # Running batch items are in-flight commands and drained below
+        batch_executor.shutdown(wait=False)
+
+    if session_manager is not None:
+        # Interactive shells would otherwise keep their containers busy
+        session_manager.close_all()
+
+    if job_queue is not None:
+        logger.info("Draining background jobs...")
+        if not job_queue.shutdown(wait=True, timeout=timeout):
+            logger.warning("Background jobs did not finish in time")
+
+    if console_manager is not None:
+        remaining = max(deadline - time.time(), 0)
+        logger.info(
+            f"Waiting for {console_manager.inflight_commands} in-flight command(s)"
+        )
+        if not console_manager.drain(timeout=remaining):
+            logger.warning("In-flight commands did not finish in time")
+        if console_manager.history is not None:
+            console_manager.history.close()
+        if console_manager.spawner is not None:
+            console_manager.spawner.close()
+
+    if idempotency_cache is not None:
+        idempotency_cache.close()
+
+
+def error_response(error, status_code=500):
+    """Build the standard JSON error response"""
+    return (
+        jsonify(
+            {
+                "success": False,
+                "error": error,
+                "timestamp": datetime.now().isoformat(),
+            }
+        ),
+        status_code,
+    )
+
+
+def admit(container_ids=()):
+    """Apply the per-client and per-container rate limits to this request"""
+    get_console_manager().admission.check_rate(request.remote_addr, container_ids)
+
+
+@app.errorhandler(AdmissionRejected)
+def overloaded_response(e):
+    """429 with a Retry-After hint when admission control refuses a request"""
+    get_metrics().observe_rejection(e.reason)
+    logger.warning(f"Rejected {request.method} {request.path}: {e}")
+    response, status_code = error_response(str(e), 429)
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, status_code
+
+
+@app.before_request
+def start_timer():
+    # Creating the metrics here hooks them up before the first command runs
+    get_metrics()
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe request latency; registered before compression so it runs last"""
+    started = g.pop("request_started", None)
+    if started is not None:
+        get_metrics().observe_request(
+            request.method,
+            request.url_rule.rule if request.url_rule else "<unmatched>",
+            response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
+
+
+@app.after_request
+def compress(response):
+    """Compress large JSON bodies for clients that accept gzip or zstd"""
+    return compress_response(response, COMPRESS_MIN_BYTES)
+
+
+def _query_etag(state_etag: str) -> str:
+    """ETag of a cached state as shaped by the request's query parameters"""
+    return json_etag([state_etag, request.query_string.decode()])
+
+
+def _sorted_containers():
+    return sorted(
+        get_console_manager().list_containers(),
+        key=lambda container: int(container.get("id", -1)),
+    )
 
 
 @app.route("/health", methods=["GET"])
@@ -35,18 +338,40 @@ def health_check():
     )
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(
+        get_metrics().render(), mimetype="text/plain", content_type=PROMETHEUS_TYPE
+    )
+
+
 @app.route("/containers", methods=["GET"])
 def list_containers():
-    """List all available containers"""
+    """List all available containers
+
+    Supports ``fields``, ``limit`` and ``cursor`` query parameters, and
+    answers ``304 Not Modified`` while the container list is unchanged.
+    """
     try:
-        containers = console_manager.list_containers()
-        return jsonify(
+        fields, cursor, limit = list_params()
+        containers, state_etag = state_cache.get("containers", _sorted_containers)
+        page, next_cursor = paginate(
+            containers,
+            key=lambda container: int(container.get("id", -1)),
+            cursor=cursor,
+            limit=limit,
+        )
+        return conditional_json(
             {
                 "success": True,
-                "containers": containers,
-                "timestamp": datetime.now().isoformat(),
-            }
+                "containers": [select_fields(c, fields) for c in page],
+                "next_cursor": next_cursor,
+            },
+            etag=_query_etag(state_etag),
         )
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         logger.error(f"Error listing containers: {e}")
         return (
@@ -63,16 +388,22 @@ def list_containers():
 
 @app.route("/containers/<int:container_id>/info", methods=["GET"])
 def get_container_info(container_id):
-    """Get information about a specific container"""
+    """Get information about a specific container
+
+    ``fields`` selects keys, e.g. ``?fields=id,status`` to skip the raw config.
+    """
     try:
-        info = console_manager.get_container_info(container_id)
-        return jsonify(
-            {
-                "success": True,
-                "container_info": info,
-                "timestamp": datetime.now().isoformat(),
-            }
+        fields, _, _ = list_params()
+        info, state_etag = state_cache.get(
+            ("info", container_id),
+            lambda: get_console_manager().get_container_info(container_id),
         )
+        return conditional_json(
+            {"success": True, "container_info": select_fields(info, fields)},
+            etag=_query_etag(state_etag),
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         logger.error(f"Error getting container info: {e}")
         return (
@@ -89,7 +420,12 @@ def get_container_info(container_id):
 
 @app.route("/containers/<int:container_id>/execute", methods=["POST"])
 def execute_command(container_id):
-    """Execute a command in a specific container"""
+    """Execute a command in a specific container
+
+    With an ``Idempotency-Key`` header the command runs at most once per key:
+    retries, including ones that arrive while it is still running, receive
+    the original result with an ``Idempotent-Replayed: true`` header.
+    """
     try:
         data = request.get_json()
         if not data or "command" not in data:
@@ -105,32 +441,66 @@ def execute_command(container_id):
             )
 
         command = data["command"]
-        timeout = data.get("timeout", 30)
-
-        logger.info(f"Executing command in container {container_id}: {command}")
-
-        # Execute the command
-        result = console_manager.execute_command(container_id, command, timeout)
-
-        # Convert result to JSON-serializable format
-        result_dict = {
-            "command": result.command,
-            "output": result.output,
-            "error": result.error,
-            "exit_code": result.exit_code,
-            "execution_time": result.execution_time,
-            "timestamp": result.timestamp.isoformat(),
-            "container_id": result.container_id,
-        }
+        timeout, priority = command_params(data, 30)
+        read_only = bool(data.get("read_only", False))
+        exclusive = data.get("exclusive")
 
-        return jsonify(
+        def run():
+            admit([container_id])
+            logger.info(f"Executing command in container {container_id}: {command}")
+
+            # Execute the command, waiting a bounded time for an execution slot
+            console_manager = get_console_manager()
+            result = console_manager.execute_command(
+                container_id,
+                command,
+                timeout,
+                max_wait=console_manager.admission.max_wait,
+                read_only=read_only,
+                priority=priority,
+                exclusive=exclusive,
+            )
+            return result.to_dict()
+
+        idempotency_key = request.headers.get("Idempotency-Key")
+        replayed = False
+        if idempotency_key:
+            result, replayed = get_idempotency_cache().run(
+                idempotency_key,
+                json_etag(
+                    {
+                        "container_id": container_id,
+                        "command": command,
+                        "timeout": timeout,
+                        "read_only": read_only,
+                        "priority": priority,
+                        "exclusive": exclusive,
+                    }
+                ),
+                run,
+            )
+            if replayed:
+                logger.info(f"Replaying result for Idempotency-Key {idempotency_key}")
+        else:
+            result = run()
+
+        response = jsonify(
             {
                 "success": True,
-                "result": result_dict,
+                "result": result,
                 "timestamp": datetime.now().isoformat(),
             }
         )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
 
+    except IdempotencyConflict as e:
+        return error_response(str(e), 422)
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         logger.error(f"Error executing command: {e}")
         return (
@@ -145,11 +515,132 @@ def execute_command(container_id):
         )
 
 
+@app.route("/containers/<int:container_id>/execute/stream", methods=["POST"])
+def execute_command_stream(container_id):
+    """Execute a command and stream its output as Server-Sent Events
+
+    Emits ``stdout``/``stderr`` events with ``{"data": "..."}`` as output
+    arrives, then a single ``exit`` event with the result summary.
+    """
+    data = request.get_json(silent=True)
+    if not data or "command" not in data:
+        return error_response("Command is required", 400)
+
+    command = data["command"]
+    try:
+        timeout, priority = command_params(data, 30)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    console_manager = get_console_manager()
+    admit([container_id])
+    logger.info(f"Streaming command in container {container_id}: {command}")
+    return _stream_command(
+        lambda on_output, on_spawn: console_manager.execute_command(
+            container_id,
+            command,
+            timeout,
+            on_output=on_output,
+            on_spawn=on_spawn,
+            max_wait=console_manager.admission.max_wait,
+            priority=priority,
+            exclusive=data.get("exclusive"),
+        )
+    )
+
+
+def _stream_command(execute, extra_fields=None):
+    """Run ``execute(on_output, on_spawn)`` and stream its output as SSE
+
+    ``extra_fields`` returns additional keys for the final ``exit`` event.
+    """
+    admission = get_console_manager().admission
+    if admission.saturated:
+        # Reject while a status code can still be sent
+        raise AdmissionRejected(
+            "Too many commands waiting to run", admission.max_wait, "queue_full"
+        )
+    stream = OutputStream(
+        max_chunks=int(os.getenv("CONTAINER_CONSOLE_STREAM_BUFFER", "64"))
+    )
+    streamed_stderr = []
+
+    def on_output(name, text):
+        stream.write(name, text)
+        if name == "stderr":
+            streamed_stderr.append(text)
+
+    def run():
+        try:
+            frame = execute(on_output, stream.attach_process).to_dict()
+            frame.pop("output")
+            # Only repeat the error if it wasn't already streamed (e.g. timeouts)
+            if frame["error"] == "".join(streamed_stderr):
+                frame.pop("error")
+            if extra_fields is not None:
+                frame.update(extra_fields())
+            stream.finish(frame)
+        except Exception as e:
+            logger.error(f"Error streaming command: {e}")
+            stream.finish({"exit_code": -1, "error": str(e)}, event="error")
+
+    threading.Thread(target=run, daemon=True).start()
+
+    return Response(
+        stream.events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/execute/batch", methods=["POST"])
+def execute_batch():
+    """Execute many ``{container_id, command, timeout}`` items concurrently
+
+    Results are returned in input order. With ``{"stream": true}`` they are
+    streamed as newline-delimited JSON in completion order instead, each line
+    carrying the ``index`` of its item.
+    """
+    data = request.get_json(silent=True) or {}
+    batch_executor = get_batch_executor()
+    try:
+        items = batch_executor.parse(data.get("items"), data.get("timeout", 30))
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    admit([item.container_id for item in items])
+    logger.info(f"Executing batch of {len(items)} commands")
+
+    if data.get("stream"):
+
+        def generate():
+            for index, result in batch_executor.iter_completed(items):
+                yield json.dumps({"index": index, **result}) + "\n"
+
+        return Response(
+            generate(),
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        results = batch_executor.run(items)
+    except RuntimeError as e:
+        # Raised by the pool once the server is shutting down
+        return error_response(str(e), 503)
+    return jsonify(
+        {
+            "success": True,
+            "results": results,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
 @app.route("/containers/<int:container_id>/test", methods=["GET"])
 def test_container_access(container_id):
     """Test if a container is accessible"""
     try:
-        accessible = console_manager.test_container_access(container_id)
+        accessible = get_console_manager().test_container_access(container_id)
         return jsonify(
             {
                 "success": True,
@@ -172,82 +663,640 @@ def test_container_access(container_id):
         )
 
 
-@app.route("/containers/<int:container_id>/deploy-librechat", methods=["POST"])
-def deploy_librechat(container_id):
-    """Deploy LibreChat in a container (automated deployment)"""
-    try:
-        logger.info(f"Starting LibreChat deployment in container {container_id}")
-
-        deployment_steps = [
-            ("System Update", "apt update && apt upgrade -y"),
-            ("Install Dependencies", "apt install -y curl wget git"),
-            ("Install Docker", "curl -fsSL https://get.docker.com | sh"),
-            ("Enable Docker", "systemctl enable docker"),
-            ("Start Docker", "systemctl start docker"),
-            ("Add User to Docker Group", "usermod -aG docker $USER"),
-            (
-                "Deploy LibreChat",
-                "docker run -d --name librechat --restart unless-stopped "
-                "-p 3000:3000 -e PUID=1000 -e PGID=1000 "
-                "ghcr.io/danny-avila/librechat:latest",
-            ),
-        ]
-
-        results = []
-
-        for step_name, command in deployment_steps:
-            logger.info(f"Executing step: {step_name}")
-            result = console_manager.execute_command(container_id, command, timeout=120)
-
-            step_result = {
-                "step": step_name,
-                "command": command,
-                "success": result.exit_code == 0,
-                "output": result.output,
-                "error": result.error,
-                "exit_code": result.exit_code,
-                "execution_time": result.execution_time,
-            }
+@app.route("/containers/<int:container_id>/queue", methods=["GET"])
+def get_container_queue(container_id):
+    """Exclusive command running in a container and those queued behind it
 
-            results.append(step_result)
+    Waiting commands are listed in the order they will run, with their
+    ``position`` and ``wait_seconds`` so far.
+    """
+    scheduler = get_console_manager().scheduler
+    if scheduler is None:
+        return error_response("Command scheduling is disabled", 404)
+    return jsonify(
+        {
+            "success": True,
+            "queue": scheduler.queue(container_id),
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
 
-            if not step_result["success"]:
-                logger.warning(f"Step '{step_name}' failed: {result.error}")
-                # Continue with next steps even if one fails
 
-        # Check if LibreChat is running
-        check_result = console_manager.execute_command(
-            container_id, "docker ps | grep librechat", timeout=30
+@app.route("/containers/<int:container_id>/sessions", methods=["POST"])
+def open_session(container_id):
+    """Start a persistent shell in a container for interactive use
+
+    Commands sent to the session share its working directory and environment
+    and skip the cost of spawning ``pct exec`` each time.
+    """
+    try:
+        admit([container_id])
+        console_manager = get_console_manager()
+        session = get_session_manager().open(
+            container_id, max_wait=console_manager.admission.max_wait
         )
-        librechat_running = "librechat" in check_result.output
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "session": session.to_dict(),
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            201,
+        )
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Error opening session: {e}")
+        return error_response(str(e), 500)
 
-        # Get container IP
-        ip_result = console_manager.execute_command(
-            container_id, "hostname -I", timeout=30
+
+@app.route("/sessions", methods=["GET"])
+def list_sessions():
+    """List open shell sessions, newest first"""
+    try:
+        return _list_response(
+            "sessions",
+            [
+                session.to_dict()
+                for session in get_session_manager().list_sessions(
+                    container_id=request.args.get("container_id", type=int)
+                )
+            ],
+            "session_id",
         )
-        container_ip = (
-            ip_result.output.strip().split()[0]
-            if ip_result.output.strip()
-            else "unknown"
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@app.route("/sessions/<session_id>", methods=["GET"])
+def get_session(session_id):
+    """Get the state of a shell session"""
+    session = get_session_manager().get(session_id)
+    if session is None:
+        return error_response(f"Session {session_id} not found", 404)
+    return jsonify(
+        {
+            "success": True,
+            "session": session.to_dict(),
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def close_session(session_id):
+    """Close a shell session, killing anything still running in it"""
+    if not get_session_manager().close(session_id):
+        return error_response(f"Session {session_id} not found", 404)
+    return jsonify(
+        {
+            "success": True,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+def _idle_session(session_id):
+    """Return ``(session, None)``, or ``(None, error response)`` if it is unusable"""
+    session = get_session_manager().get(session_id)
+    if session is None:
+        return None, error_response(f"Session {session_id} not found", 404)
+    if session.busy:
+        return None, error_response(f"Session {session_id} is running a command", 409)
+    return session, None
+
+
+@app.route("/sessions/<session_id>/execute", methods=["POST"])
+def execute_in_session(session_id):
+    """Run a command in a shell session and return its result"""
+    data = request.get_json(silent=True)
+    if not data or "command" not in data:
+        return error_response("Command is required", 400)
+    session, error = _idle_session(session_id)
+    if session is None:
+        return error
+
+    command = data["command"]
+    try:
+        timeout, priority = command_params(data, 30)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    admit([session.container_id])
+    try:
+        console_manager = get_console_manager()
+        result = get_session_manager().execute(
+            session_id,
+            command,
+            timeout,
+            max_wait=console_manager.admission.max_wait,
+            priority=priority,
         )
+        return jsonify(
+            {
+                "success": True,
+                "result": result.to_dict(),
+                "session": session.to_dict(),
+                "timestamp": datetime.now().isoformat(),
+            }
+        )
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except SessionBusy as e:
+        return error_response(str(e), 409)
+    except (KeyError, SessionClosed):
+        return error_response(f"Session {session_id} has been closed", 410)
+    except QueueTimeout as e:
+        return error_response(str(e), 504)
+    except Exception as e:
+        logger.error(f"Error executing command in session: {e}")
+        return error_response(str(e), 500)
+
+
+@app.route("/sessions/<session_id>/execute/stream", methods=["POST"])
+def execute_in_session_stream(session_id):
+    """Run a command in a shell session and stream its output as SSE
+
+    Events are the same as for ``/containers/<id>/execute/stream``; the final
+    ``exit`` event also carries the session's ``cwd`` and ``session_closed``.
+    """
+    data = request.get_json(silent=True)
+    if not data or "command" not in data:
+        return error_response("Command is required", 400)
+    session, error = _idle_session(session_id)
+    if session is None:
+        return error
+
+    command = data["command"]
+    try:
+        timeout, priority = command_params(data, 30)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    admit([session.container_id])
+    console_manager = get_console_manager()
+    logger.info(f"Streaming command in session {session_id}: {command}")
+    return _stream_command(
+        # The shell outlives the request, so it is not handed to the stream
+        lambda on_output, on_spawn: get_session_manager().execute(
+            session_id,
+            command,
+            timeout,
+            on_output=on_output,
+            max_wait=console_manager.admission.max_wait,
+            priority=priority,
+        ),
+        lambda: {"cwd": session.cwd, "session_closed": session.closed},
+    )
+
+
+@app.route("/scripts", methods=["POST"])
+def register_script():
+    """Register a script so it can be run by its SHA-256
+
+    Registering the same script again is a no-op returning the same hash.
+    """
+    data = request.get_json(silent=True)
+    if not data or "script" not in data:
+        return error_response("script is required", 400)
+    try:
+        script, created = get_script_registry().register(
+            data["script"], name=data.get("name")
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return (
+        jsonify(
+            {
+                "success": True,
+                "script": script,
+                "timestamp": datetime.now().isoformat(),
+            }
+        ),
+        201 if created else 200,
+    )
 
+
+@app.route("/scripts", methods=["GET"])
+def list_scripts():
+    """List registered scripts, newest first"""
+    try:
+        return _list_response("scripts", get_script_registry().list_scripts(), "sha256")
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@app.route("/scripts/<sha256>", methods=["GET"])
+def get_script(sha256):
+    """Get a registered script's metadata"""
+    script = get_script_registry().get(sha256)
+    if script is None:
+        return error_response(f"Script {sha256} not found", 404)
+    return jsonify(
+        {
+            "success": True,
+            "script": script,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+@app.route("/containers/<int:container_id>/scripts/<sha256>/run", methods=["POST"])
+def run_script(container_id, sha256):
+    """Run a registered script in a container with ``args``
+
+    The script is pushed into the container's script cache the first time
+    only; ``pushed`` in the response tells whether that happened.
+    """
+    data = request.get_json(silent=True) or {}
+    args = data.get("args", [])
+    if not isinstance(args, list):
+        return error_response("args must be a list of strings", 400)
+    try:
+        timeout, _ = command_params(data, 300)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    admit([container_id])
+    try:
+        console_manager = get_console_manager()
+        result, pushed = get_script_registry().run(
+            container_id,
+            sha256,
+            args,
+            timeout,
+            max_wait=console_manager.admission.max_wait,
+        )
         return jsonify(
             {
                 "success": True,
-                "deployment_results": results,
-                "librechat_running": librechat_running,
-                "container_ip": container_ip,
-                "access_url": (
-                    f"http://{container_ip}:3000"
-                    if container_ip != "unknown"
-                    else "unknown"
-                ),
+                "result": result.to_dict(),
+                "pushed": pushed,
                 "timestamp": datetime.now().isoformat(),
             }
         )
+    except KeyError:
+        return error_response(f"Script {sha256} not found", 404)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except ScriptError as e:
+        return error_response(str(e), 502)
+    except Exception as e:
+        logger.error(f"Error running script: {e}")
+        return error_response(str(e), 500)
+
+
+def _upload_response(upload, status_code=200):
+    response = jsonify(
+        {
+            "success": True,
+            "upload": upload,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+    response.headers["Upload-Offset"] = str(upload["offset"])
+    return response, status_code
+
 
+@app.route("/containers/<int:container_id>/uploads", methods=["POST"])
+def start_upload(container_id):
+    """Start a resumable upload of a file into a container
+
+    The body names the target ``path`` and the file's ``size`` and ``sha256``,
+    plus optional ``mode``, ``user`` and ``group``. Starting the same upload
+    again returns the unfinished one with the offset to resume from.
+    """
+    data = request.get_json(silent=True)
+    if not data or not all(key in data for key in ("path", "size", "sha256")):
+        return error_response("path, size and sha256 are required", 400)
+    admit([container_id])
+    try:
+        upload, created = get_file_transfers().start_upload(
+            container_id,
+            data["path"],
+            data["size"],
+            data["sha256"],
+            mode=data.get("mode"),
+            user=data.get("user"),
+            group=data.get("group"),
+        )
+        return _upload_response(upload, 201 if created else 200)
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        logger.error(f"Error deploying LibreChat: {e}")
+        logger.error(f"Error starting upload: {e}")
+        return error_response(str(e), 500)
+
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    """Get the state of an upload, including the offset to resume from"""
+    upload = get_file_transfers().get_upload(upload_id)
+    if upload is None:
+        return error_response(f"Upload {upload_id} not found", 404)
+    return _upload_response(upload)
+
+
+@app.route("/uploads/<upload_id>", methods=["PATCH"])
+def upload_chunk(upload_id):
+    """Append the request body to an upload at the ``Upload-Offset`` header
+
+    The body is streamed to disk, so chunks may be of any size. The chunk
+    holding the last byte also verifies the SHA-256 and pushes the file into
+    the container; if the push fails, an empty PATCH at the final offset
+    retries it.
+    """
+    transfers = get_file_transfers()
+    offset = request.headers.get("Upload-Offset", type=int)
+    if offset is None:
+        return error_response("Upload-Offset header is required", 400)
+    upload = transfers.get_upload(upload_id)
+    if upload is None:
+        return error_response(f"Upload {upload_id} not found", 404)
+
+    admit([upload["container_id"]])
+    try:
+        upload = transfers.write_chunk(
+            upload_id,
+            offset,
+            request.stream,
+            max_wait=get_console_manager().admission.max_wait,
+        )
+        return _upload_response(upload)
+    except KeyError:
+        return error_response(f"Upload {upload_id} not found", 404)
+    except UploadConflict as e:
+        response, status_code = error_response(str(e), 409)
+        response.headers["Upload-Offset"] = str(e.offset)
+        return response, status_code
+    except ChecksumMismatch as e:
+        return error_response(str(e), 422)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Error writing upload {upload_id}: {e}")
+        return error_response(str(e), 500)
+
+
+@app.route("/uploads/<upload_id>", methods=["DELETE"])
+def abort_upload(upload_id):
+    """Abandon an upload and delete its staged data"""
+    if not get_file_transfers().abort_upload(upload_id):
+        return error_response(f"Upload {upload_id} not found", 404)
+    return jsonify(
+        {
+            "success": True,
+            "upload_id": upload_id,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+@app.route("/containers/<int:container_id>/files", methods=["GET"])
+def download_file(container_id):
+    """Download a file from a container
+
+    The file is pulled to the host once and sent straight from disk, which
+    gunicorn does with ``sendfile``. Its SHA-256 is the strong ETag and the
+    ``X-Checksum-SHA256`` header. ``Range: bytes=N-`` with ``If-Range`` set
+    to the ETag resumes an interrupted download from the same copy.
+    """
+    path = request.args.get("path")
+    if not path:
+        return error_response("path query parameter is required", 400)
+
+    start = 0
+    byte_range = request.range
+    if byte_range is not None:
+        if (
+            byte_range.units != "bytes"
+            or len(byte_range.ranges) != 1
+            or byte_range.ranges[0][1] is not None
+        ):
+            return error_response("Only open-ended byte ranges are supported", 416)
+        start = byte_range.ranges[0][0]
+    if_range = request.headers.get("If-Range", "").strip('"') or None
+
+    admit([container_id])
+    try:
+        f, sha256, size = get_file_transfers().stage_download(
+            container_id,
+            path,
+            if_range=if_range,
+            max_wait=get_console_manager().admission.max_wait,
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except TransferError as e:
+        return error_response(str(e), 404)
+    except Exception as e:
+        logger.error(f"Error downloading file: {e}")
+        return error_response(str(e), 500)
+
+    if if_range is not None and if_range != sha256:
+        # The file changed since the client's partial copy, send all of it
+        start = 0
+    if start < 0:
+        start = max(size + start, 0)
+    if start > size or (start == size and size > 0):
+        f.close()
+        response, status_code = error_response("Range not satisfiable", 416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response, status_code
+
+    f.seek(start)
+    response = Response(
+        wrap_file(request.environ, f, buffer_size=1024 * 1024),
+        status=206 if start else 200,
+        mimetype="application/octet-stream",
+        direct_passthrough=True,
+    )
+    response.content_length = size - start
+    if start:
+        response.headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["X-Checksum-SHA256"] = sha256
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename={json.dumps(os.path.basename(path))}"
+    )
+    response.set_etag(sha256)
+    return response
+
+
+@app.route("/containers/<int:container_id>/jobs", methods=["POST"])
+def submit_job(container_id):
+    """Queue a command for background execution and return its job ID"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or "command" not in data:
+            return error_response("Command is required", 400)
+
+        timeout, priority = command_params(data, 3600)
+        idempotency_key = request.headers.get("Idempotency-Key") or data.get(
+            "idempotency_key"
+        )
+        admit([container_id])
+        job, created = get_job_queue().submit_command(
+            get_console_manager(),
+            container_id,
+            data["command"],
+            timeout=timeout,
+            priority=priority,
+            idempotency_key=idempotency_key,
+        )
+        if created:
+            logger.info(f"Queued job {job.job_id} in container {container_id}")
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "job": job.to_dict(),
+                    "created": created,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            202 if created else 200,
+        )
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except JobQueueFull as e:
+        return error_response(str(e), 429)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}")
+        return error_response(str(e))
+
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    """List known jobs, newest first; supports ``fields``/``limit``/``cursor``"""
+    try:
+        return _list_response(
+            "jobs",
+            [
+                job.to_dict()
+                for job in get_job_queue().list_jobs(
+                    container_id=request.args.get("container_id", type=int),
+                    status=request.args.get("status"),
+                )
+            ],
+            "job_id",
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+def _list_response(name, records, id_field):
+    """Paginated, field-selected, conditional response for a list of records
+
+    Records are ordered newest first by ``created_at``, ties broken by ID.
+    """
+    fields, cursor, limit = list_params()
+    records = sorted(
+        records,
+        key=lambda record: (record["created_at"], record[id_field]),
+        reverse=True,
+    )
+    page, next_cursor = paginate(
+        records,
+        key=lambda record: (record["created_at"], record[id_field]),
+        cursor=cursor,
+        limit=limit,
+        reverse=True,
+    )
+    return conditional_json(
+        {
+            "success": True,
+            name: [select_fields(record, fields) for record in page],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Get the status of a job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return error_response(f"Job {job_id} not found", 404)
+    return conditional_json({"success": True, "job": job.to_dict()})
+
+
+@app.route("/jobs/<job_id>/output", methods=["GET"])
+def get_job_output(job_id):
+    """Fetch job output starting at an offset"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return error_response(f"Job {job_id} not found", 404)
+    chunk = job.read_output(
+        offset=request.args.get("offset", 0, type=int),
+        limit=request.args.get("limit", 1024 * 1024, type=int),
+    )
+    return jsonify(
+        {
+            "success": True,
+            "job_id": job_id,
+            "status": job.status,
+            **chunk,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued or running job, killing its process group"""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return error_response(f"Job {job_id} not found", 404)
+    logger.info(f"Cancel requested for job {job_id}")
+    return jsonify(
+        {
+            "success": True,
+            "job": job.to_dict(),
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+@app.route("/history", methods=["GET"])
+@app.route("/containers/<int:container_id>/history", methods=["GET"])
+def get_command_history(container_id=None):
+    """Query recorded command results, newest first"""
+    try:
+        history = get_console_manager().history
+        if container_id is None:
+            container_id = request.args.get("container_id", type=int)
+        fields, _, _ = list_params()
+        entries = history.query(
+            container_id=container_id,
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            exit_code=request.args.get("exit_code", type=int),
+            command_prefix=request.args.get("prefix"),
+            limit=min(request.args.get("limit", 100, type=int), 1000),
+            include_output=request.args.get("output", "true").lower() != "false",
+        )
+        return conditional_json(
+            {
+                "success": True,
+                "history": [select_fields(entry, fields) for entry in entries],
+                "stats": history.stats(),
+            }
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error querying command history: {e}")
         return (
             jsonify(
                 {
@@ -260,17 +1309,414 @@ def deploy_librechat(container_id):
         )
 
 
-if __name__ == "__main__":
+@app.route("/containers/<int:container_id>/deploy-librechat", methods=["POST"])
+def deploy_librechat(container_id):
+    """Deploy LibreChat in a container as a background job
+
+    Returns 202 with the deployment record; progress is available from
+    ``/deployments/<id>`` and live output from ``/jobs/<job_id>/output``.
+    A failed or interrupted deployment is resumed unless ``{"resume": false}``.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        admit()
+        record, started = get_deployer().start(
+            container_id,
+            resume=data.get("resume", True),
+            idempotency_key=request.headers.get("Idempotency-Key"),
+        )
+        if started:
+            logger.info(
+                f"Started LibreChat deployment {record['deployment_id']} "
+                f"in container {container_id}"
+            )
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "deployment": record,
+                    "started": started,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            202 if started else 200,
+        )
+
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except JobQueueFull as e:
+        return error_response(str(e), 429)
+    except Exception as e:
+        logger.error(f"Error deploying LibreChat: {e}")
+        return error_response(str(e))
+
+
+@app.route("/deployments", methods=["GET"])
+def list_deployments():
+    """List LibreChat deployments, newest first"""
+    try:
+        return _list_response(
+            "deployments",
+            get_deployer().list_deployments(
+                container_id=request.args.get("container_id", type=int)
+            ),
+            "deployment_id",
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@app.route("/deployments/<deployment_id>", methods=["GET"])
+def get_deployment(deployment_id):
+    """Get per-step progress of a deployment"""
+    record = get_deployer().get(deployment_id)
+    if record is None:
+        return error_response(f"Deployment {deployment_id} not found", 404)
+    return conditional_json({"success": True, "deployment": record})
+
+
+@app.route("/deployments/<deployment_id>/resume", methods=["POST"])
+def resume_deployment(deployment_id):
+    """Resume a failed, cancelled or interrupted deployment"""
+    try:
+        record = get_deployer().resume(deployment_id)
+        if record is None:
+            return error_response(f"Deployment {deployment_id} not found", 404)
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "deployment": record,
+                    "started": True,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            202,
+        )
+    except DeploymentConflict as e:
+        return error_response(str(e), 409)
+    except JobQueueFull as e:
+        return error_response(str(e), 429)
+
+
+def _artifact_cache():
+    """Return ``(cache, None)``, or ``(None, error response)`` if it is disabled"""
+    artifacts = get_deployer().artifacts
+    if artifacts is None:
+        return None, error_response(
+            "Artifact cache is disabled (set CONTAINER_CONSOLE_ARTIFACT_CACHE=1)", 404
+        )
+    return artifacts, None
+
+
+@app.route("/artifacts", methods=["GET"])
+def list_artifacts():
+    """List cached deployment artifacts, newest first"""
+    artifacts, error = _artifact_cache()
+    if error:
+        return error
+    try:
+        return _list_response("artifacts", artifacts.list_artifacts(), "artifact_id")
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@app.route("/artifacts/<kind>/<key>", methods=["DELETE"])
+def delete_artifact(kind, key):
+    """Drop a cached artifact; the next deployment caches a fresh copy"""
+    artifacts, error = _artifact_cache()
+    if error:
+        return error
+    if not artifacts.remove(kind, key):
+        return error_response(f"Artifact {kind}/{key} not found", 404)
+    return jsonify(
+        {
+            "success": True,
+            "artifact_id": f"{kind}/{key}",
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+@app.route("/fleet/deploy-librechat", methods=["POST"])
+def deploy_librechat_fleet():
+    """Roll LibreChat out to many containers, canary first, then in batches
+
+    Body: ``container_ids`` and/or ``tag`` select the containers;
+    ``batch_size``, ``canary_size``, ``max_failure_rate`` and ``health_check``
+    tune the rollout. Returns 202 with the rollout record; cancel it through
+    ``/jobs/<job_id>/cancel``.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        admit()
+        rollout = get_fleet_rollout().start(
+            container_ids=data.get("container_ids"),
+            tag=data.get("tag"),
+            batch_size=int(data.get("batch_size", 2)),
+            canary_size=int(data.get("canary_size", 1)),
+            max_failure_rate=float(data.get("max_failure_rate", 0.2)),
+            health_check=data.get("health_check"),
+        )
+        logger.info(
+            f"Started fleet rollout {rollout['rollout_id']} to "
+            f"{len(rollout['containers'])} containers"
+        )
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "rollout": rollout,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            ),
+            202,
+        )
+    except (TypeError, ValueError) as e:
+        return error_response(str(e), 400)
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except JobQueueFull as e:
+        return error_response(str(e), 429)
+    except Exception as e:
+        logger.error(f"Error starting fleet rollout: {e}")
+        return error_response(str(e))
+
+
+@app.route("/fleet/rollouts", methods=["GET"])
+def list_rollouts():
+    """List fleet rollouts, newest first"""
+    try:
+        return _list_response(
+            "rollouts", get_fleet_rollout().list_rollouts(), "rollout_id"
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@app.route("/fleet/rollouts/<rollout_id>", methods=["GET"])
+def get_rollout(rollout_id):
+    """Get per-container progress of a fleet rollout"""
+    rollout = get_fleet_rollout().get(rollout_id)
+    if rollout is None:
+        return error_response(f"Rollout {rollout_id} not found", 404)
+    return conditional_json({"success": True, "rollout": rollout})
+
+
+@app.route("/templates/bake", methods=["POST"])
+def bake_template():
+    """Bake LibreChat into a versioned LXC template in the background
+
+    Creates a scratch container from ``base_template``, deploys LibreChat in
+    it and exports it as ``<os>-librechat_<version>_<arch>.tar.gz``.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        scratch_id = (
+            int(data["scratch_id"]) if data.get("scratch_id") is not None else None
+        )
+        admit([scratch_id] if scratch_id is not None else [])
+        template = get_template_baker().start(
+            data.get("base_template", ""),
+            version=str(data["version"]) if data.get("version") else None,
+            scratch_id=scratch_id,
+            rootfs_storage=data.get("rootfs_storage", "local-lvm"),
+            disk_gb=int(data.get("disk_gb", 16)),
+            keep_scratch=bool(data.get("keep_scratch", False)),
+        )
+    except (TypeError, ValueError) as e:
+        return error_response(str(e), 400)
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except JobQueueFull as e:
+        return error_response(str(e), 429)
+    except Exception as e:
+        logger.error(f"Error starting template bake: {e}")
+        return error_response(str(e))
+    return (
+        jsonify(
+            {
+                "success": True,
+                "template": template,
+                "timestamp": datetime.now().isoformat(),
+            }
+        ),
+        202,
+    )
+
+
+@app.route("/templates", methods=["GET"])
+def list_templates():
+    """List the template catalog, newest first"""
+    try:
+        return _list_response(
+            "templates", get_template_baker().list_templates(), "template_id"
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+
+@app.route("/templates/<template_id>", methods=["GET"])
+def get_template(template_id):
+    """Get a baked template with its manifest"""
+    template = get_template_baker().get(template_id)
+    if template is None:
+        return error_response(f"Template {template_id} not found", 404)
+    return conditional_json({"success": True, "template": template})
+
+
+@app.route("/templates/<template_id>", methods=["DELETE"])
+def delete_template(template_id):
+    """Delete a baked template file and its catalog entry"""
+    try:
+        if not get_template_baker().remove(template_id):
+            return error_response(f"Template {template_id} not found", 404)
+    except ValueError as e:
+        return error_response(str(e), 409)
+    return jsonify(
+        {
+            "success": True,
+            "template_id": template_id,
+            "timestamp": datetime.now().isoformat(),
+        }
+    )
+
+
+def _run_threaded_server(host: str, port: int, drain_timeout: float) -> None:
+    """Serve with Werkzeug's threaded server when gunicorn is unavailable"""
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    # Non-daemon request threads are joined by server_close(), which lets
+    # in-flight requests finish during shutdown
+    server.daemon_threads = False
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    server.serve_forever()
+    server.server_close()
+    shutdown_services(timeout=drain_timeout)
+
+
+def main():
+    """Run the API server"""
+    parser = argparse.ArgumentParser(description="Container Console API")
+    parser.add_argument(
+        "--host", default=os.getenv("CONTAINER_CONSOLE_HOST", "0.0.0.0")
+    )
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("CONTAINER_CONSOLE_PORT", "5000"))
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("CONTAINER_CONSOLE_WORKERS", "1")),
+        help="Worker processes (jobs and sessions are per process)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=int(os.getenv("CONTAINER_CONSOLE_THREADS", "32")),
+        help="Request threads per worker",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=float(os.getenv("CONTAINER_CONSOLE_DRAIN_TIMEOUT", "120")),
+        help="Seconds to wait for in-flight commands on shutdown",
+    )
+    parser.add_argument(
+        "--dev",
+        action="store_true",
+        help="Use the Flask development server with debugger and reloader",
+    )
+    args = parser.parse_args()
+
     print("🚀 Starting Container Console API...")
-    print("📡 API will be available at: http://0.0.0.0:5000")
+    print(f"📡 API will be available at: http://{args.host}:{args.port}")
     print("🔑 Endpoints:")
     print("   GET  /health")
+    print("   GET  /metrics")
     print("   GET  /containers")
     print("   GET  /containers/<id>/info")
     print("   POST /containers/<id>/execute")
+    print("   POST /containers/<id>/execute/stream")
+    print("   POST /execute/batch")
     print("   GET  /containers/<id>/test")
+    print("   GET  /containers/<id>/queue")
+    print("   POST /containers/<id>/sessions")
+    print("   GET  /sessions")
+    print("   GET  /sessions/<session_id>")
+    print("   DELETE /sessions/<session_id>")
+    print("   POST /sessions/<session_id>/execute")
+    print("   POST /sessions/<session_id>/execute/stream")
+    print("   POST /scripts")
+    print("   GET  /scripts")
+    print("   GET  /scripts/<sha256>")
+    print("   POST /containers/<id>/scripts/<sha256>/run")
+    print("   POST /containers/<id>/uploads")
+    print("   GET  /uploads/<upload_id>")
+    print("   PATCH /uploads/<upload_id>")
+    print("   DELETE /uploads/<upload_id>")
+    print("   GET  /containers/<id>/files?path=<path>")
     print("   POST /containers/<id>/deploy-librechat")
+    print("   GET  /deployments")
+    print("   GET  /deployments/<deployment_id>")
+    print("   POST /deployments/<deployment_id>/resume")
+    print("   GET  /artifacts")
+    print("   DELETE /artifacts/<kind>/<key>")
+    print("   POST /fleet/deploy-librechat")
+    print("   GET  /fleet/rollouts")
+    print("   GET  /fleet/rollouts/<rollout_id>")
+    print("   POST /templates/bake")
+    print("   GET  /templates")
+    print("   GET  /templates/<template_id>")
+    print("   DELETE /templates/<template_id>")
+    print("   POST /containers/<id>/jobs")
+    print("   GET  /jobs")
+    print("   GET  /jobs/<job_id>")
+    print("   GET  /jobs/<job_id>/output")
+    print("   POST /jobs/<job_id>/cancel")
+    print("   GET  /history")
+    print("   GET  /containers/<id>/history")
     print("=" * 50)
 
-    # Run the Flask app
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+
+    try:
+        from gunicorn.app.wsgiapp import run as run_gunicorn
+    except ImportError:
+        print("⚠️  gunicorn not installed, using threaded Werkzeug server")
+        _run_threaded_server(args.host, args.port, args.drain_timeout)
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.argv = [
+        "gunicorn",
+        "--config",
+        os.path.join(here, "gunicorn.conf.py"),
+        "--chdir",
+        here,
+        "--bind",
+        f"{args.host}:{args.port}",
+        "--workers",
+        str(args.workers),
+        "--threads",
+        str(args.threads),
+        "--graceful-timeout",
+        str(int(args.drain_timeout)),
+        "container_console_api:app",
+    ]
+    run_gunicorn()
+
+
+if __name__ == "__main__":
+    main()
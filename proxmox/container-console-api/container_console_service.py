@@ -4,11 +4,72 @@ Container Console Service
 Service running on Proxmox host to execute commands in LXC containers
 """
 
+import codecs
+import os
+import shlex
+import signal
 import subprocess
+import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from admission import AdmissionController
+from command_history import CommandHistory
+from container_attach import ContainerAttach
+from container_scheduler import ContainerScheduler, QueueTimeout, Ticket
+from process_spawner import ProcessSpawner, SpawnedProcess, SpawnerUnavailable
+from query_cache import QueryCache, looks_read_only
+
+# Called with ("stdout" | "stderr", text) for each chunk of command output
+OutputCallback = Callable[[str, str], None]
+SpawnCallback = Callable[[subprocess.Popen], None]
+
+READ_CHUNK_SIZE = 64 * 1024
+# Output of a streamed command kept for its result, per stream; the client
+# already received all of it through ``on_output``
+STREAMED_OUTPUT_TAIL_CHARS = 1024 * 1024
+TRUNCATED_MARKER = "[... earlier output omitted, it was streamed ...]\n"
+
+
+@dataclass
+class ResourceUsage:
+    """Resource usage of a finished command, as reported by ``wait4``"""
+
+    user_cpu_time: float
+    system_cpu_time: float
+    max_rss_kb: int
+    block_input_ops: int
+    block_output_ops: int
+
+    @classmethod
+    def from_rusage(cls, rusage: Any) -> "ResourceUsage":
+        """Build from a ``resource.struct_rusage`` (ru_maxrss is KiB on Linux)"""
+        return cls(
+            user_cpu_time=rusage.ru_utime,
+            system_cpu_time=rusage.ru_stime,
+            max_rss_kb=rusage.ru_maxrss,
+            block_input_ops=rusage.ru_inblock,
+            block_output_ops=rusage.ru_oublock,
+        )
+
+    @property
+    def cpu_time(self) -> float:
+        return self.user_cpu_time + self.system_cpu_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert usage to JSON-serializable format"""
+        return {
+            "user_cpu_time": self.user_cpu_time,
+            "system_cpu_time": self.system_cpu_time,
+            "cpu_time": self.cpu_time,
+            "max_rss_kb": self.max_rss_kb,
+            "block_input_ops": self.block_input_ops,
+            "block_output_ops": self.block_output_ops,
+        }
 
 
 @dataclass
@@ -22,80 +83,527 @@ class CommandResult:
     execution_time: float
     timestamp: datetime
     container_id: int
+    resource_usage: Optional[ResourceUsage] = None
+    timed_out: bool = False
+    # Served from the query cache rather than run again
+    cached: bool = False
+    # Seconds spent queued behind exclusive commands in the same container
+    queue_wait: float = 0.0
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the start of streamed output was dropped from the result"""
+        return self.output.startswith(TRUNCATED_MARKER) or self.error.startswith(
+            TRUNCATED_MARKER
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert result to JSON-serializable format"""
+        return {
+            "command": self.command,
+            "output": self.output,
+            "error": self.error,
+            "exit_code": self.exit_code,
+            "execution_time": self.execution_time,
+            "timestamp": self.timestamp.isoformat(),
+            "container_id": self.container_id,
+            "resource_usage": (
+                self.resource_usage.to_dict() if self.resource_usage else None
+            ),
+            "timed_out": self.timed_out,
+            "truncated": self.truncated,
+            "cached": self.cached,
+            "queue_wait": round(self.queue_wait, 3),
+        }
+
+
+def _signal_process_group(process: subprocess.Popen, sig: int) -> None:
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def terminate_process_group(process: subprocess.Popen, grace: float = 2.0) -> None:
+    """Stop a process started with ``start_new_session`` and all its children
+
+    Sends SIGTERM to the process group, then SIGKILL if it is still running
+    after ``grace`` seconds. Does not reap the process: that is left to the
+    thread collecting its output and resource usage.
+    """
+    if grace <= 0:
+        _signal_process_group(process, signal.SIGKILL)
+        return
+    _signal_process_group(process, signal.SIGTERM)
+    timer = threading.Timer(
+        grace, _signal_process_group, args=(process, signal.SIGKILL)
+    )
+    timer.daemon = True
+    timer.start()
+
+
+class OutputTail:
+    """Output of one stream, optionally keeping only its last ``limit`` chars
+
+    :meth:`text` starts with ``TRUNCATED_MARKER`` if anything was dropped.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.truncated = False
+        self._chunks: Deque[str] = deque()
+        self._length = 0
+
+    def append(self, text: str) -> None:
+        self._chunks.append(text)
+        self._length += len(text)
+        if self.limit is None:
+            return
+        while self._length > self.limit:
+            self.truncated = True
+            drop = self._length - self.limit
+            first = self._chunks[0]
+            if len(first) <= drop:
+                self._chunks.popleft()
+                drop = len(first)
+            else:
+                self._chunks[0] = first[drop:]
+            self._length -= drop
+
+    def text(self) -> str:
+        text = "".join(self._chunks)
+        return TRUNCATED_MARKER + text if self.truncated else text
+
+
+def _collect_output(
+    process: subprocess.Popen, timeout: float, on_output: Optional[OutputCallback]
+) -> Tuple[str, str, Optional[ResourceUsage]]:
+    """Read stdout/stderr of a running process until it exits
+
+    The process is reaped with ``os.wait4`` so its resource usage (including
+    the waited-for descendants ``pct`` spawns) can be reported. Raises
+    ``subprocess.TimeoutExpired`` (carrying the output read so far) after
+    killing the process group when ``timeout`` is exceeded.
+
+    When the output is streamed to ``on_output``, only the last
+    ``STREAMED_OUTPUT_TAIL_CHARS`` of each stream are kept for the result,
+    prefixed with ``TRUNCATED_MARKER`` if anything was dropped.
+    """
+    limit = STREAMED_OUTPUT_TAIL_CHARS if on_output is not None else None
+    buffers = {"stdout": OutputTail(limit), "stderr": OutputTail(limit)}
+    usage: List[ResourceUsage] = []
+    callback_failed: List[str] = []
+
+    def reader(name: str, pipe: Any) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        fd = pipe.fileno()
+        while True:
+            data = os.read(fd, READ_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                buffers[name].append(text)
+                if on_output is not None and not callback_failed:
+                    try:
+                        on_output(name, text)
+                    except Exception:
+                        # Keep draining the pipe so the command can't block on it
+                        callback_failed.append(name)
+            if not data:
+                break
+        pipe.close()
+
+    def waiter() -> None:
+        try:
+            if isinstance(process, SpawnedProcess):
+                status, rusage = process.wait4()
+            else:
+                _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            process.returncode = -1
+            return
+        usage.append(ResourceUsage.from_rusage(rusage))
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    readers = [
+        threading.Thread(target=reader, args=(name, pipe), daemon=True)
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+    ]
+    for thread in readers:
+        thread.start()
+    wait_thread = threading.Thread(target=waiter, daemon=True)
+    wait_thread.start()
+
+    deadline = time.time() + timeout
+    wait_thread.join(timeout=timeout)
+    if wait_thread.is_alive():
+        terminate_process_group(process, grace=0)
+        wait_thread.join()
+        for thread in readers:
+            thread.join(timeout=1)
+        raise subprocess.TimeoutExpired(
+            process.args,
+            timeout,
+            output=buffers["stdout"].text(),
+            stderr=buffers["stderr"].text(),
+        )
+
+    # Background children may keep the pipes open; don't wait past the deadline
+    for thread in readers:
+        thread.join(timeout=max(deadline - time.time(), 0.1))
+
+    return (
+        buffers["stdout"].text(),
+        buffers["stderr"].text(),
+        usage[0] if usage else None,
+    )
 
 
 class ContainerConsoleManager:
     """Manages LXC container console operations"""
 
-    def __init__(self):
-        self.active_sessions = {}
+    def __init__(
+        self,
+        history: Optional[CommandHistory] = None,
+        admission: Optional[AdmissionController] = None,
+        query_cache: Optional[QueryCache] = None,
+        scheduler: Optional[ContainerScheduler] = None,
+        spawner: Optional[ProcessSpawner] = None,
+        attach: Optional[ContainerAttach] = None,
+    ):
+        # Persistent shell sessions by ID, managed by shell_session.SessionManager
+        self.active_sessions: Dict[str, Any] = {}
+        self.history = history
+        self.admission = admission
+        self.query_cache = query_cache
+        self.scheduler = scheduler
+        self.spawner = spawner
+        self.attach = attach
+        self._result_listeners: List[Callable[[CommandResult], None]] = []
+        self._inflight = 0
+        self._inflight_changed = threading.Condition()
+
+    @property
+    def inflight_commands(self) -> int:
+        """Number of commands currently executing"""
+        return self._inflight
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no commands are executing; returns False on timeout"""
+        with self._inflight_changed:
+            return self._inflight_changed.wait_for(
+                lambda: self._inflight == 0, timeout=timeout
+            )
+
+    def add_result_listener(self, listener: Callable[[CommandResult], None]) -> None:
+        """Call ``listener`` with the result of every command that finishes"""
+        self._result_listeners.append(listener)
+
+    def record(self, result: CommandResult, read_only: bool = False) -> CommandResult:
+        """Append a result to the command history and notify listeners
+
+        Unless the command is flagged ``read_only`` or registered as such, it
+        invalidates the cached query results of its container.
+        """
+        if (
+            self.query_cache is not None
+            and not read_only
+            and not self.query_cache.is_read_only(result.command)
+        ):
+            self.query_cache.invalidate(result.container_id)
+        if self.history is not None:
+            try:
+                self.history.record(result)
+            except Exception as e:
+                print(f"⚠️  Failed to record command history: {e}")
+        for listener in self._result_listeners:
+            try:
+                listener(result)
+            except Exception as e:
+                print(f"⚠️  Command result listener failed: {e}")
+        return result
 
     def execute_command(
-        self, container_id: int, command: str, timeout: int = 30
+        self,
+        container_id: int,
+        command: str,
+        timeout: int = 30,
+        on_output: Optional[OutputCallback] = None,
+        on_spawn: Optional[SpawnCallback] = None,
+        max_wait: Optional[float] = None,
+        read_only: bool = False,
+        priority: int = 0,
+        exclusive: Optional[bool] = None,
+    ) -> CommandResult:
+        """Execute a command in a specific container
+
+        ``on_output`` is called with ``("stdout" | "stderr", text)`` for every
+        chunk as it arrives; ``on_spawn`` receives the process right after it
+        starts so callers can cancel it with :func:`terminate_process_group`.
+
+        With admission control configured the command first waits for an
+        execution slot; ``max_wait`` bounds that wait and raises
+        :class:`admission.AdmissionRejected` when exceeded.
+
+        Results of read-only commands, those registered with the query cache
+        or flagged ``read_only`` and passing :func:`query_cache.looks_read_only`,
+        are reused for a few seconds instead of running the command again.
+
+        Exclusive commands (package management, service restarts, or
+        ``exclusive=True``) first queue for their turn in the container by
+        ``priority``; the wait counts against ``timeout``. They are never
+        served from the cache.
+        """
+        cache = self.query_cache
+        read_only = cache is not None and (
+            cache.is_read_only(command) or (read_only and looks_read_only(command))
+        )
+        if (
+            cache is not None
+            and read_only
+            and not self.is_exclusive(command, exclusive)
+        ):
+            cached = cache.get(container_id, command)
+            if cached is not None:
+                if on_output is not None:
+                    for stream, text in (
+                        ("stdout", cached.output),
+                        ("stderr", cached.error),
+                    ):
+                        if text:
+                            on_output(stream, text)
+                return replace(cached, cached=True)
+            generation = cache.generation(container_id)
+            with self.command_slot(max_wait):
+                result = self._execute_command(
+                    container_id, command, timeout, on_output, on_spawn, read_only=True
+                )
+            cache.put(container_id, command, result, generation)
+            return result
+
+        try:
+            with self.container_turn(
+                container_id, command, priority, exclusive, timeout
+            ) as ticket:
+                waited = ticket.waited if ticket else 0.0
+                with self.command_slot(max_wait):
+                    result = self._execute_command(
+                        container_id,
+                        command,
+                        max(int(timeout - waited), 1),
+                        on_output,
+                        on_spawn,
+                        read_only=read_only,
+                        queue_wait=waited,
+                    )
+        except QueueTimeout as e:
+            print(f"⏰ {e}")
+            return self.record(
+                CommandResult(
+                    command=command,
+                    output="",
+                    error=str(e),
+                    exit_code=-1,
+                    execution_time=0.0,
+                    timestamp=datetime.now(),
+                    container_id=container_id,
+                    timed_out=True,
+                    queue_wait=e.waited,
+                ),
+                # It never ran, so nothing changed
+                read_only=True,
+            )
+        return result
+
+    def is_exclusive(self, command: str, exclusive: Optional[bool] = None) -> bool:
+        """Whether the command must wait for its turn in the container"""
+        if self.scheduler is None:
+            return bool(exclusive)
+        return bool(exclusive) or self.scheduler.is_exclusive(command)
+
+    @contextmanager
+    def container_turn(
+        self,
+        container_id: int,
+        command: str,
+        priority: int = 0,
+        exclusive: Optional[bool] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Optional[Ticket]]:
+        """Wait for the command's turn in the container, if it needs one
+
+        Yields the scheduler ticket, or None without a scheduler configured.
+        """
+        if self.scheduler is None:
+            yield None
+            return
+        with self.scheduler.turn(
+            container_id, command, priority, exclusive, timeout
+        ) as ticket:
+            if ticket.waited >= 0.1:
+                print(
+                    f"🚦 Waited {ticket.waited:.1f}s for exclusive access "
+                    f"to container {container_id}"
+                )
+            yield ticket
+
+    @contextmanager
+    def command_slot(self, max_wait: Optional[float] = None) -> Iterator[None]:
+        """Hold an execution slot and count the command as in flight
+
+        Without admission control configured only the in-flight count applies.
+        """
+        admitted = self.admission.slot(max_wait) if self.admission else nullcontext()
+        with admitted:
+            with self._inflight_changed:
+                self._inflight += 1
+            try:
+                yield
+            finally:
+                with self._inflight_changed:
+                    self._inflight -= 1
+                    self._inflight_changed.notify_all()
+
+    def _spawn(self, command: List[str], stdin: bool = False) -> Any:
+        """Start a command in its own session, via the spawner if there is one
+
+        Either way the whole process group can be killed, and stdout and
+        stderr are pipes; stdin is a pipe if ``stdin`` is set.
+        """
+        if self.spawner is not None:
+            try:
+                return self.spawner.spawn(command, stdin=stdin)
+            except SpawnerUnavailable as e:
+                print(f"⚠️  {e}, spawning directly")
+        return subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    def spawn_shell(
+        self, container_id: int, shell: str = "bash", direct: bool = True
+    ) -> Any:
+        """Start an interactive shell in a container that reads stdin
+
+        Like commands, the shell is entered directly when the attach fast
+        path is enabled and ``direct`` is set, and with ``pct exec``
+        otherwise.
+        """
+        argv = None
+        if direct and self.attach is not None:
+            argv = self.attach.argv(container_id, f"exec {shlex.quote(shell)}")
+        if argv is None:
+            argv = ["pct", "exec", str(container_id), "--", shell]
+        return self._spawn(argv, stdin=True)
+
+    def _run(
+        self,
+        argv: List[str],
+        timeout: float,
+        on_output: Optional[OutputCallback],
+        on_spawn: Optional[SpawnCallback],
+    ) -> Tuple[str, str, Optional[ResourceUsage], int]:
+        process = self._spawn(argv)
+        if on_spawn is not None:
+            on_spawn(process)
+        stdout, stderr, usage = _collect_output(process, timeout, on_output)
+        return stdout, stderr, usage, process.returncode
+
+    def _run_in_container(
+        self,
+        container_id: int,
+        command: str,
+        timeout: float,
+        on_output: Optional[OutputCallback],
+        on_spawn: Optional[SpawnCallback],
+    ) -> Tuple[str, str, Optional[ResourceUsage], int]:
+        """Run ``bash -c command`` in a container, attaching directly if enabled
+
+        Whether to attach directly is decided before the command starts; a
+        command that ran is never started a second time.
+        """
+        argv = self.attach.argv(container_id, command) if self.attach else None
+        if argv is None:
+            # Use pct exec to run command in container
+            argv = ["pct", "exec", str(container_id), "--", "bash", "-c", command]
+        return self._run(argv, timeout, on_output, on_spawn)
+
+    def _execute_command(
+        self,
+        container_id: int,
+        command: str,
+        timeout: int,
+        on_output: Optional[OutputCallback],
+        on_spawn: Optional[SpawnCallback],
+        read_only: bool = False,
+        queue_wait: float = 0.0,
     ) -> CommandResult:
-        """Execute a command in a specific container"""
         start_time = time.time()
 
         try:
             print(f"🚀 Executing command in container {container_id}: {command}")
 
-            # Use pct exec to run command in container
-            full_command = [
-                "pct",
-                "exec",
-                str(container_id),
-                "--",
-                "bash",
-                "-c",
-                command,
-            ]
-
-            # Execute command with timeout
-            result = subprocess.run(
-                full_command, capture_output=True, text=True, timeout=timeout
+            stdout, stderr, usage, exit_code = self._run_in_container(
+                container_id, command, timeout, on_output, on_spawn
             )
 
             execution_time = time.time() - start_time
 
             command_result = CommandResult(
                 command=command,
-                output=result.stdout,
-                error=result.stderr,
-                exit_code=result.returncode,
+                output=stdout,
+                error=stderr,
+                exit_code=exit_code,
                 execution_time=execution_time,
                 timestamp=datetime.now(),
                 container_id=container_id,
+                resource_usage=usage,
+                queue_wait=queue_wait,
             )
 
+            cpu = f", cpu: {usage.cpu_time:.2f}s" if usage else ""
             print(
                 f"✅ Command completed in {execution_time:.2f}s "
-                f"(exit code: {result.returncode})"
+                f"(exit code: {exit_code}{cpu})"
             )
-            return command_result
+            return self.record(command_result, read_only)
 
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             execution_time = time.time() - start_time
             print(f"⏰ Command timed out after {timeout}s")
-            return CommandResult(
-                command=command,
-                output="",
-                error=f"Command timed out after {timeout} seconds",
-                exit_code=-1,
-                execution_time=execution_time,
-                timestamp=datetime.now(),
-                container_id=container_id,
+            return self.record(
+                CommandResult(
+                    command=command,
+                    output=e.output or "",
+                    error=f"Command timed out after {timeout} seconds",
+                    exit_code=-1,
+                    execution_time=execution_time,
+                    timestamp=datetime.now(),
+                    container_id=container_id,
+                    timed_out=True,
+                    queue_wait=queue_wait,
+                ),
+                read_only,
             )
         except Exception as e:
             execution_time = time.time() - start_time
             print(f"❌ Command execution failed: {e}")
-            return CommandResult(
-                command=command,
-                output="",
-                error=str(e),
-                exit_code=-1,
-                execution_time=execution_time,
-                timestamp=datetime.now(),
-                container_id=container_id,
+            return self.record(
+                CommandResult(
+                    command=command,
+                    output="",
+                    error=str(e),
+                    exit_code=-1,
+                    execution_time=execution_time,
+                    timestamp=datetime.now(),
+                    container_id=container_id,
+                    queue_wait=queue_wait,
+                ),
+                read_only,
             )
 
     def get_container_info(self, container_id: int) -> Dict[str, Any]:
@@ -134,6 +642,24 @@ class ContainerConsoleManager:
                 "config": "error",
             }
 
+    def get_container_tags(self, container_id: int) -> List[str]:
+        """Get the Proxmox tags of a container"""
+        result = subprocess.run(
+            ["pct", "config", str(container_id)], capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return []
+        for line in result.stdout.splitlines():
+            if line.startswith("tags:"):
+                # Proxmox stores tags separated by ';' (older versions used ',')
+                value = line.split(":", 1)[1]
+                return [
+                    tag.strip()
+                    for tag in value.replace(",", ";").split(";")
+                    if tag.strip()
+                ]
+        return []
+
     def list_containers(self) -> List[Dict[str, Any]]:
         """List all LXC containers"""
         try:
@@ -147,7 +673,7 @@ class ContainerConsoleManager:
                 for line in lines[1:]:
                     if line.strip():
                         parts = line.split()
-                        if len(parts) >= 4:
+                        if len(parts) >= 3:
                             containers.append(
                                 {
                                     "id": parts[0],
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Container Scheduler
+Per-container ordering of commands that must not overlap, such as apt
+"""
+
+import itertools
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern
+
+# Commands that take the package manager lock or restart services
+DEFAULT_EXCLUSIVE_PATTERNS = (
+    r"\b(apt|apt-get|aptitude|dpkg|dpkg-reconfigure|unattended-upgrade)\b",
+    r"\b(yum|dnf|zypper|apk|pacman|snap)\s",
+    r"get\.docker\.com",
+    r"\bsystemctl\b.*\b(start|stop|restart|reload|enable|disable|daemon-reload)\b",
+    r"\bservice\s+\S+\s+(start|stop|restart|reload)\b",
+)
+
+
+class QueueTimeout(Exception):
+    """Raised when a command is not given its turn in time"""
+
+    def __init__(self, message: str, waited: float):
+        super().__init__(message)
+        self.waited = waited
+
+
+class Ticket:
+    """A command holding, or waiting for, its turn in a container"""
+
+    def __init__(
+        self,
+        ticket_id: int,
+        container_id: int,
+        command: str,
+        priority: int,
+        exclusive: bool,
+    ):
+        self.ticket_id = ticket_id
+        self.container_id = container_id
+        self.command = command
+        self.priority = priority
+        self.exclusive = exclusive
+        self.created_at = datetime.now()
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+
+    @property
+    def sort_key(self):
+        # Higher priority first, then first come first served
+        return (-self.priority, self.ticket_id)
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent waiting for the turn, so far or in total"""
+        return (self.started or time.monotonic()) - self.enqueued
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        data = {
+            "ticket_id": self.ticket_id,
+            "command": self.command,
+            "priority": self.priority,
+            "exclusive": self.exclusive,
+            "created_at": self.created_at.isoformat(),
+            "wait_seconds": round(self.waited, 3),
+        }
+        if position is not None:
+            data["position"] = position
+        return data
+
+
+class ContainerScheduler:
+    """Runs exclusive commands in a container one at a time, by priority
+
+    A command is exclusive when it matches one of ``exclusive_patterns``
+    (package management, service restarts) or the caller says so. Exclusive
+    commands for the same container queue behind each other, highest
+    ``priority`` first and in arrival order within a priority, so two
+    ``apt install`` runs no longer fight over the dpkg lock. All other
+    commands never wait and run alongside them.
+    """
+
+    def __init__(self, exclusive_patterns: Iterable[str] = DEFAULT_EXCLUSIVE_PATTERNS):
+        self.exclusive_patterns: List[Pattern[str]] = [
+            re.compile(pattern) for pattern in exclusive_patterns
+        ]
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._ids = itertools.count(1)
+        # Per container: the exclusive command running, those waiting, and
+        # the shared commands running
+        self._holders: Dict[int, Ticket] = {}
+        self._waiting: Dict[int, List[Ticket]] = {}
+        self._shared: Dict[int, List[Ticket]] = {}
+
+    @classmethod
+    def from_env(cls) -> "ContainerScheduler":
+        """Create a scheduler, adding CONTAINER_CONSOLE_EXCLUSIVE_PATTERNS"""
+        extra = os.getenv("CONTAINER_CONSOLE_EXCLUSIVE_PATTERNS", "")
+        return cls(
+            DEFAULT_EXCLUSIVE_PATTERNS
+            + tuple(pattern for pattern in extra.split(";") if pattern.strip())
+        )
+
+    def is_exclusive(self, command: str) -> bool:
+        return any(pattern.search(command) for pattern in self.exclusive_patterns)
+
+    @contextmanager
+    def turn(
+        self,
+        container_id: int,
+        command: str,
+        priority: int = 0,
+        exclusive: Optional[bool] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Ticket]:
+        """Wait for the command's turn in the container and hold it
+
+        Raises QueueTimeout if an exclusive command is still queued after
+        ``timeout`` seconds.
+        """
+        # Callers can make a command exclusive, but not exempt one that is
+        exclusive = bool(exclusive) or self.is_exclusive(command)
+        with self._lock:
+            ticket = Ticket(next(self._ids), container_id, command, priority, exclusive)
+            if exclusive:
+                self._wait_locked(ticket, timeout)
+                self._holders[container_id] = ticket
+            else:
+                self._shared.setdefault(container_id, []).append(ticket)
+            ticket.started = time.monotonic()
+
+        try:
+            yield ticket
+        finally:
+            with self._lock:
+                if exclusive:
+                    del self._holders[container_id]
+                    self._changed.notify_all()
+                else:
+                    shared = self._shared[container_id]
+                    shared.remove(ticket)
+                    if not shared:
+                        del self._shared[container_id]
+
+    def _wait_locked(self, ticket: Ticket, timeout: Optional[float]) -> None:
+        container_id = ticket.container_id
+        waiting = self._waiting.setdefault(container_id, [])
+        waiting.append(ticket)
+        waiting.sort(key=lambda queued: queued.sort_key)
+        try:
+            granted = self._changed.wait_for(
+                lambda: container_id not in self._holders and waiting[0] is ticket,
+                timeout,
+            )
+        finally:
+            waiting.remove(ticket)
+            if not waiting:
+                del self._waiting[container_id]
+            # The next in line may now be at the front
+            self._changed.notify_all()
+        if not granted:
+            holder = self._holders.get(container_id)
+            raise QueueTimeout(
+                f"Timed out after {ticket.waited:.0f}s waiting for exclusive access "
+                f"to container {container_id}"
+                + (f" (held by: {holder.command})" if holder else ""),
+                ticket.waited,
+            )
+
+    def queue(self, container_id: int) -> Dict[str, Any]:
+        """Commands running in and queued for a container, in run order"""
+        with self._lock:
+            holder = self._holders.get(container_id)
+            return {
+                "container_id": container_id,
+                "running": holder.to_dict() if holder else None,
+                "running_shared": [
+                    ticket.to_dict() for ticket in self._shared.get(container_id, [])
+                ],
+                "waiting": [
+                    ticket.to_dict(position)
+                    for position, ticket in enumerate(
+                        self._waiting.get(container_id, []), start=1
+                    )
+                ],
+            }
+
+    def waiting_count(self) -> int:
+        """Exclusive commands queued across all containers"""
+        with self._lock:
+            return sum(len(waiting) for waiting in self._waiting.values())
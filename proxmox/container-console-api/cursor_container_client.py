@@ -4,9 +4,277 @@ Cursor Container Client
 Client for Cursor to interact with container console API
 """
 
-import requests
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+
+# Extra read time allowed beyond a command's own timeout
+COMMAND_TIMEOUT_MARGIN = 10
+
+# Methods that may be repeated without changing the outcome
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Refused before any work was done (admission control, shutdown): always safe
+REFUSED_STATUSES = frozenset({429, 503})
+
+TimeoutValue = Union[None, float, Tuple[float, float]]
+
+TRANSFER_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def default_timeout() -> Tuple[float, float]:
+    """``(connect, read)`` timeout from CONTAINER_CONSOLE_*_TIMEOUT variables"""
+    return (
+        float(os.getenv("CONTAINER_CONSOLE_CONNECT_TIMEOUT", "5")),
+        float(os.getenv("CONTAINER_CONSOLE_READ_TIMEOUT", "30")),
+    )
+
+
+class TimeoutSession(requests.Session):
+    """requests Session that applies ``timeout`` to every request
+
+    requests ignores a ``timeout`` attribute on a Session; without a
+    per-request timeout a dead server makes calls hang forever.
+    """
+
+    def __init__(self, timeout: TimeoutValue = None):
+        super().__init__()
+        self.timeout = default_timeout() if timeout is None else timeout
+
+    def request(self, method, url, **kwargs):  # type: ignore[override]
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised when the time budget of an operation has run out"""
+
+    pass
+
+
+@dataclass
+class RetryPolicy:
+    """How ResilientSession retries and hedges requests
+
+    Retry delays use full jitter: a random time up to ``backoff * 2**attempt``
+    seconds, capped at ``max_backoff`` and never shorter than a server's
+    ``Retry-After``. With ``hedge_after`` set, a GET that has not answered
+    within that many seconds is sent a second time and the first good
+    response wins.
+    """
+
+    attempts: int = 4
+    backoff: float = 0.5
+    max_backoff: float = 10.0
+    statuses: Tuple[int, ...] = (429, 502, 503, 504)
+    hedge_after: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Create a policy from CONTAINER_CONSOLE_RETRY_* variables"""
+        hedge_after = os.getenv("CONTAINER_CONSOLE_HEDGE_AFTER")
+        return cls(
+            attempts=int(os.getenv("CONTAINER_CONSOLE_RETRY_ATTEMPTS", "4")),
+            backoff=float(os.getenv("CONTAINER_CONSOLE_RETRY_BACKOFF", "0.5")),
+            max_backoff=float(os.getenv("CONTAINER_CONSOLE_RETRY_MAX_BACKOFF", "10")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number ``attempt + 1``"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class ResilientSession(TimeoutSession):
+    """TimeoutSession with retries, hedged reads and deadline budgets
+
+    Only requests that are safe to repeat are retried after a failure:
+    idempotent methods and requests carrying an ``Idempotency-Key`` header.
+    Any request is retried when the connection could not be made or the
+    server refused it before doing any work (429, 503).
+
+    :meth:`budget` bounds the total time of everything sent inside it,
+    including retries; each request's timeout is cut to the time left.
+    """
+
+    def __init__(
+        self, timeout: TimeoutValue = None, policy: Optional[RetryPolicy] = None
+    ):
+        super().__init__(timeout)
+        self.policy = RetryPolicy.from_env() if policy is None else policy
+        self.deadline: Optional[float] = None
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+
+    @contextmanager
+    def budget(self, seconds: Optional[float]) -> Iterator[None]:
+        """Limit the requests made in this block to ``seconds`` in total
+
+        Nested budgets cannot extend an outer one. ``None`` adds no limit.
+        """
+        previous = self.deadline
+        if seconds is not None:
+            deadline = time.monotonic() + seconds
+            self.deadline = deadline if previous is None else min(previous, deadline)
+        try:
+            yield
+        finally:
+            self.deadline = previous
+
+    def _remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Operation deadline exceeded")
+        return remaining
+
+    def _budgeted(self, timeout: TimeoutValue) -> TimeoutValue:
+        remaining = self._remaining()
+        if remaining is None:
+            return timeout
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return (
+            remaining if connect is None else min(connect, remaining),
+            remaining if read is None else min(read, remaining),
+        )
+
+    def request(self, method, url, **kwargs):  # type: ignore[override]
+        method = method.upper()
+        timeout = kwargs.pop("timeout", self.timeout)
+        safe = method in IDEMPOTENT_METHODS or "Idempotency-Key" in (
+            kwargs.get("headers") or {}
+        )
+        hedge = (
+            self.policy.hedge_after is not None
+            and method == "GET"
+            and not kwargs.get("stream")
+        )
+
+        attempt = 0
+        while True:
+            kwargs["timeout"] = self._budgeted(timeout)
+            try:
+                if hedge:
+                    response = self._hedged(method, url, kwargs)
+                else:
+                    response = super().request(method, url, **kwargs)
+            except DeadlineExceeded:
+                raise
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if self.deadline is not None and time.monotonic() >= self.deadline:
+                    raise DeadlineExceeded("Operation deadline exceeded") from e
+                # A request that never connected cannot have been processed
+                retryable = safe or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt + 1 >= self.policy.attempts:
+                    raise
+                delay = self.policy.delay(attempt)
+                reason = type(e).__name__
+                if not self._can_wait(delay):
+                    raise
+            else:
+                status = response.status_code
+                retryable = status in REFUSED_STATUSES or (
+                    safe and status in self.policy.statuses
+                )
+                if not retryable or attempt + 1 >= self.policy.attempts:
+                    return response
+                delay = self.policy.delay(attempt, _retry_after(response))
+                reason = f"HTTP {status}"
+                if not self._can_wait(delay):
+                    return response
+                response.close()
+
+            attempt += 1
+            print(
+                f"🔁 {method} {urlsplit(url).path} failed ({reason}), retrying "
+                f"in {delay:.1f}s (attempt {attempt + 1}/{self.policy.attempts})"
+            )
+            time.sleep(delay)
+
+    def _can_wait(self, delay: float) -> bool:
+        """Whether a retry after ``delay`` seconds still fits the budget"""
+        return self.deadline is None or time.monotonic() + delay < self.deadline
+
+    def _hedged(self, method: str, url: str, kwargs: Dict[str, Any]):
+        """Send a request, and a duplicate if the first is slow to answer"""
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix="hedge"
+            )
+
+        def send() -> requests.Response:
+            return TimeoutSession.request(self, method, url, **kwargs)
+
+        pending = {self._hedge_pool.submit(send)}
+        done, _ = wait(pending, timeout=self.policy.hedge_after)
+        if not done:
+            pending.add(self._hedge_pool.submit(send))
+
+        last: Optional[Future] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                last = future
+                if future.exception() is None and future.result().status_code < 500:
+                    # Release the connection of the losing request when it ends
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+        return last.result()  # type: ignore[union-attr]
+
+
+def _close_response(future: Future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+class _FileSlice:
+    """Up to ``length`` bytes of an open file, sent as a request body"""
+
+    def __init__(self, f: IO[bytes], length: int):
+        self.f = f
+        self.remaining = length
+
+    def __len__(self) -> int:
+        return self.remaining
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 @dataclass
@@ -22,23 +290,33 @@ class ContainerCommand:
 class CursorContainerClient:
     """Client for interacting with container console API"""
 
-    def __init__(self, api_base_url: str = None):
+    def __init__(
+        self,
+        api_base_url: str = None,
+        timeout: TimeoutValue = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         if api_base_url is None:
-            import os
-
             api_base_url = os.getenv(
                 "CONTAINER_CONSOLE_API_URL", "http://localhost:5000"
             )
 
         self.api_base_url = api_base_url
-        self.session = requests.Session()
-        self.session.timeout = 30
+        self.session = ResilientSession(timeout, retry_policy)
+        # SHA-256 of scripts the server is known to hold
+        self._registered_scripts: Set[str] = set()
+
+    def _command_timeout(self, command_timeout: float) -> Tuple[float, float]:
+        """Session timeout with the read part stretched to fit a command"""
+        timeout = self.session.timeout
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return connect, max(read, command_timeout + COMMAND_TIMEOUT_MARGIN)
 
     def test_connection(self) -> bool:
         """Test connection to the container console API"""
         try:
             print(f"🔍 Testing connection to: {self.api_base_url}/health")
-            print(f"🔍 Using session timeout: {self.session.timeout}s")
+            print(f"🔍 Using session timeout (connect, read): {self.session.timeout}s")
 
             response = self.session.get(f"{self.api_base_url}/health")
             if response.status_code == 200:
@@ -142,16 +420,33 @@ class CursorContainerClient:
             return False
 
     def execute_command(
-        self, container_id: int, command: str, timeout: int = 30
+        self,
+        container_id: int,
+        command: str,
+        timeout: int = 30,
+        idempotency_key: Optional[str] = None,
+        read_only: bool = False,
     ) -> Optional[Dict[str, Any]]:
-        """Execute a command in a container"""
+        """Execute a command in a container
+
+        Pass an ``idempotency_key`` for commands that must not run twice; a
+        repeated call with the same key returns the first result. Flag
+        commands that change nothing as ``read_only`` to let the server
+        answer repeats from its query cache.
+        """
         try:
             payload = {"command": command, "timeout": timeout}
+            if read_only:
+                payload["read_only"] = True
+            headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
 
             print(f"🚀 Executing command in container {container_id}: {command}")
 
             response = self.session.post(
-                f"{self.api_base_url}/containers/{container_id}/execute", json=payload
+                f"{self.api_base_url}/containers/{container_id}/execute",
+                json=payload,
+                headers=headers,
+                timeout=self._command_timeout(timeout),
             )
             response.raise_for_status()
             data = response.json()
@@ -164,6 +459,8 @@ class CursorContainerClient:
                     print(f"   ⚠️  Errors: {result['error'].strip()}")
                 print(f"   📊 Exit Code: {result['exit_code']}")
                 print(f"   ⏱️  Execution Time: {result['execution_time']:.2f}s")
+                if result.get("cached"):
+                    print("   ♻️  Served from the query cache")
                 return result
             else:
                 print(
@@ -175,63 +472,742 @@ class CursorContainerClient:
             print(f"❌ Error executing command: {e}")
             return None
 
-    def deploy_librechat(self, container_id: int) -> bool:
-        """Deploy LibreChat in a container"""
+    @staticmethod
+    def _iter_sse(response: requests.Response):
+        """Yield ``(event, data)`` for each Server-Sent Event of a response"""
+        event, data = "message", []
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line:
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:") :].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:") :].strip())
+
+    def _render_stream(self, response: requests.Response) -> Dict[str, Any]:
+        """Print streamed output as it arrives and return the final event"""
+        for event, data in self._iter_sse(response):
+            if event in ("stdout", "stderr"):
+                target = sys.stdout if event == "stdout" else sys.stderr
+                target.write(data["data"])
+                target.flush()
+            else:
+                return {"event": event, **data}
+        return {"event": "error", "exit_code": -1, "error": "Stream ended early"}
+
+    def execute_command_stream(
+        self, container_id: int, command: str, timeout: int = 30
+    ) -> Optional[Dict[str, Any]]:
+        """Execute a command, printing its output live as it is produced
+
+        Returns the final ``exit`` event (exit code, timing) or None on error.
+        """
+        try:
+            with self.session.post(
+                f"{self.api_base_url}/containers/{container_id}/execute/stream",
+                json={"command": command, "timeout": timeout},
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                frame = self._render_stream(response)
+            if frame["event"] != "exit":
+                print(f"❌ Command execution failed: {frame.get('error')}")
+                return None
+            return frame
+        except Exception as e:
+            print(f"❌ Error executing command: {e}")
+            return None
+
+    def open_session(self, container_id: int) -> Optional[Dict[str, Any]]:
+        """Start a persistent shell in a container"""
+        try:
+            response = self.session.post(
+                f"{self.api_base_url}/containers/{container_id}/sessions"
+            )
+            data = response.json()
+            if data["success"]:
+                return data["session"]
+            print(f"❌ Failed to open session: {data.get('error', 'Unknown error')}")
+            return None
+        except Exception as e:
+            print(f"❌ Error opening session: {e}")
+            return None
+
+    def run_in_session(
+        self, session_id: str, command: str, timeout: int = 300
+    ) -> Optional[Dict[str, Any]]:
+        """Run a command in a shell session, printing its output live
+
+        Returns the final ``exit`` event, including the shell's ``cwd`` and
+        whether the session was closed, or None on error. A session that no
+        longer exists is reported as ``{"session_closed": True, ...}``.
+        """
         try:
-            print(f"🚀 Starting LibreChat deployment in container {container_id}...")
-            print("⏳ This may take several minutes...")
+            with self.session.post(
+                f"{self.api_base_url}/sessions/{session_id}/execute/stream",
+                json={"command": command, "timeout": timeout},
+                stream=True,
+            ) as response:
+                if response.status_code in (404, 410):
+                    print("⚠️  Session has expired")
+                    return {"event": "error", "exit_code": -1, "session_closed": True}
+                if response.status_code != 200:
+                    error = response.json().get("error", response.status_code)
+                    print(f"❌ Session command failed: {error}")
+                    return None
+                frame = self._render_stream(response)
+            if frame["event"] != "exit":
+                print(f"❌ Session command failed: {frame.get('error')}")
+                return None
+            return frame
+        except Exception as e:
+            print(f"❌ Error running command in session: {e}")
+            return None
 
+    def close_session(self, session_id: str) -> bool:
+        """Close a shell session, killing anything still running in it"""
+        try:
+            response = self.session.delete(f"{self.api_base_url}/sessions/{session_id}")
+            return response.status_code == 200
+        except Exception as e:
+            print(f"❌ Error closing session: {e}")
+            return False
+
+    def register_script(self, script: str, name: Optional[str] = None) -> Optional[str]:
+        """Register a script with the server and return its SHA-256"""
+        try:
             response = self.session.post(
-                f"{self.api_base_url}/containers/{container_id}/deploy-librechat"
+                f"{self.api_base_url}/scripts", json={"script": script, "name": name}
+            )
+            data = response.json()
+            if data["success"]:
+                self._registered_scripts.add(data["script"]["sha256"])
+                return data["script"]["sha256"]
+            print(f"❌ Failed to register script: {data.get('error', 'Unknown error')}")
+            return None
+        except Exception as e:
+            print(f"❌ Error registering script: {e}")
+            return None
+
+    def run_script(
+        self,
+        container_id: int,
+        script: str,
+        args: Optional[List[str]] = None,
+        timeout: int = 300,
+        name: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Run a script in a container, sending its body only when needed
+
+        The script is addressed by its SHA-256: once the server knows it, each
+        run only sends the hash and ``args``, and the container keeps its own
+        copy after the first run.
+        """
+        sha256 = hashlib.sha256(script.encode()).hexdigest()
+        url = f"{self.api_base_url}/containers/{container_id}/scripts/{sha256}/run"
+        try:
+            for _ in range(2):
+                if sha256 not in self._registered_scripts:
+                    if self.register_script(script, name) is None:
+                        return None
+                response = self.session.post(
+                    url,
+                    json={"args": args or [], "timeout": timeout},
+                    timeout=self._command_timeout(timeout),
+                )
+                if response.status_code != 404:
+                    break
+                # The server no longer has the script, e.g. its state was reset
+                self._registered_scripts.discard(sha256)
+            data = response.json()
+            if data["success"]:
+                return data["result"]
+            print(f"❌ Script failed: {data.get('error', 'Unknown error')}")
+            return None
+        except Exception as e:
+            print(f"❌ Error running script: {e}")
+            return None
+
+    def upload_file(
+        self,
+        container_id: int,
+        local_path: str,
+        remote_path: str,
+        mode: Optional[str] = None,
+        chunk_size: int = TRANSFER_CHUNK_SIZE,
+        timeout: int = 3600,
+    ) -> bool:
+        """Copy a local file into a container, resuming after interruptions
+
+        The file is streamed from disk in ``chunk_size`` pieces. Uploading
+        the same file to the same path again continues from where the last
+        attempt stopped. ``timeout`` bounds the final chunk, which waits for
+        the server to verify the data and push it into the container.
+        """
+        try:
+            size = os.path.getsize(local_path)
+            response = self.session.post(
+                f"{self.api_base_url}/containers/{container_id}/uploads",
+                json={
+                    "path": remote_path,
+                    "size": size,
+                    "sha256": _file_sha256(local_path),
+                    "mode": mode,
+                },
+            )
+            data = response.json()
+            if not data["success"]:
+                print(
+                    f"❌ Failed to start upload: {data.get('error', 'Unknown error')}"
+                )
+                return False
+            upload = data["upload"]
+            url = f"{self.api_base_url}/uploads/{upload['upload_id']}"
+            if upload["offset"]:
+                print(f"⏩ Resuming upload at byte {upload['offset']} of {size}")
+
+            failures = 0
+            with open(local_path, "rb") as f:
+                while upload["status"] != "completed":
+                    offset = upload["offset"]
+                    f.seek(offset)
+                    try:
+                        response = self.session.patch(
+                            url,
+                            data=_FileSlice(f, min(chunk_size, size - offset)),
+                            headers={
+                                "Upload-Offset": str(offset),
+                                "Content-Type": "application/offset+octet-stream",
+                            },
+                            timeout=self._command_timeout(timeout),
+                        )
+                        data = response.json()
+                    except (requests.exceptions.RequestException, ValueError) as e:
+                        response, data = None, {"error": str(e)}
+
+                    if response is not None and response.status_code == 200:
+                        upload = data["upload"]
+                        failures = 0
+                        print(f"📤 {upload['offset']}/{size} bytes")
+                        continue
+                    if response is not None and response.status_code in (400, 404, 422):
+                        print(f"❌ Upload failed: {data.get('error')}")
+                        return False
+
+                    # Find out how much arrived before trying again
+                    failures += 1
+                    if failures >= self.session.policy.attempts:
+                        print(f"❌ Upload failed: {data.get('error')}")
+                        return False
+                    print(f"🔁 Upload interrupted ({data.get('error')}), resuming")
+                    time.sleep(self.session.policy.delay(failures - 1))
+                    status = self.session.get(url)
+                    if status.status_code != 200:
+                        print("❌ Upload has expired")
+                        return False
+                    upload = status.json()["upload"]
+
+            print(f"✅ Uploaded {local_path} to {container_id}:{remote_path}")
+            return True
+        except Exception as e:
+            print(f"❌ Error uploading file: {e}")
+            return False
+
+    def download_file(
+        self,
+        container_id: int,
+        remote_path: str,
+        local_path: str,
+        resume: bool = True,
+        timeout: int = 3600,
+    ) -> bool:
+        """Copy a file out of a container to ``local_path``
+
+        Data is written to ``local_path + ".part"`` and renamed once its
+        SHA-256 matches the server's. With ``resume`` a leftover part file
+        from an interrupted download is continued if the file is unchanged.
+        """
+        part_path = f"{local_path}.part"
+        etag_path = f"{part_path}.etag"
+        headers = {}
+        offset = 0
+        if resume and os.path.exists(part_path) and os.path.exists(etag_path):
+            with open(etag_path) as f:
+                etag = f.read().strip()
+            offset = os.path.getsize(part_path)
+            if offset:
+                headers = {"Range": f"bytes={offset}-", "If-Range": etag}
+
+        try:
+            with self.session.get(
+                f"{self.api_base_url}/containers/{container_id}/files",
+                params={"path": remote_path},
+                headers=headers,
+                stream=True,
+                timeout=self._command_timeout(timeout),
+            ) as response:
+                if response.status_code == 416:
+                    # The part file is already complete
+                    response = None
+                elif response.status_code not in (200, 206):
+                    error = response.json().get("error", response.status_code)
+                    print(f"❌ Download failed: {error}")
+                    return False
+
+                if response is not None:
+                    if response.status_code == 200:
+                        offset = 0
+                    elif offset:
+                        print(f"⏩ Resuming download at byte {offset}")
+                    with open(etag_path, "w") as f:
+                        f.write(response.headers["ETag"])
+                    with open(part_path, "r+b" if offset else "wb") as f:
+                        f.seek(offset)
+                        f.truncate()
+                        for chunk in response.iter_content(TRANSFER_CHUNK_SIZE):
+                            f.write(chunk)
+
+            with open(etag_path) as f:
+                expected = f.read().strip().strip('"')
+            if _file_sha256(part_path) != expected:
+                os.remove(part_path)
+                os.remove(etag_path)
+                print("❌ Download failed: checksum mismatch")
+                return False
+            os.replace(part_path, local_path)
+            os.remove(etag_path)
+            print(f"✅ Downloaded {container_id}:{remote_path} to {local_path}")
+            return True
+        except Exception as e:
+            print(f"❌ Error downloading file: {e}")
+            return False
+
+    def execute_batch(
+        self, items: List[Dict[str, Any]], stream: bool = False
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Execute many ``{container_id, command, timeout}`` items in one request
+
+        Returns one entry per item, in input order. With ``stream``, results are
+        printed as they complete instead of when the whole batch is done.
+        """
+        try:
+            print(f"🚀 Executing batch of {len(items)} commands...")
+            # Streamed results arrive one by one; a buffered batch may queue
+            # items behind each other before answering
+            timeouts = [item.get("timeout", 30) for item in items]
+            response = self.session.post(
+                f"{self.api_base_url}/execute/batch",
+                json={"items": items, "stream": stream},
+                stream=stream,
+                timeout=self._command_timeout(
+                    max(timeouts, default=30) if stream else sum(timeouts)
+                ),
+            )
+            response.raise_for_status()
+
+            if not stream:
+                data = response.json()
+                if not data["success"]:
+                    print(f"❌ Batch failed: {data.get('error', 'Unknown error')}")
+                    return None
+                results = data["results"]
+            else:
+                results = [None] * len(items)
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    results[entry["index"]] = entry
+                    self._print_batch_entry(entry)
+
+            failed = sum(
+                1
+                for entry in results
+                if entry is None
+                or not entry["success"]
+                or entry["result"]["exit_code"] != 0
+            )
+            print(f"✅ Batch completed: {len(items) - failed} ok, {failed} failed")
+            return results
+
+        except Exception as e:
+            print(f"❌ Error executing batch: {e}")
+            return None
+
+    @staticmethod
+    def _print_batch_entry(entry: Dict[str, Any]) -> None:
+        if not entry["success"]:
+            print(f"   ❌ [{entry['index']}] {entry['error']}")
+            return
+        result = entry["result"]
+        status = "✅" if result["exit_code"] == 0 else "❌"
+        print(
+            f"   {status} [{entry['index']}] CT {result['container_id']}: "
+            f"{result['command']} ({result['execution_time']:.2f}s)"
+        )
+
+    def submit_job(
+        self,
+        container_id: int,
+        command: str,
+        timeout: int = 3600,
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Queue a long-running command and return the job without waiting"""
+        try:
+            payload = {"command": command, "timeout": timeout, "priority": priority}
+            headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+
+            response = self.session.post(
+                f"{self.api_base_url}/containers/{container_id}/jobs",
+                json=payload,
+                headers=headers,
             )
             response.raise_for_status()
             data = response.json()
 
             if data["success"]:
-                print("✅ LibreChat deployment completed!")
+                job = data["job"]
+                print(
+                    f"📨 Job {job['job_id']} {job['status']} in container {container_id}"
+                )
+                return job
+            else:
+                print(f"❌ Failed to submit job: {data.get('error', 'Unknown error')}")
+                return None
+
+        except Exception as e:
+            print(f"❌ Error submitting job: {e}")
+            return None
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current status of a job"""
+        try:
+            response = self.session.get(f"{self.api_base_url}/jobs/{job_id}")
+            response.raise_for_status()
+            data = response.json()
+            return data["job"] if data["success"] else None
+        except Exception as e:
+            print(f"❌ Error getting job: {e}")
+            return None
+
+    def get_job_output(self, job_id: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """Fetch job output produced since ``offset``"""
+        try:
+            response = self.session.get(
+                f"{self.api_base_url}/jobs/{job_id}/output", params={"offset": offset}
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data if data["success"] else None
+        except Exception as e:
+            print(f"❌ Error getting job output: {e}")
+            return None
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a queued or running job"""
+        try:
+            response = self.session.post(f"{self.api_base_url}/jobs/{job_id}/cancel")
+            response.raise_for_status()
+            data = response.json()
+            if data["success"]:
+                print(f"🛑 Cancel requested for job {job_id}")
+            return data["success"]
+        except Exception as e:
+            print(f"❌ Error cancelling job: {e}")
+            return False
+
+    def follow_job(
+        self, job_id: str, poll_interval: float = 1.0
+    ) -> Optional[Dict[str, Any]]:
+        """Print job output as it arrives and return the finished job"""
+        offset = 0
+        while True:
+            chunk = self.get_job_output(job_id, offset)
+            if chunk is None:
+                return None
+            if chunk["output"]:
+                print(chunk["output"], end="", flush=True)
+            offset = chunk["next_offset"]
+
+            if chunk["status"] in ("succeeded", "failed", "cancelled"):
+                # Drain anything written between the last read and completion
+                if chunk["output"]:
+                    continue
+                job = self.get_job(job_id)
+                if job is not None:
+                    print(f"\n🏁 Job {job_id} {job['status']}")
+                return job
+
+            time.sleep(poll_interval)
+
+    def get_deployment(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        """Get per-step progress of a LibreChat deployment"""
+        try:
+            response = self.session.get(
+                f"{self.api_base_url}/deployments/{deployment_id}"
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data["deployment"] if data["success"] else None
+        except Exception as e:
+            print(f"❌ Error getting deployment: {e}")
+            return None
+
+    def deploy_librechat(
+        self,
+        container_id: int,
+        resume: bool = True,
+        poll_interval: float = 2.0,
+        deadline: Optional[float] = None,
+    ) -> bool:
+        """Deploy LibreChat in a container, following progress until it finishes
+
+        The deployment runs as a background job on the server. If this client
+        is interrupted, calling it again picks up the running deployment, and a
+        failed deployment is resumed from the step that failed.
+
+        Transient API errors are retried; ``deadline`` caps the seconds spent
+        following the deployment in total.
+        """
+        with self.session.budget(deadline):
+            try:
+                print(
+                    f"🚀 Starting LibreChat deployment in container {container_id}..."
+                )
+                print("⏳ This may take several minutes...")
+
+                response = self.session.post(
+                    f"{self.api_base_url}/containers/{container_id}/deploy-librechat",
+                    json={"resume": resume},
+                    # Makes the start request safe to retry
+                    headers={"Idempotency-Key": uuid.uuid4().hex},
+                )
+                response.raise_for_status()
+                data = response.json()
+
+                if not data["success"]:
+                    print(f"❌ Deployment failed: {data.get('error', 'Unknown error')}")
+                    return False
+
+                deployment = data["deployment"]
+                deployment_id = deployment["deployment_id"]
+                if not data["started"]:
+                    print(f"🔁 Deployment {deployment_id} is already in progress")
+                elif deployment["resumed_count"]:
+                    print(f"🔁 Resuming deployment {deployment_id}")
+
+                # Stream step output while the job runs
+                if deployment.get("job_id"):
+                    self.follow_job(deployment["job_id"], poll_interval=poll_interval)
+
+                deployment = self.get_deployment(deployment_id)
+                while deployment and deployment["status"] in ("pending", "running"):
+                    time.sleep(poll_interval)
+                    deployment = self.get_deployment(deployment_id)
+                if deployment is None:
+                    return False
 
                 # Show deployment results
-                results = data["deployment_results"]
                 print("\n📋 Deployment Summary:")
-                for step_result in results:
-                    status = "✅" if step_result["success"] else "❌"
-                    print(f"   {status} {step_result['step']}")
-                    if not step_result["success"]:
-                        print(f"      Error: {step_result['error']}")
+                for step in deployment["steps"]:
+                    status = {
+                        "succeeded": "✅",
+                        "skipped": "⏭️ ",
+                        "pending": "⏸️ ",
+                    }.get(step["status"], "❌")
+                    timing = (
+                        f" ({step['execution_time']:.1f}s)"
+                        if step["execution_time"] is not None
+                        else ""
+                    )
+                    print(f"   {status} {step['step']}{timing}")
+                    if step["status"] not in ("succeeded", "skipped", "pending"):
+                        print(f"      Error: {step['error'].strip() or step['status']}")
+
+                if deployment["status"] != "succeeded":
+                    print(
+                        f"❌ Deployment {deployment['status']}; "
+                        "run again to resume from the failed step"
+                    )
+                    return False
+
+                print("✅ LibreChat deployment completed!")
 
                 # Show final status
-                librechat_running = data["librechat_running"]
-                container_ip = data["container_ip"]
-                access_url = data["access_url"]
+                librechat_running = deployment["librechat_running"]
+                access_url = deployment["access_url"]
 
                 print("\n🎉 Final Status:")
                 print(
                     f"   LibreChat Running: {'✅ Yes' if librechat_running else '❌ No'}"
                 )
-                print(f"   Container IP: {container_ip}")
+                print(f"   Container IP: {deployment['container_ip']}")
                 print(f"   Access URL: {access_url}")
 
                 if librechat_running:
                     print(f"\n🌐 LibreChat is ready! Open: {access_url}")
 
                 return True
-            else:
-                print(f"❌ Deployment failed: {data.get('error', 'Unknown error')}")
+
+            except Exception as e:
+                print(f"❌ Error during deployment: {e}")
                 return False
 
-        except Exception as e:
-            print(f"❌ Error during deployment: {e}")
-            return False
+    def deploy_librechat_fleet(
+        self,
+        container_ids: Optional[List[int]] = None,
+        tag: Optional[str] = None,
+        batch_size: int = 2,
+        canary_size: int = 1,
+        max_failure_rate: float = 0.2,
+        poll_interval: float = 2.0,
+        deadline: Optional[float] = None,
+    ) -> bool:
+        """Roll LibreChat out to several containers, canary first
+
+        Containers are chosen by ID and/or Proxmox tag. Output of every
+        container is followed live, prefixed with its container ID.
+        ``deadline`` caps the seconds spent following the rollout in total.
+        """
+        with self.session.budget(deadline):
+            try:
+                payload: Dict[str, Any] = {
+                    "batch_size": batch_size,
+                    "canary_size": canary_size,
+                    "max_failure_rate": max_failure_rate,
+                }
+                if container_ids is not None:
+                    payload["container_ids"] = container_ids
+                if tag:
+                    payload["tag"] = tag
+
+                response = self.session.post(
+                    f"{self.api_base_url}/fleet/deploy-librechat", json=payload
+                )
+                data = response.json()
+                if not data["success"]:
+                    print(f"❌ Rollout failed: {data.get('error', 'Unknown error')}")
+                    return False
+
+                rollout = data["rollout"]
+                print(
+                    f"🚀 Rolling out LibreChat to {len(rollout['containers'])} "
+                    f"containers in {len(rollout['batches'])} batches"
+                )
+                for excluded in rollout["excluded"]:
+                    print(f"   ⏭️  CT {excluded['container_id']}: {excluded['reason']}")
+
+                self.follow_job(rollout["job_id"], poll_interval=poll_interval)
+
+                response = self.session.get(
+                    f"{self.api_base_url}/fleet/rollouts/{rollout['rollout_id']}"
+                )
+                response.raise_for_status()
+                rollout = response.json()["rollout"]
+
+                print("\n📋 Rollout Summary:")
+                for target in rollout["containers"]:
+                    status = {
+                        "succeeded": "✅",
+                        "aborted": "⏸️ ",
+                        "cancelled": "🛑",
+                    }.get(target["status"], "❌")
+                    canary = " (canary)" if target["canary"] else ""
+                    print(f"   {status} CT {target['container_id']}{canary}")
+                    if target["error"]:
+                        print(f"      Error: {target['error']}")
+
+                if rollout["status"] != "succeeded":
+                    print(f"❌ Rollout {rollout['status']}: {rollout['error']}")
+                    return False
+
+                print("✅ LibreChat rolled out to all containers!")
+                return True
+
+            except Exception as e:
+                print(f"❌ Error during rollout: {e}")
+                return False
+
+    def bake_template(
+        self,
+        base_template: str,
+        version: Optional[str] = None,
+        poll_interval: float = 2.0,
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        """Bake LibreChat into a versioned LXC template; returns its volume ID
+
+        The bake output is followed live. Create containers from the returned
+        ``<storage>:vztmpl/...`` volume to skip the deployment steps.
+        """
+        with self.session.budget(deadline):
+            try:
+                payload: Dict[str, Any] = {"base_template": base_template}
+                if version:
+                    payload["version"] = version
+                response = self.session.post(
+                    f"{self.api_base_url}/templates/bake", json=payload
+                )
+                data = response.json()
+                if not data["success"]:
+                    print(f"❌ Bake failed: {data.get('error', 'Unknown error')}")
+                    return None
+
+                template = data["template"]
+                print(
+                    f"🍞 Baking LibreChat template version {template['version']} "
+                    f"from {base_template}"
+                )
+                self.follow_job(template["job_id"], poll_interval=poll_interval)
+
+                response = self.session.get(
+                    f"{self.api_base_url}/templates/{template['template_id']}"
+                )
+                response.raise_for_status()
+                template = response.json()["template"]
+                if template["status"] != "succeeded":
+                    print(f"❌ Bake {template['status']}: {template['error']}")
+                    return None
+
+                manifest = template["manifest"]
+                print(f"✅ Baked {template['volid']}")
+                print(
+                    f"   {manifest['os']}, {manifest['package_count']} packages, "
+                    f"{manifest['docker_version']}"
+                )
+                return template["volid"]
+
+            except Exception as e:
+                print(f"❌ Error baking template: {e}")
+                return None
 
     def interactive_session(self, container_id: int):
-        """Start an interactive command session"""
+        """Start an interactive command session
+
+        Commands run in one persistent shell on the server, so ``cd`` and
+        exported variables carry over, and output is shown as it is produced.
+        Ctrl-C interrupts a running command by restarting the shell.
+        """
         print(f"🐳 Interactive Session for Container {container_id}")
         print("Type 'exit' to quit, 'help' for available commands")
         print("=" * 50)
 
-        while True:
-            try:
-                command = input(f"container-{container_id}> ").strip()
+        session = self.open_session(container_id)
+        if session is None:
+            return
+        cwd = session["cwd"]
+
+        try:
+            while True:
+                try:
+                    command = input(f"container-{container_id}:{cwd}$ ").strip()
+                except (KeyboardInterrupt, EOFError):
+                    print("\n👋 Goodbye!")
+                    break
 
                 if command.lower() in ["exit", "quit"]:
                     print("👋 Goodbye!")
@@ -243,20 +1219,36 @@ class CursorContainerClient:
                     print("  info - Show container info")
                     print("  status - Show container status")
                     print("  <any command> - Execute in container")
+                    continue
                 elif command.lower() == "info":
                     self.get_container_info(container_id)
+                    continue
                 elif command.lower() == "status":
+                    # Outside the shell, so the server can answer from its cache
                     self.execute_command(container_id, "ps aux | head -10")
-                elif command:
-                    self.execute_command(container_id, command)
-                else:
+                    continue
+                elif not command:
                     continue
 
-            except KeyboardInterrupt:
-                print("\n👋 Goodbye!")
-                break
-            except Exception as e:
-                print(f"❌ Error: {e}")
+                try:
+                    frame = self.run_in_session(session["session_id"], command)
+                except KeyboardInterrupt:
+                    print("\n⛔ Interrupted, restarting shell")
+                    frame = {"session_closed": True}
+                if frame is None:
+                    continue
+                if frame.get("exit_code"):
+                    print(f"   📊 Exit Code: {frame['exit_code']}")
+                cwd = frame.get("cwd") or cwd
+                if frame.get("session_closed"):
+                    self.close_session(session["session_id"])
+                    session = self.open_session(container_id)
+                    if session is None:
+                        break
+                    cwd = session["cwd"]
+        finally:
+            if session is not None:
+                self.close_session(session["session_id"])
 
 
 def main():
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Deploy Pipeline
+Dependency-ordered, parallel deployment steps with idempotent skip probes
+"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from container_console_service import CommandResult, ContainerConsoleManager
+
+SUCCEEDED = "succeeded"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+DONE_STATES = (SUCCEEDED, SKIPPED)
+
+PROBE_TIMEOUT = 15
+
+
+@dataclass(frozen=True)
+class PipelineStep:
+    """A deployment step
+
+    ``probe`` is a fast command that exits 0 when the step's effect is already
+    in place, in which case the step is skipped.
+    """
+
+    name: str
+    command: str
+    depends_on: Tuple[str, ...] = ()
+    probe: Optional[str] = None
+    timeout: int = 120
+
+
+class PipelineError(Exception):
+    """Raised for invalid pipeline definitions"""
+
+    pass
+
+
+# Hooks: step started, step finished with (status, result), step output chunk
+StepStartedCallback = Callable[[PipelineStep], None]
+StepFinishedCallback = Callable[[PipelineStep, str, Optional["CommandResult"]], None]
+StepOutputCallback = Callable[[PipelineStep, str, str], None]
+
+
+class Pipeline:
+    """A DAG of steps executed in a container with bounded parallelism"""
+
+    def __init__(self, steps: Sequence[PipelineStep]):
+        self.steps = list(steps)
+        self._by_name = {step.name: step for step in self.steps}
+        if len(self._by_name) != len(self.steps):
+            raise PipelineError("Step names must be unique")
+        for step in self.steps:
+            for dependency in step.depends_on:
+                if dependency not in self._by_name:
+                    raise PipelineError(
+                        f"Step '{step.name}' depends on unknown step '{dependency}'"
+                    )
+        self.order = self._topological_order()
+
+    def __getitem__(self, name: str) -> PipelineStep:
+        return self._by_name[name]
+
+    def _topological_order(self) -> List[PipelineStep]:
+        order: List[PipelineStep] = []
+        done: Set[str] = set()
+        visiting: Set[str] = set()
+
+        def visit(step: PipelineStep) -> None:
+            if step.name in done:
+                return
+            if step.name in visiting:
+                raise PipelineError(f"Dependency cycle through step '{step.name}'")
+            visiting.add(step.name)
+            for dependency in step.depends_on:
+                visit(self._by_name[dependency])
+            visiting.discard(step.name)
+            done.add(step.name)
+            order.append(step)
+
+        for step in self.steps:
+            visit(step)
+        return order
+
+    def run(
+        self,
+        manager: "ContainerConsoleManager",
+        container_id: int,
+        completed: Iterable[str] = (),
+        max_parallel: int = 4,
+        on_started: Optional[StepStartedCallback] = None,
+        on_finished: Optional[StepFinishedCallback] = None,
+        on_output: Optional[StepOutputCallback] = None,
+        on_spawn: Optional[Callable] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Dict[str, str]:
+        """Run all steps not in ``completed``; returns the status of each step run
+
+        Steps start as soon as all their dependencies succeeded or were
+        skipped. After a failure no new steps are started; steps already
+        running are allowed to finish. Steps that never ran are omitted from
+        the returned mapping.
+        """
+        completed = list(completed)
+        statuses: Dict[str, str] = {name: SUCCEEDED for name in completed}
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def execute(step: PipelineStep) -> str:
+            if on_started is not None:
+                on_started(step)
+
+            def forward(stream: str, text: str) -> None:
+                if on_output is not None:
+                    on_output(step, stream, text)
+
+            if step.probe:
+                probe = manager.execute_command(
+                    container_id,
+                    step.probe,
+                    timeout=min(PROBE_TIMEOUT, step.timeout),
+                    on_spawn=on_spawn,
+                )
+                if probe.exit_code == 0:
+                    if on_finished is not None:
+                        on_finished(step, SKIPPED, probe)
+                    return SKIPPED
+
+            result = manager.execute_command(
+                container_id,
+                step.command,
+                timeout=step.timeout,
+                on_output=forward,
+                on_spawn=on_spawn,
+            )
+            status = SUCCEEDED if result.exit_code == 0 else FAILED
+            if on_finished is not None:
+                on_finished(step, status, result)
+            return status
+
+        def ready() -> List[PipelineStep]:
+            with lock:
+                return [
+                    step
+                    for step in self.order
+                    if step.name not in statuses
+                    and all(
+                        statuses.get(dependency) in DONE_STATES
+                        for dependency in step.depends_on
+                    )
+                ]
+
+        running: Dict[Future, PipelineStep] = {}
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            while True:
+                stopping = failed.is_set() or (
+                    should_stop is not None and should_stop()
+                )
+                if not stopping:
+                    for step in ready():
+                        if len(running) >= max_parallel:
+                            break
+                        if step in running.values():
+                            continue
+                        running[pool.submit(execute, step)] = step
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception:
+                        status = FAILED
+                    with lock:
+                        statuses[step.name] = status
+                    if status == FAILED:
+                        failed.set()
+
+        for name in completed:
+            statuses.pop(name, None)
+        return statuses
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Fake pct
+Stand-in for the Proxmox ``pct`` command, for benchmarks and local testing
+
+Put a ``pct`` wrapper running this script first on the API server's PATH.
+Behaviour is tuned with environment variables:
+
+* ``FAKE_PCT_CONTAINERS``  number of running containers, IDs from 200 (4)
+* ``FAKE_PCT_LATENCY``     seconds each ``pct exec`` takes (0.05)
+* ``FAKE_PCT_JITTER``      random +/- fraction applied to the latency (0.2)
+* ``FAKE_PCT_OUTPUT_BYTES`` bytes of stdout written by ``pct exec`` (256)
+* ``FAKE_PCT_ERROR_RATE``  fraction of ``pct exec`` calls exiting 1 (0)
+"""
+
+import os
+import random
+import sys
+import time
+
+FIRST_CONTAINER_ID = 200
+
+
+def _env(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _container_ids():
+    count = int(_env("FAKE_PCT_CONTAINERS", 4))
+    return range(FIRST_CONTAINER_ID, FIRST_CONTAINER_ID + count)
+
+
+def _known(container_id: str) -> bool:
+    return container_id.isdigit() and int(container_id) in _container_ids()
+
+
+def _exec(container_id: str, command: list) -> int:
+    if not _known(container_id):
+        print(f"Configuration file 'nodes/pve/lxc/{container_id}.conf' does not exist")
+        return 2
+
+    latency = _env("FAKE_PCT_LATENCY", 0.05)
+    jitter = _env("FAKE_PCT_JITTER", 0.2)
+    time.sleep(max(latency * (1 + random.uniform(-jitter, jitter)), 0))
+
+    if random.random() < _env("FAKE_PCT_ERROR_RATE", 0):
+        sys.stderr.write(f"fake failure: {' '.join(command)}\n")
+        return 1
+    if command == ["echo", "test"]:
+        sys.stdout.write("test\n")
+        return 0
+
+    size = int(_env("FAKE_PCT_OUTPUT_BYTES", 256))
+    line = "x" * 79 + "\n"
+    sys.stdout.write(line * (size // len(line)) + line[: size % len(line)])
+    return 0
+
+
+def main(argv: list) -> int:
+    if not argv:
+        sys.stderr.write("usage: pct <command> [args]\n")
+        return 2
+    action, args = argv[0], argv[1:]
+
+    if action == "list":
+        print("VMID       Status     Lock         Name")
+        for container_id in _container_ids():
+            print(f"{container_id:<10} running                 bench{container_id}")
+        return 0
+    if action == "status":
+        if not _known(args[0]):
+            return 2
+        print("status: running")
+        return 0
+    if action == "config":
+        if not _known(args[0]):
+            return 2
+        print(
+            f"arch: amd64\ncores: 2\nhostname: bench{args[0]}\n"
+            "memory: 2048\nostype: debian\ntags: bench"
+        )
+        return 0
+    if action == "exec":
+        command = args[1:]
+        if command[:1] == ["--"]:
+            command = command[1:]
+        return _exec(args[0], command)
+
+    sys.stderr.write(f"fake pct: unsupported command {action}\n")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
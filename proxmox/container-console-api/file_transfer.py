@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+File Transfer
+Resumable, checksummed file uploads and downloads through pct push/pull
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import IO, TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+UPLOADING = "uploading"
+COMPLETED = "completed"
+
+
+class TransferError(Exception):
+    """Raised when a transfer cannot be carried out, e.g. ``pct push`` fails"""
+
+    pass
+
+
+class ChecksumMismatch(TransferError):
+    """Raised when uploaded data does not match the announced SHA-256"""
+
+    pass
+
+
+class UploadConflict(Exception):
+    """Raised when a chunk does not start at the upload's current offset"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in chunks so memory use stays flat"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def validate_container_path(path: Any) -> str:
+    """Return ``path`` if it is a usable absolute path inside a container"""
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise ValueError("path must be an absolute path inside the container")
+    if any(c in path for c in "\0\n\r") or path.endswith("/"):
+        raise ValueError("path must name a file")
+    return path
+
+
+class FileTransferManager:
+    """Stages files on the host and moves them with ``pct push``/``pct pull``
+
+    Uploads are written to a staging file in chunks; each chunk must start at
+    the current offset, so an interrupted upload resumes where it stopped,
+    even after a server restart. The upload ID is derived from the target
+    and the file's size and SHA-256, so a client that lost it gets the same
+    upload back by starting again. Once all bytes have arrived the staging
+    file is verified against the SHA-256 and pushed into the container.
+
+    Downloads are pulled into a staging file that is kept for ``ttl``
+    seconds, so a resumed ``Range`` request is served from the same copy.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        directory: str,
+        max_upload_bytes: int = 10 * 1024**3,
+        timeout: int = 3600,
+        ttl: float = 86400.0,
+    ):
+        self.manager = manager
+        self.upload_dir = os.path.join(directory, "uploads")
+        self.download_dir = os.path.join(directory, "downloads")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.download_dir, exist_ok=True)
+        self.max_upload_bytes = max_upload_bytes
+        self.timeout = timeout
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writing: set = set()
+        # (container_id, path) -> (staged file, sha256, size, expires at)
+        self._downloads: Dict[Tuple[int, str], Tuple[str, str, int, float]] = {}
+
+    @classmethod
+    def from_env(cls, manager: "ContainerConsoleManager") -> "FileTransferManager":
+        """Create a transfer manager from CONTAINER_CONSOLE_TRANSFER_* variables"""
+        directory = os.getenv("CONTAINER_CONSOLE_TRANSFER_DIR") or os.path.join(
+            os.getenv("CONTAINER_CONSOLE_STATE_DIR", "/var/lib/container-console"),
+            "transfers",
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            directory = os.path.join(
+                tempfile.gettempdir(), "container-console-transfers"
+            )
+            print(f"⚠️  Transfer directory unavailable ({e}), using {directory}")
+        return cls(
+            manager,
+            directory,
+            max_upload_bytes=int(
+                os.getenv("CONTAINER_CONSOLE_MAX_UPLOAD_BYTES", str(10 * 1024**3))
+            ),
+            timeout=int(os.getenv("CONTAINER_CONSOLE_TRANSFER_TIMEOUT", "3600")),
+            ttl=float(os.getenv("CONTAINER_CONSOLE_TRANSFER_TTL", "86400")),
+        )
+
+    def _pct(self, *args: str, max_wait: Optional[float] = None) -> None:
+        # Copies compete with commands for the host, so they take a slot too
+        with self.manager.command_slot(max_wait):
+            try:
+                result = subprocess.run(
+                    ["pct", *args],
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout,
+                )
+            except subprocess.TimeoutExpired:
+                raise TransferError(f"pct {args[0]} timed out after {self.timeout}s")
+        if result.returncode != 0:
+            error = result.stderr.strip() or result.stdout.strip()
+            raise TransferError(f"pct {args[0]} failed: {error or result.returncode}")
+
+    # Uploads -----------------------------------------------------------
+
+    def _upload_paths(self, upload_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.upload_dir, upload_id)
+        return f"{base}.json", f"{base}.part"
+
+    def _upload_dict(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        _, part_path = self._upload_paths(meta["upload_id"])
+        try:
+            offset = os.path.getsize(part_path)
+        except OSError:
+            offset = meta["size"] if meta["status"] == COMPLETED else 0
+        return {**meta, "offset": offset}
+
+    def _save_upload(self, meta: Dict[str, Any]) -> None:
+        meta_path, _ = self._upload_paths(meta["upload_id"])
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def start_upload(
+        self,
+        container_id: int,
+        path: str,
+        size: int,
+        sha256: str,
+        mode: Optional[str] = None,
+        user: Optional[int] = None,
+        group: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Create an upload, or return the matching unfinished one
+
+        Returns ``(upload, created)``; ``upload["offset"]`` is where the next
+        chunk must start.
+        """
+        validate_container_path(path)
+        if not isinstance(size, int) or size < 0:
+            raise ValueError("size must be a non-negative integer")
+        if size > self.max_upload_bytes:
+            raise ValueError(f"Uploads are limited to {self.max_upload_bytes} bytes")
+        sha256 = str(sha256).lower()
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise ValueError("sha256 must be a hex SHA-256 digest")
+        if mode is not None and not (
+            isinstance(mode, str) and mode.isdigit() and len(mode) in (3, 4)
+        ):
+            raise ValueError("mode must be an octal string such as '0644'")
+
+        self.expire()
+        key = json.dumps([container_id, path, size, sha256, mode, user, group])
+        upload_id = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        meta_path, part_path = self._upload_paths(upload_id)
+        with self._lock:
+            meta = self.get_upload(upload_id)
+            if meta is not None and meta["status"] == UPLOADING:
+                return meta, False
+            meta = {
+                "upload_id": upload_id,
+                "container_id": container_id,
+                "path": path,
+                "size": size,
+                "sha256": sha256,
+                "mode": mode,
+                "user": user,
+                "group": group,
+                "status": UPLOADING,
+                "created_at": datetime.now().isoformat(),
+                "updated_at": time.time(),
+            }
+            open(part_path, "wb").close()
+            self._save_upload(meta)
+        return self._upload_dict(meta), True
+
+    def get_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        if not upload_id.isalnum():
+            return None
+        meta_path, _ = self._upload_paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                return self._upload_dict(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def write_chunk(
+        self,
+        upload_id: str,
+        offset: int,
+        stream: IO[bytes],
+        max_wait: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Append the bytes of ``stream`` at ``offset``
+
+        Completes the upload once the last byte has arrived: the data is
+        verified against its SHA-256 and pushed into the container. Raises
+        KeyError for unknown uploads and UploadConflict when ``offset`` is
+        not the current end of the data.
+        """
+        with self._lock:
+            meta = self.get_upload(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            if upload_id in self._writing:
+                raise UploadConflict("A chunk is already being written", meta["offset"])
+            if meta["status"] != UPLOADING or offset != meta["offset"]:
+                raise UploadConflict(
+                    f"Upload is at offset {meta['offset']}, not {offset}",
+                    meta["offset"],
+                )
+            self._writing.add(upload_id)
+
+        _, part_path = self._upload_paths(upload_id)
+        try:
+            remaining = meta["size"] - offset
+            with open(part_path, "r+b") as f:
+                f.seek(offset)
+                while True:
+                    chunk = stream.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if len(chunk) > remaining:
+                        f.truncate(offset)
+                        raise ValueError("Chunk extends past the announced size")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            if remaining == 0:
+                self._complete(meta, max_wait)
+        finally:
+            with self._lock:
+                self._writing.discard(upload_id)
+        return self.get_upload(upload_id) or {**meta, "status": COMPLETED}
+
+    def _complete(self, meta: Dict[str, Any], max_wait: Optional[float]) -> None:
+        meta_path, part_path = self._upload_paths(meta["upload_id"])
+        if file_sha256(part_path) != meta["sha256"]:
+            # Start over: there is no telling which chunk was corrupted
+            os.truncate(part_path, 0)
+            raise ChecksumMismatch("Uploaded data does not match its SHA-256")
+
+        args = ["push", str(meta["container_id"]), part_path, meta["path"]]
+        if meta["mode"]:
+            args += ["--perms", meta["mode"]]
+        if meta["user"] is not None:
+            args += ["--user", str(meta["user"])]
+        if meta["group"] is not None:
+            args += ["--group", str(meta["group"])]
+        self._pct(*args, max_wait=max_wait)
+        if self.manager.query_cache is not None:
+            self.manager.query_cache.invalidate(meta["container_id"])
+        print(
+            f"📦 Pushed {meta['size']} bytes to {meta['container_id']}:{meta['path']}"
+        )
+
+        meta.update(status=COMPLETED, updated_at=time.time())
+        self._save_upload(meta)
+        os.remove(part_path)
+
+    def abort_upload(self, upload_id: str) -> bool:
+        """Delete an upload and its staged data"""
+        with self._lock:
+            if self.get_upload(upload_id) is None:
+                return False
+            for path in self._upload_paths(upload_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    # Downloads ---------------------------------------------------------
+
+    def stage_download(
+        self,
+        container_id: int,
+        path: str,
+        if_range: Optional[str] = None,
+        max_wait: Optional[float] = None,
+    ) -> Tuple[IO[bytes], str, int]:
+        """Return ``(open staged copy, sha256, size)`` for a file in a container
+
+        A staged copy is reused when ``if_range`` names its SHA-256, so that
+        a resumed download continues the same content; otherwise the file is
+        pulled again. The copy is opened under the lock that guards replacing
+        and expiring it, so the caller can read it to the end even if it is
+        deleted meanwhile; the caller must close it.
+        """
+        validate_container_path(path)
+        self.expire()
+        key = (container_id, path)
+        if if_range is not None:
+            with self._lock:
+                cached = self._downloads.get(key)
+                if cached is not None and cached[1] == if_range:
+                    try:
+                        return open(cached[0], "rb"), cached[1], cached[2]
+                    except FileNotFoundError:
+                        # Removed behind our back; pull it again
+                        del self._downloads[key]
+
+        fd, staged = tempfile.mkstemp(dir=self.download_dir)
+        os.close(fd)
+        try:
+            self._pct("pull", str(container_id), path, staged, max_wait=max_wait)
+            sha256 = file_sha256(staged)
+            size = os.path.getsize(staged)
+            f = open(staged, "rb")
+        except BaseException:
+            os.remove(staged)
+            raise
+
+        with self._lock:
+            previous = self._downloads.get(key)
+            self._downloads[key] = (staged, sha256, size, time.time() + self.ttl)
+            if previous is not None:
+                # Responses still reading the old copy keep it open until done
+                try:
+                    os.remove(previous[0])
+                except FileNotFoundError:
+                    pass
+        return f, sha256, size
+
+    def expire(self) -> None:
+        """Delete downloads and unfinished uploads older than ``ttl``"""
+        now = time.time()
+        with self._lock:
+            for key, (staged, _, _, expires_at) in list(self._downloads.items()):
+                if expires_at <= now:
+                    del self._downloads[key]
+                    try:
+                        os.remove(staged)
+                    except FileNotFoundError:
+                        pass
+            for name in os.listdir(self.upload_dir):
+                if not name.endswith(".json"):
+                    continue
+                upload_id = name[: -len(".json")]
+                if upload_id in self._writing:
+                    continue
+                meta_path, part_path = self._upload_paths(upload_id)
+                try:
+                    stale = os.path.getmtime(meta_path) + self.ttl <= now and (
+                        not os.path.exists(part_path)
+                        or os.path.getmtime(part_path) + self.ttl <= now
+                    )
+                except OSError:
+                    continue
+                if stale:
+                    for path in (meta_path, part_path):
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
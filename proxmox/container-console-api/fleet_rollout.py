@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Fleet Rollout
+Canary-gated, batched LibreChat deployments across many containers
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from job_queue import CANCELLED as JOB_CANCELLED
+from job_queue import FINISHED_STATES as JOB_FINISHED_STATES
+from job_queue import SUCCEEDED as JOB_SUCCEEDED
+from job_queue import Job, JobQueue, JobQueueFull
+from librechat_deployment import SUCCEEDED as DEPLOYMENT_SUCCEEDED
+from librechat_deployment import LibreChatDeployer
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ABORTED = "aborted"
+
+DEFAULT_HEALTH_CHECK = (
+    "docker ps | grep librechat && curl -fsS -o /dev/null http://localhost:3000"
+)
+HEALTH_CHECK_RETRIES = 10
+HEALTH_CHECK_INTERVAL = 6.0
+
+# Containers that must finish before the failure rate can abort a rollout
+MIN_FAILURE_SAMPLE = 5
+
+# How often a waiting batch re-checks for rollout cancellation
+CANCEL_POLL_INTERVAL = 0.5
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class FleetRollout:
+    """Rolls LibreChat out to a set of containers in batches
+
+    The first ``canary_size`` containers are deployed and health-checked
+    before anything else is touched; a failed canary aborts the rollout. The
+    remaining containers are deployed ``batch_size`` at a time, and the rollout
+    stops once the share of failed containers among those finished so far
+    exceeds ``max_failure_rate``, judged after at least ``MIN_FAILURE_SAMPLE``
+    have finished.
+    Each container's deployment is an ordinary resumable deployment record,
+    run as its own job on the shared job queue. A rollout job holds a worker
+    while it waits for those jobs, so at most ``max_workers - 1`` rollouts may
+    be active at once and one worker is always left for the deployments.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        job_queue: JobQueue,
+        deployer: LibreChatDeployer,
+    ):
+        self.manager = manager
+        self.job_queue = job_queue
+        self.deployer = deployer
+        self._lock = threading.Lock()
+        self._rollouts: Dict[str, Dict[str, Any]] = {}
+
+    # Queries -----------------------------------------------------------
+
+    def get(self, rollout_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a rollout record"""
+        with self._lock:
+            record = self._rollouts.get(rollout_id)
+            return self._copy(record) if record else None
+
+    def list_rollouts(self) -> List[Dict[str, Any]]:
+        """Rollout records, newest first"""
+        with self._lock:
+            records = [self._copy(record) for record in self._rollouts.values()]
+        return sorted(records, key=lambda record: record["created_at"], reverse=True)
+
+    @staticmethod
+    def _copy(record: Dict[str, Any]) -> Dict[str, Any]:
+        copy = dict(record)
+        copy["containers"] = [dict(target) for target in record["containers"]]
+        copy["excluded"] = [dict(target) for target in record["excluded"]]
+        return copy
+
+    # Target selection --------------------------------------------------
+
+    def resolve_targets(
+        self,
+        container_ids: Optional[Sequence[int]] = None,
+        tag: Optional[str] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Split the requested containers into deployable and excluded ones
+
+        Containers are selected by ID, by Proxmox tag, or both (intersection).
+        Only running containers are deployed.
+        """
+        running = {
+            int(container["id"]): container
+            for container in self.manager.list_containers()
+            if container.get("status") == "running"
+        }
+        if container_ids is not None:
+            candidates = list(dict.fromkeys(int(cid) for cid in container_ids))
+        else:
+            candidates = sorted(running)
+
+        targets: List[Dict[str, Any]] = []
+        excluded: List[Dict[str, Any]] = []
+        for container_id in candidates:
+            if container_id not in running:
+                excluded.append({"container_id": container_id, "reason": "not running"})
+            elif tag and tag not in self.manager.get_container_tags(container_id):
+                if container_ids is not None:
+                    excluded.append(
+                        {"container_id": container_id, "reason": f"missing tag {tag}"}
+                    )
+            else:
+                targets.append({"container_id": container_id})
+        return {"targets": targets, "excluded": excluded}
+
+    # Execution ---------------------------------------------------------
+
+    def start(
+        self,
+        container_ids: Optional[Sequence[int]] = None,
+        tag: Optional[str] = None,
+        batch_size: int = 2,
+        canary_size: int = 1,
+        max_failure_rate: float = 0.2,
+        health_check: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Plan a rollout and queue it as a background job"""
+        if container_ids is None and not tag:
+            raise ValueError("Either container_ids or tag is required")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if canary_size < 0:
+            raise ValueError("canary_size must not be negative")
+        if not 0 <= max_failure_rate <= 1:
+            raise ValueError("max_failure_rate must be between 0 and 1")
+
+        selection = self.resolve_targets(container_ids, tag)
+        targets = selection["targets"]
+        if not targets:
+            raise ValueError("No running containers match the selection")
+
+        canary_size = min(canary_size, len(targets))
+        batches = [list(range(canary_size))] if canary_size else []
+        for start in range(canary_size, len(targets), batch_size):
+            batches.append(list(range(start, min(start + batch_size, len(targets)))))
+
+        record: Dict[str, Any] = {
+            "rollout_id": uuid.uuid4().hex,
+            "job_id": None,
+            "status": PENDING,
+            "created_at": _now(),
+            "finished_at": None,
+            "tag": tag,
+            "batch_size": batch_size,
+            "canary_size": canary_size,
+            "max_failure_rate": max_failure_rate,
+            "health_check": health_check or DEFAULT_HEALTH_CHECK,
+            "current_batch": None,
+            "batches": [
+                [targets[index]["container_id"] for index in batch] for batch in batches
+            ],
+            "containers": [
+                {
+                    **target,
+                    "status": PENDING,
+                    "canary": index < canary_size,
+                    "deployment_id": None,
+                    "healthy": None,
+                    "error": None,
+                }
+                for index, target in enumerate(targets)
+            ],
+            "excluded": selection["excluded"],
+            "failure_rate": 0.0,
+            "error": None,
+        }
+        rollout_id = record["rollout_id"]
+        with self._lock:
+            active = sum(
+                1
+                for rollout in self._rollouts.values()
+                if rollout["status"] in (PENDING, RUNNING)
+            )
+            if active >= self.job_queue.max_workers - 1:
+                raise JobQueueFull(
+                    f"Too many fleet rollouts in progress ({active}); each needs "
+                    "a free job worker for its deployments"
+                )
+            self._rollouts[rollout_id] = record
+
+        try:
+            job, _ = self.job_queue.submit(
+                lambda job: self._run(rollout_id, job),
+                description=f"fleet-deploy-librechat {rollout_id}",
+                on_cancel=lambda job: self._cancel_queued(rollout_id),
+            )
+        except Exception:
+            with self._lock:
+                del self._rollouts[rollout_id]
+            raise
+        with self._lock:
+            record["job_id"] = job.job_id
+            return self._copy(record)
+
+    def _cancel_queued(self, rollout_id: str) -> None:
+        """Record a rollout whose job was cancelled before it started"""
+        with self._lock:
+            record = self._rollouts[rollout_id]
+            if record["status"] != PENDING:
+                return
+            for target in record["containers"]:
+                target["status"] = ABORTED
+            record.update({"status": CANCELLED, "finished_at": _now()})
+
+    def _run(self, rollout_id: str, job: Job) -> Dict[str, Any]:
+        with self._lock:
+            record = self._rollouts[rollout_id]
+            record["status"] = RUNNING
+        containers = {target["container_id"]: target for target in record["containers"]}
+        total = len(containers)
+
+        def abort(status: str, error: Optional[str]) -> Dict[str, Any]:
+            with self._lock:
+                for target in containers.values():
+                    if target["status"] == PENDING:
+                        target["status"] = ABORTED
+                record.update({"status": status, "error": error, "finished_at": _now()})
+            if error:
+                job.error = error
+                job.append_output("stderr", f"==> Rollout stopped: {error}\n")
+            return self.get(rollout_id)
+
+        for number, batch in enumerate(record["batches"], start=1):
+            if job.cancel_requested:
+                return abort(CANCELLED, None)
+            canary = record["canary_size"] > 0 and number == 1
+            label = "canary batch" if canary else f"batch {number}"
+            with self._lock:
+                record["current_batch"] = number
+            job.append_output(
+                "stdout",
+                f"==> Deploying {label}: {', '.join(str(c) for c in batch)}\n",
+            )
+
+            self._run_batch(record, [containers[cid] for cid in batch], job)
+            if job.cancel_requested:
+                return abort(CANCELLED, None)
+
+            with self._lock:
+                statuses = [target["status"] for target in containers.values()]
+                failures = statuses.count(FAILED)
+                finished = failures + statuses.count(SUCCEEDED)
+                if finished:
+                    record["failure_rate"] = round(failures / finished, 4)
+            if canary and failures:
+                return abort(FAILED, "Canary deployment failed, rollout aborted")
+            if (
+                finished >= min(MIN_FAILURE_SAMPLE, total)
+                and record["failure_rate"] > record["max_failure_rate"]
+            ):
+                return abort(
+                    FAILED,
+                    f"Failure rate {record['failure_rate']:.0%} exceeds "
+                    f"{record['max_failure_rate']:.0%}",
+                )
+
+        with self._lock:
+            failed = any(target["status"] == FAILED for target in containers.values())
+            error = (
+                "Some containers failed within the allowed failure rate"
+                if failed
+                else None
+            )
+            record.update(
+                {
+                    "status": FAILED if failed else SUCCEEDED,
+                    "current_batch": None,
+                    "error": error,
+                    "finished_at": _now(),
+                }
+            )
+        job.error = error
+        return self.get(rollout_id)
+
+    def _run_batch(
+        self, record: Dict[str, Any], batch: List[Dict[str, Any]], job: Job
+    ) -> None:
+        def deploy(target: Dict[str, Any], child: Job) -> None:
+            container_id = target["container_id"]
+            deployment, started = self.deployer.prepare(
+                container_id, resume=True, rollout_id=record["rollout_id"]
+            )
+            with self._lock:
+                target.update(
+                    {"status": RUNNING, "deployment_id": deployment["deployment_id"]}
+                )
+            if not started:
+                raise RuntimeError(
+                    f"Deployment {deployment['deployment_id']} is already active"
+                )
+
+            deployment = self.deployer.run(deployment["deployment_id"], child)
+            if deployment["status"] != DEPLOYMENT_SUCCEEDED:
+                raise RuntimeError(child.error or f"Deployment {deployment['status']}")
+
+            healthy = self._check_health(container_id, record["health_check"], child)
+            with self._lock:
+                target["healthy"] = healthy
+            if not healthy:
+                raise RuntimeError("Health check failed")
+
+        def finish(target: Dict[str, Any], status: str, error: Optional[str]) -> None:
+            with self._lock:
+                target.update({"status": status, "error": error})
+            job.append_output("stdout", f"==> CT {target['container_id']}: {status}\n")
+
+        # Deployments share the job queue's workers with every other job
+        running: List[Tuple[Job, Dict[str, Any]]] = []
+        for target in batch:
+            try:
+                child, _ = self.job_queue.submit(
+                    lambda child, target=target: deploy(target, child),
+                    description=(
+                        f"deploy-librechat CT {target['container_id']} "
+                        f"(rollout {record['rollout_id']})"
+                    ),
+                    container_id=target["container_id"],
+                    priority=job.priority,
+                    parent=job,
+                )
+            except (JobQueueFull, RuntimeError) as e:
+                finish(target, FAILED, str(e))
+                continue
+            running.append((child, target))
+
+        while running:
+            if job.cancel_requested:
+                for child, _ in running:
+                    child.cancel()
+            running[0][0].wait(CANCEL_POLL_INTERVAL)
+            for child, target in list(running):
+                if child.status not in JOB_FINISHED_STATES:
+                    continue
+                running.remove((child, target))
+                if child.status == JOB_SUCCEEDED:
+                    finish(target, SUCCEEDED, None)
+                elif child.status == JOB_CANCELLED or job.cancel_requested:
+                    finish(target, CANCELLED, None)
+                else:
+                    finish(target, FAILED, child.error)
+
+    def _check_health(self, container_id: int, command: str, child: Job) -> bool:
+        for attempt in range(HEALTH_CHECK_RETRIES):
+            if child.cancel_requested:
+                return False
+            result = self.manager.execute_command(
+                container_id, command, timeout=30, on_spawn=child.attach_process
+            )
+            if result.exit_code == 0:
+                return True
+            if attempt < HEALTH_CHECK_RETRIES - 1:
+                time.sleep(HEALTH_CHECK_INTERVAL)
+        return False
@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for the Container Console API
+
+Usage: gunicorn -c gunicorn.conf.py container_console_api:app
+"""
+
+import os
+
+bind = "{}:{}".format(
+    os.getenv("CONTAINER_CONSOLE_HOST", "0.0.0.0"),
+    os.getenv("CONTAINER_CONSOLE_PORT", "5000"),
+)
+
+# Commands spend their time in pct subprocesses, so threads give concurrency
+# without duplicating job and session state across processes.
+worker_class = "gthread"
+workers = int(os.getenv("CONTAINER_CONSOLE_WORKERS", "1"))
+threads = int(os.getenv("CONTAINER_CONSOLE_THREADS", "32"))
+
+# gthread heartbeats are independent of request duration; this only catches
+# workers whose main loop is stuck
+timeout = int(os.getenv("CONTAINER_CONSOLE_WORKER_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("CONTAINER_CONSOLE_DRAIN_TIMEOUT", "120"))
+keepalive = 5
+
+# Services must be created after fork, never in the master
+preload_app = False
+accesslog = "-"
+
+
+def worker_exit(server, worker):
+    """Drain background jobs and in-flight commands before the worker exits"""
+    from container_console_api import shutdown_services
+
+    shutdown_services(timeout=server.cfg.graceful_timeout)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Idempotency
+Idempotency-Key result caching with singleflight deduplication of retries
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    owner_pid INTEGER NOT NULL,
+    response TEXT,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at);
+"""
+
+# How often a request waits to see another worker's run of its key finish
+SHARED_POLL_INTERVAL = 0.2
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused for a different request"""
+
+    pass
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "value", "error", "expires_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.expires_at: Optional[float] = None
+
+
+class IdempotencyCache:
+    """Runs each idempotency key at most once per ``ttl`` seconds
+
+    The first request with a key executes; requests with the same key that
+    arrive while it runs wait for it and share its result, and later ones get
+    the cached result until it expires. Failures that produced no result
+    (exceptions) are not cached, so the request can be retried.
+
+    With ``db_path`` keys are also claimed in a SQLite table, so API worker
+    processes sharing the state directory see each other's keys. Results must
+    then be JSON-serializable. A key claimed by a worker that died before
+    finishing is taken over by the next request.
+    """
+
+    def __init__(
+        self, ttl: float = 600.0, max_entries: int = 1000, db_path: Optional[str] = None
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit; transactions are opened explicitly with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(
+                db_path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "IdempotencyCache":
+        """Create a cache from CONTAINER_CONSOLE_IDEMPOTENCY_* variables
+
+        Keys are shared through ``idempotency.db`` in
+        CONTAINER_CONSOLE_STATE_DIR.
+        """
+        db_path = os.path.join(
+            os.getenv("CONTAINER_CONSOLE_STATE_DIR", "/var/lib/container-console"),
+            "idempotency.db",
+        )
+        kwargs = {
+            "ttl": float(os.getenv("CONTAINER_CONSOLE_IDEMPOTENCY_TTL", "600")),
+            "max_entries": int(
+                os.getenv("CONTAINER_CONSOLE_IDEMPOTENCY_ENTRIES", "1000")
+            ),
+        }
+        try:
+            return cls(db_path=db_path, **kwargs)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Idempotency database unavailable ({e}), per-worker only")
+            return cls(**kwargs)
+
+    def run(
+        self, key: str, fingerprint: str, function: Callable[[], Any]
+    ) -> Tuple[Any, bool]:
+        """Return ``(value, replayed)``
+
+        ``fingerprint`` identifies the request body; reusing ``key`` with a
+        different fingerprint raises IdempotencyConflict.
+        """
+        with self._lock:
+            self._expire_locked()
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(
+                    "Idempotency-Key was already used for a different request"
+                )
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry(fingerprint)
+
+        if not owner:
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.value, True
+
+        try:
+            if self._conn is not None:
+                entry.value, replayed = self._run_shared(key, fingerprint, function)
+            else:
+                entry.value, replayed = function(), False
+        except BaseException as e:
+            entry.error = e
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry.done.set()
+
+        with self._lock:
+            entry.expires_at = time.monotonic() + self.ttl
+            self._evict_locked()
+        return entry.value, replayed
+
+    def _run_shared(
+        self, key: str, fingerprint: str, function: Callable[[], Any]
+    ) -> Tuple[Any, bool]:
+        """Claim ``key`` in the database, or replay another worker's result"""
+        pid = os.getpid()
+        while True:
+            with self._transaction() as conn:
+                conn.execute(
+                    "DELETE FROM idempotency_keys WHERE expires_at <= ?",
+                    (time.time(),),
+                )
+                row = conn.execute(
+                    "SELECT fingerprint, owner_pid, response FROM idempotency_keys "
+                    "WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO idempotency_keys (key, fingerprint, owner_pid) "
+                        "VALUES (?, ?, ?)",
+                        (key, fingerprint, pid),
+                    )
+                    break
+                stored_fingerprint, owner_pid, response = row
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyConflict(
+                        "Idempotency-Key was already used for a different request"
+                    )
+                if response is not None:
+                    return json.loads(response), True
+                if not _process_alive(owner_pid):
+                    conn.execute(
+                        "UPDATE idempotency_keys SET owner_pid = ? WHERE key = ?",
+                        (pid, key),
+                    )
+                    break
+            # Another worker is running it; wait for its result
+            time.sleep(SHARED_POLL_INTERVAL)
+
+        try:
+            value = function()
+        except BaseException:
+            with self._transaction() as conn:
+                conn.execute(
+                    "DELETE FROM idempotency_keys WHERE key = ? AND owner_pid = ?",
+                    (key, pid),
+                )
+            raise
+
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE idempotency_keys SET response = ?, expires_at = ? "
+                "WHERE key = ?",
+                (json.dumps(value), time.time() + self.ttl, key),
+            )
+            # Oldest completed keys go first; in-flight ones are never evicted
+            conn.execute(
+                "DELETE FROM idempotency_keys WHERE key IN ("
+                "SELECT key FROM idempotency_keys WHERE response IS NOT NULL "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        return value, False
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        assert self._conn is not None
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _expire_locked(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if entry.expires_at is not None and entry.expires_at <= now
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def _evict_locked(self) -> None:
+        # Oldest completed entries go first; in-flight ones are never evicted
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        for key in [k for k, e in self._entries.items() if e.done.is_set()][:excess]:
+            del self._entries[key]
+
+    def close(self) -> None:
+        """Close the database connection, if any"""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Job Queue
+Background execution of long-running container commands with submit/poll/cancel
+"""
+
+import itertools
+import os
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from container_console_service import terminate_process_group
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Stderr kept as the error of a failed command job; the rest is in its output
+ERROR_TAIL_CHARS = 4096
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs"""
+
+    pass
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+@dataclass
+class Job:
+    """A unit of background work and its captured output"""
+
+    job_id: str
+    target: Callable[["Job"], Any]
+    description: str = ""
+    container_id: Optional[int] = None
+    priority: int = 0
+    idempotency_key: Optional[str] = None
+    max_output_chars: int = 16 * 1024 * 1024
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # Job whose output also receives this job's, prefixed with the container
+    parent: Optional["Job"] = field(default=None, repr=False)
+    # Called when the job is cancelled while still queued, so it never runs
+    on_cancel: Optional[Callable[["Job"], None]] = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._output: Deque[str] = deque()
+        self._output_length = 0
+        # Absolute offset of the first character still held in memory
+        self._output_base = 0
+        self._processes: List[subprocess.Popen] = []
+        self._cancel_requested = False
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested
+
+    @property
+    def output_end(self) -> int:
+        """Absolute offset just past the last captured character"""
+        return self._output_base + self._output_length
+
+    def append_output(self, stream: str, text: str) -> None:
+        """Capture output; usable directly as an ``on_output`` callback"""
+        if not text:
+            return
+        with self._lock:
+            self._output.append(text)
+            self._output_length += len(text)
+            # Keep memory bounded by discarding the oldest output
+            while self._output_length > self.max_output_chars:
+                drop = self._output_length - self.max_output_chars
+                first = self._output[0]
+                if len(first) <= drop:
+                    self._output.popleft()
+                    drop = len(first)
+                else:
+                    self._output[0] = first[drop:]
+                self._output_length -= drop
+                self._output_base += drop
+        if self.parent is not None:
+            self.parent.append_output(
+                stream,
+                "".join(
+                    f"[CT {self.container_id}] {line}"
+                    for line in text.splitlines(keepends=True)
+                ),
+            )
+
+    def read_output(self, offset: int = 0, limit: int = 1024 * 1024) -> Dict[str, Any]:
+        """Return captured output starting at an absolute offset"""
+        with self._lock:
+            start = max(offset, self._output_base)
+            relative = start - self._output_base
+            pieces: List[str] = []
+            remaining = limit
+            for chunk in self._output:
+                if remaining <= 0:
+                    break
+                if relative >= len(chunk):
+                    relative -= len(chunk)
+                    continue
+                piece = chunk[relative : relative + remaining]
+                relative = 0
+                pieces.append(piece)
+                remaining -= len(piece)
+            text = "".join(pieces)
+            return {
+                "offset": start,
+                "next_offset": start + len(text),
+                "truncated": offset < self._output_base,
+                "output": text,
+            }
+
+    def attach_process(self, process: subprocess.Popen) -> None:
+        """Remember the running process; usable as an ``on_spawn`` callback"""
+        with self._lock:
+            # Jobs may run several commands, sometimes in parallel
+            self._processes = [p for p in self._processes if p.returncode is None]
+            self._processes.append(process)
+            cancel = self._cancel_requested
+        if cancel:
+            terminate_process_group(process)
+
+    def cancel(self) -> bool:
+        """Request cancellation; returns False if the job already finished"""
+        with self._lock:
+            if self.status in FINISHED_STATES:
+                return False
+            self._cancel_requested = True
+            processes = list(self._processes)
+            dequeued = self.status == QUEUED
+            if dequeued:
+                self.status = CANCELLED
+                self.finished_at = time.time()
+        for process in processes:
+            terminate_process_group(process)
+        if dequeued:
+            self._finished.set()
+            if self.on_cancel is not None:
+                self.on_cancel(self)
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes; returns False on timeout"""
+        return self._finished.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to JSON-serializable format
+
+        A command result is summarized without its output, which can be
+        large and is read in pages with :meth:`read_output` instead.
+        """
+        result = self.result
+        if hasattr(result, "to_dict"):
+            result = result.to_dict()
+            for name in ("output", "error"):
+                if isinstance(result.get(name), str):
+                    result[f"{name}_length"] = len(result.pop(name))
+        return {
+            "job_id": self.job_id,
+            "description": self.description,
+            "container_id": self.container_id,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+            "output_length": self.output_end,
+            "result": result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Priority queue of jobs executed by a bounded pool of worker threads"""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queued: int = 100,
+        job_ttl: float = 3600.0,
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.job_ttl = job_ttl
+
+        self._lock = threading.Lock()
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Optional[Job]]]" = (
+            queue.PriorityQueue()
+        )
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._keys: Dict[str, str] = {}
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Create a job queue from CONTAINER_CONSOLE_JOB_* variables"""
+        return cls(
+            max_workers=int(os.getenv("CONTAINER_CONSOLE_JOB_WORKERS", "4")),
+            max_queued=int(os.getenv("CONTAINER_CONSOLE_JOB_QUEUE", "100")),
+            job_ttl=float(os.getenv("CONTAINER_CONSOLE_JOB_TTL", "3600")),
+        )
+
+    def submit(
+        self,
+        target: Callable[[Job], Any],
+        description: str = "",
+        container_id: Optional[int] = None,
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+        parent: Optional[Job] = None,
+        on_cancel: Optional[Callable[[Job], None]] = None,
+    ) -> Tuple[Job, bool]:
+        """Queue a job; returns ``(job, created)``
+
+        When ``idempotency_key`` matches a job that has not expired yet, that job
+        is returned with ``created=False`` instead of queueing the work again.
+        Higher ``priority`` values run first. Output is mirrored into ``parent``,
+        and ``on_cancel`` is called if the job is cancelled before it starts.
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Job queue is shut down")
+            self._expire_locked()
+
+            if idempotency_key and idempotency_key in self._keys:
+                return self._jobs[self._keys[idempotency_key]], False
+
+            pending = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if pending >= self.max_queued:
+                raise JobQueueFull(f"Job queue is full ({pending} jobs pending)")
+
+            job = Job(
+                job_id=uuid.uuid4().hex,
+                target=target,
+                description=description,
+                container_id=container_id,
+                priority=priority,
+                idempotency_key=idempotency_key,
+                parent=parent,
+                on_cancel=on_cancel,
+            )
+            self._jobs[job.job_id] = job
+            if idempotency_key:
+                self._keys[idempotency_key] = job.job_id
+
+            self._queue.put((-priority, next(self._sequence), job))
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._worker, name=f"job-worker-{len(self._workers)}"
+                )
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+        return job, True
+
+    def submit_command(
+        self,
+        manager: "ContainerConsoleManager",
+        container_id: int,
+        command: str,
+        timeout: int = 3600,
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[Job, bool]:
+        """Queue a command for execution in a container"""
+
+        def run(job: Job) -> Any:
+            result = manager.execute_command(
+                container_id,
+                command,
+                timeout,
+                on_output=job.append_output,
+                on_spawn=job.attach_process,
+                priority=priority,
+            )
+            if result.exit_code != 0 and not job.cancel_requested:
+                job.error = (
+                    result.error.strip()[-ERROR_TAIL_CHARS:]
+                    or f"Exit code {result.exit_code}"
+                )
+            return result
+
+        return self.submit(
+            run,
+            description=command,
+            container_id=container_id,
+            priority=priority,
+            idempotency_key=idempotency_key,
+        )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by ID"""
+        with self._lock:
+            self._expire_locked()
+            return self._jobs.get(job_id)
+
+    def list_jobs(
+        self, container_id: Optional[int] = None, status: Optional[str] = None
+    ) -> List[Job]:
+        """List known jobs, newest first"""
+        with self._lock:
+            self._expire_locked()
+            jobs = list(self._jobs.values())
+        return sorted(
+            (
+                job
+                for job in jobs
+                if (container_id is None or job.container_id == container_id)
+                and (status is None or job.status == status)
+            ),
+            key=lambda job: job.created_at,
+            reverse=True,
+        )
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job"""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def shutdown(
+        self,
+        wait: bool = True,
+        cancel_pending: bool = False,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Stop accepting jobs and let workers exit once the queue drains
+
+        With ``timeout``, jobs still queued or running when it expires are
+        cancelled. Returns True if all workers exited.
+        """
+        with self._lock:
+            self._shutdown = True
+            workers = list(self._workers)
+            jobs = list(self._jobs.values())
+        if cancel_pending:
+            for job in jobs:
+                if job.status == QUEUED:
+                    job.cancel()
+        for _ in workers:
+            # Sentinels sort after every real job, so queued work finishes first
+            self._queue.put((1 << 62, next(self._sequence), None))
+        if not wait:
+            return False
+
+        deadline = None if timeout is None else time.time() + timeout
+        for worker in workers:
+            worker.join(None if deadline is None else max(deadline - time.time(), 0))
+
+        if any(worker.is_alive() for worker in workers):
+            for job in jobs:
+                job.cancel()
+            for worker in workers:
+                worker.join(timeout=5)
+        return not any(worker.is_alive() for worker in workers)
+
+    def _expire_locked(self) -> None:
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.job_ttl
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.idempotency_key:
+                self._keys.pop(job.idempotency_key, None)
+
+    def _worker(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with job._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                job.result = job.target(job)
+                if job.cancel_requested:
+                    status = CANCELLED
+                else:
+                    status = FAILED if job.error else SUCCEEDED
+            except Exception as e:
+                job.error = str(e)
+                status = CANCELLED if job.cancel_requested else FAILED
+
+            with job._lock:
+                job.status = status
+                job.finished_at = time.time()
+            job._finished.set()
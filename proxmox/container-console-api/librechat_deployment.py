@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""
+LibreChat Deployment
+Background, resumable LibreChat deployments with per-step progress
+"""
+
+import json
+import os
+import threading
+import uuid
+from dataclasses import replace
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from artifact_cache import DOCKER_PACKAGES, ArtifactCache, ArtifactError
+from deploy_pipeline import SKIPPED, Pipeline, PipelineStep
+from job_queue import Job, JobQueue
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+LIBRECHAT_IMAGE = "ghcr.io/danny-avila/librechat:latest"
+
+LIBRECHAT_PIPELINE = Pipeline(
+    [
+        PipelineStep(
+            "System Update",
+            "apt update && apt upgrade -y",
+            # Package lists refreshed within a day and nothing left to upgrade
+            probe=(
+                "test -n \"$(find /var/lib/apt/lists -maxdepth 1 -name '*_Packages' "
+                '-mmin -1440 -print -quit)" && '
+                'test -z "$(apt list --upgradable 2>/dev/null | tail -n +2)"'
+            ),
+            timeout=900,
+        ),
+        PipelineStep(
+            "Install Dependencies",
+            "apt install -y curl wget git",
+            depends_on=("System Update",),
+            probe="command -v curl && command -v wget && command -v git",
+            timeout=300,
+        ),
+        PipelineStep(
+            "Install Docker",
+            "curl -fsSL https://get.docker.com | sh",
+            depends_on=("Install Dependencies",),
+            probe="docker --version",
+            timeout=600,
+        ),
+        PipelineStep(
+            "Enable Docker",
+            "systemctl enable docker",
+            depends_on=("Install Docker",),
+            probe="systemctl is-enabled --quiet docker",
+            timeout=60,
+        ),
+        PipelineStep(
+            "Start Docker",
+            "systemctl start docker",
+            depends_on=("Install Docker",),
+            probe="systemctl is-active --quiet docker",
+            timeout=60,
+        ),
+        PipelineStep(
+            "Add User to Docker Group",
+            "usermod -aG docker $USER",
+            depends_on=("Install Docker",),
+            probe='id -nG "$USER" | grep -qw docker',
+            timeout=60,
+        ),
+        PipelineStep(
+            "Deploy LibreChat",
+            # Reuse a stopped container from an earlier run instead of failing
+            # on the name conflict
+            "docker start librechat 2>/dev/null || "
+            "docker run -d --name librechat --restart unless-stopped "
+            "-p 3000:3000 -e PUID=1000 -e PGID=1000 " + LIBRECHAT_IMAGE,
+            depends_on=("Start Docker",),
+            probe="docker ps | grep librechat",
+            timeout=600,
+        ),
+    ]
+)
+
+
+def librechat_pipeline(artifacts: Optional[ArtifactCache] = None) -> Pipeline:
+    """The LibreChat pipeline, using artifacts restored by ``artifacts`` if set
+
+    Step names stay the same, so deployments started either way resume with
+    the other. Each step still downloads when its artifact is missing.
+    """
+    if artifacts is None:
+        return LIBRECHAT_PIPELINE
+    container_dir = artifacts.container_dir
+    image = artifacts.image_path(LIBRECHAT_IMAGE)
+    commands = {
+        # Offline, upgrade from the restored package lists and .deb files
+        "System Update": (
+            f"if [ -e {container_dir}/offline ]; then apt-get upgrade -y; "
+            f"else {LIBRECHAT_PIPELINE['System Update'].command}; fi"
+        ),
+        # The restored Docker repository and packages replace get.docker.com
+        "Install Docker": (
+            f"if ls {container_dir}/docker-*.restored >/dev/null 2>&1; then "
+            f"apt-get install -y {' '.join(DOCKER_PACKAGES)}; "
+            f"else {LIBRECHAT_PIPELINE['Install Docker'].command}; fi"
+        ),
+        # Load the restored image so docker run finds it instead of pulling
+        "Deploy LibreChat": (
+            f"{{ docker image inspect {LIBRECHAT_IMAGE} >/dev/null 2>&1 || "
+            f"! [ -e {image} ] || docker load -i {image}; }} && rm -f {image} && "
+            f"{{ {LIBRECHAT_PIPELINE['Deploy LibreChat'].command}; }}"
+        ),
+    }
+    return Pipeline(
+        [
+            replace(step, command=commands.get(step.name, step.command))
+            for step in LIBRECHAT_PIPELINE.steps
+        ]
+    )
+
+
+MAX_PARALLEL_STEPS = 4
+
+# Per-step output kept in the persisted record; full output is in the job
+STEP_OUTPUT_TAIL = 4096
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+RESUMABLE_STATES = (FAILED, CANCELLED, INTERRUPTED)
+COMPLETED_STEP_STATES = (SUCCEEDED, SKIPPED)
+
+
+class DeploymentConflict(Exception):
+    """Raised when a deployment cannot be resumed in its current state"""
+
+    pass
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class LibreChatDeployer:
+    """Runs LibreChat deployments as background jobs and persists their progress
+
+    Each deployment is stored as a JSON file in ``state_dir`` after every step,
+    so a deployment that failed, was cancelled or was interrupted by a restart
+    resumes from the first step that has not succeeded yet.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        job_queue: JobQueue,
+        state_dir: Optional[str] = None,
+        artifacts: Optional[ArtifactCache] = None,
+    ):
+        self.manager = manager
+        self.job_queue = job_queue
+        self.state_dir = state_dir
+        self.artifacts = artifacts
+        self.pipeline = librechat_pipeline(artifacts)
+        self._lock = threading.Lock()
+        self._deployments: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    @classmethod
+    def from_env(
+        cls, manager: "ContainerConsoleManager", job_queue: JobQueue
+    ) -> "LibreChatDeployer":
+        """Create a deployer persisting to CONTAINER_CONSOLE_STATE_DIR
+
+        Artifacts are cached when CONTAINER_CONSOLE_ARTIFACT_CACHE is set.
+        """
+        state_dir = os.path.join(
+            os.getenv("CONTAINER_CONSOLE_STATE_DIR", "/var/lib/container-console"),
+            "deployments",
+        )
+        try:
+            os.makedirs(state_dir, exist_ok=True)
+        except OSError as e:
+            print(f"⚠️  Deployment state directory unavailable ({e}), memory only")
+            state_dir = None
+        return cls(manager, job_queue, state_dir, ArtifactCache.from_env(manager))
+
+    # Persistence -------------------------------------------------------
+
+    def _load(self) -> None:
+        if not self.state_dir or not os.path.isdir(self.state_dir):
+            return
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Skipping unreadable deployment state {name}: {e}")
+                continue
+            if record["status"] in (PENDING, RUNNING):
+                # The process died mid-deployment
+                record["status"] = INTERRUPTED
+                for step in record["steps"]:
+                    if step["status"] == RUNNING:
+                        step["status"] = INTERRUPTED
+            self._deployments[record["deployment_id"]] = record
+
+    def _save(self, record: Dict[str, Any]) -> None:
+        record["updated_at"] = _now()
+        if not self.state_dir:
+            return
+        path = os.path.join(self.state_dir, f"{record['deployment_id']}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(record, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Failed to persist deployment {record['deployment_id']}: {e}")
+
+    # Queries -----------------------------------------------------------
+
+    def get(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a deployment record"""
+        with self._lock:
+            record = self._deployments.get(deployment_id)
+            return json.loads(json.dumps(record)) if record else None
+
+    def list_deployments(
+        self, container_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Deployment records, newest first"""
+        with self._lock:
+            records = [
+                json.loads(json.dumps(record))
+                for record in self._deployments.values()
+                if container_id is None or record["container_id"] == container_id
+            ]
+        return sorted(records, key=lambda record: record["created_at"], reverse=True)
+
+    def _latest_for_container(self, container_id: int) -> Optional[Dict[str, Any]]:
+        records = [
+            record
+            for record in self._deployments.values()
+            if record["container_id"] == container_id
+        ]
+        return max(records, key=lambda r: r["created_at"]) if records else None
+
+    # Execution ---------------------------------------------------------
+
+    def start(
+        self,
+        container_id: int,
+        resume: bool = True,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Start (or resume) a deployment; returns ``(record, started)``
+
+        An active deployment for the container, or the deployment created with
+        the same ``idempotency_key``, is returned as-is. With ``resume``, the
+        latest failed, cancelled or interrupted deployment for the container
+        continues where it stopped instead of starting over.
+        """
+        record, started = self.prepare(container_id, resume, idempotency_key)
+        if not started:
+            return record, False
+        return self._schedule(record["deployment_id"], container_id), True
+
+    def _schedule(self, deployment_id: str, container_id: int) -> Dict[str, Any]:
+        """Submit a prepared deployment to the job queue"""
+        try:
+            job, _ = self.job_queue.submit(
+                lambda job: self.run(deployment_id, job),
+                description=f"deploy-librechat {deployment_id}",
+                container_id=container_id,
+            )
+        except Exception:
+            self.abandon(deployment_id)
+            raise
+        with self._lock:
+            record = self._deployments[deployment_id]
+            record["job_id"] = job.job_id
+            self._save(record)
+            return json.loads(json.dumps(record))
+
+    def prepare(
+        self,
+        container_id: int,
+        resume: bool = True,
+        idempotency_key: Optional[str] = None,
+        **extra: Any,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Create or reopen the deployment record without scheduling it
+
+        Returns ``(record, True)`` when the caller is expected to execute it
+        with :meth:`run`, or an existing active record and ``False``. Extra
+        keyword arguments are stored on the record.
+        """
+        with self._lock:
+            if idempotency_key:
+                for existing in self._deployments.values():
+                    if existing.get("idempotency_key") == idempotency_key:
+                        return json.loads(json.dumps(existing)), False
+
+            latest = self._latest_for_container(container_id)
+            if latest and latest["status"] in (PENDING, RUNNING):
+                return json.loads(json.dumps(latest)), False
+
+            if resume and latest and latest["status"] in RESUMABLE_STATES:
+                record = latest
+                record["resumed_count"] = record.get("resumed_count", 0) + 1
+            else:
+                record = {
+                    "deployment_id": uuid.uuid4().hex,
+                    "container_id": container_id,
+                    "status": PENDING,
+                    "created_at": _now(),
+                    "updated_at": _now(),
+                    "resumed_count": 0,
+                    "idempotency_key": idempotency_key,
+                    "job_id": None,
+                    "steps": [
+                        {
+                            "step": step.name,
+                            "command": step.command,
+                            "depends_on": list(step.depends_on),
+                            "status": PENDING,
+                            "started_at": None,
+                            "finished_at": None,
+                            "execution_time": None,
+                            "exit_code": None,
+                            "output": "",
+                            "error": "",
+                            "resource_usage": None,
+                        }
+                        for step in self.pipeline.order
+                    ],
+                    "librechat_running": None,
+                    "container_ip": None,
+                    "access_url": None,
+                }
+                self._deployments[record["deployment_id"]] = record
+
+            record["status"] = PENDING
+            record["job_id"] = None
+            record.update(extra)
+            self._save(record)
+            return json.loads(json.dumps(record)), True
+
+    def abandon(self, deployment_id: str) -> None:
+        """Mark a prepared deployment that will not run as resumable"""
+        with self._lock:
+            record = self._deployments[deployment_id]
+            record["status"] = INTERRUPTED
+            self._save(record)
+
+    def resume(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        """Resume a specific deployment, or return None if it does not exist
+
+        Raises DeploymentConflict unless the deployment failed, was cancelled
+        or was interrupted and is still the latest one for its container.
+        """
+        with self._lock:
+            record = self._deployments.get(deployment_id)
+            if record is None:
+                return None
+            if record["status"] not in RESUMABLE_STATES:
+                raise DeploymentConflict(
+                    f"Deployment {deployment_id} is {record['status']} "
+                    "and cannot be resumed"
+                )
+            container_id = record["container_id"]
+            if self._latest_for_container(container_id) is not record:
+                raise DeploymentConflict(
+                    f"Deployment {deployment_id} has been superseded by a newer "
+                    f"deployment to container {container_id}"
+                )
+            record["resumed_count"] = record.get("resumed_count", 0) + 1
+            record["status"] = PENDING
+            record["job_id"] = None
+            self._save(record)
+        return self._schedule(deployment_id, container_id)
+
+    def run(self, deployment_id: str, job: Job) -> Dict[str, Any]:
+        """Execute a prepared deployment, reporting progress through ``job``"""
+        with self._lock:
+            record = self._deployments[deployment_id]
+            record["status"] = RUNNING
+            self._save(record)
+        container_id = record["container_id"]
+        steps = {step["step"]: step for step in record["steps"]}
+
+        completed = [
+            name
+            for name, step in steps.items()
+            if step["status"] in COMPLETED_STEP_STATES
+        ]
+        for name in completed:
+            job.append_output("stdout", f"==> {name}: already done, skipping\n")
+
+        line_starts: Dict[str, bool] = {}
+
+        def on_started(pipeline_step: PipelineStep) -> None:
+            job.append_output("stdout", f"==> {pipeline_step.name}\n")
+            with self._lock:
+                steps[pipeline_step.name].update(
+                    {"status": RUNNING, "started_at": _now(), "finished_at": None}
+                )
+                self._save(record)
+
+        def on_output(pipeline_step: PipelineStep, stream: str, text: str) -> None:
+            # Steps can run in parallel, so tag every line with its step
+            prefix = f"[{pipeline_step.name}] "
+            tagged = []
+            for line in text.splitlines(keepends=True):
+                if line_starts.get(pipeline_step.name, True):
+                    tagged.append(prefix)
+                tagged.append(line)
+                line_starts[pipeline_step.name] = line.endswith("\n")
+            job.append_output(stream, "".join(tagged))
+
+        def on_finished(pipeline_step: PipelineStep, status: str, result) -> None:
+            if status == SKIPPED:
+                job.append_output(
+                    "stdout", f"==> {pipeline_step.name}: already satisfied, skipped\n"
+                )
+            elif not line_starts.get(pipeline_step.name, True):
+                job.append_output("stdout", "\n")
+            with self._lock:
+                steps[pipeline_step.name].update(
+                    {
+                        "status": (
+                            CANCELLED
+                            if job.cancel_requested and status == FAILED
+                            else status
+                        ),
+                        "finished_at": _now(),
+                        "execution_time": result.execution_time,
+                        "exit_code": result.exit_code,
+                        "output": result.output[-STEP_OUTPUT_TAIL:],
+                        "error": result.error[-STEP_OUTPUT_TAIL:],
+                        "resource_usage": (
+                            result.resource_usage.to_dict()
+                            if result.resource_usage
+                            else None
+                        ),
+                    }
+                )
+                self._save(record)
+
+        if self.artifacts is not None:
+            self._stage_artifacts(record, job)
+
+        statuses = self.pipeline.run(
+            self.manager,
+            container_id,
+            completed=completed,
+            max_parallel=MAX_PARALLEL_STEPS,
+            on_started=on_started,
+            on_finished=on_finished,
+            on_output=on_output,
+            on_spawn=job.attach_process,
+            should_stop=lambda: job.cancel_requested,
+        )
+
+        failed = [name for name, status in statuses.items() if status == FAILED]
+        unfinished = [
+            name
+            for name, step in steps.items()
+            if step["status"] not in COMPLETED_STEP_STATES
+        ]
+        if failed or unfinished or job.cancel_requested:
+            if failed:
+                error = steps[failed[0]]["error"].strip()
+                job.error = f"Step '{failed[0]}' failed: {error}"
+            with self._lock:
+                record["status"] = CANCELLED if job.cancel_requested else FAILED
+                self._save(record)
+            return record
+
+        # Check if LibreChat is running
+        check_result = self.manager.execute_command(
+            container_id, "docker ps | grep librechat", timeout=30
+        )
+        librechat_running = "librechat" in check_result.output
+
+        # Get container IP
+        ip_result = self.manager.execute_command(
+            container_id, "hostname -I", timeout=30
+        )
+        container_ip = (
+            ip_result.output.strip().split()[0]
+            if ip_result.output.strip()
+            else "unknown"
+        )
+
+        with self._lock:
+            record.update(
+                {
+                    "status": SUCCEEDED,
+                    "librechat_running": librechat_running,
+                    "container_ip": container_ip,
+                    "access_url": (
+                        f"http://{container_ip}:3000"
+                        if container_ip != "unknown"
+                        else "unknown"
+                    ),
+                    "finished_at": _now(),
+                    "total_time": sum(
+                        step["execution_time"] or 0 for step in record["steps"]
+                    ),
+                }
+            )
+            self._save(record)
+        job.append_output(
+            "stdout",
+            f"==> LibreChat running: {'yes' if librechat_running else 'no'}, "
+            f"access URL: {record['access_url']}\n",
+        )
+        if self.artifacts is not None:
+            self._harvest_artifacts(record, job)
+        return record
+
+    # Artifact cache ----------------------------------------------------
+
+    def _stage_artifacts(self, record: Dict[str, Any], job: Job) -> None:
+        """Restore cached artifacts; without them the steps download as usual"""
+        job.append_output("stdout", "==> Restore Artifacts\n")
+        try:
+            staged = self.artifacts.stage(  # type: ignore[union-attr]
+                record["container_id"],
+                [LIBRECHAT_IMAGE],
+                emit=lambda line: job.append_output("stdout", f"{line}\n"),
+            )
+        except ArtifactError as e:
+            job.append_output("stderr", f"Artifact cache unavailable: {e}\n")
+            return
+        with self._lock:
+            record["artifacts"] = {**staged, "harvested": []}
+            self._save(record)
+
+    def _harvest_artifacts(self, record: Dict[str, Any], job: Job) -> None:
+        """Cache what a successful deployment downloaded for the next ones"""
+        try:
+            harvested = self.artifacts.harvest(  # type: ignore[union-attr]
+                record["container_id"],
+                [LIBRECHAT_IMAGE],
+                emit=lambda line: job.append_output("stdout", f"{line}\n"),
+            )
+        except ArtifactError as e:
+            job.append_output("stderr", f"Caching artifacts failed: {e}\n")
+            return
+        with self._lock:
+            record.setdefault("artifacts", {})["harvested"] = harvested
+            self._save(record)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Metrics
+Prometheus text-format metrics for the container console API
+"""
+
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from container_console_service import CommandResult
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COMMAND_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# Peak resident memory of a command, 4 MiB to 16 GiB
+MEMORY_BUCKETS = tuple(float(2**n) for n in range(22, 35, 2))
+
+LabelValues = Tuple[str, ...]
+MetricT = TypeVar("MetricT", bound="Metric")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric(ABC):
+    """Base class for a metric family with a fixed set of label names"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """``(suffix, formatted labels, value)`` for every sample"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count; its name should end in ``_total``"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            ("", _format_labels(self.labelnames, key), value) for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """Current value, read from a callback at scrape time
+
+    The callback returns a number for unlabelled gauges, or a mapping of
+    label value tuples to numbers.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], object],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        value = self.callback()
+        if not self.labelnames:
+            return [("", "", float(value))]  # type: ignore[arg-type]
+        return [
+            ("", _format_labels(self.labelnames, key), float(sample))
+            for key, sample in sorted(value.items())  # type: ignore[union-attr]
+        ]
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = REQUEST_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (last slot is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total[0]))
+                for key, (counts, total) in self._values.items()
+            )
+        samples = []
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(
+                    (
+                        "_bucket",
+                        _format_labels(names, key + (_format_value(bound),)),
+                        cumulative,
+                    )
+                )
+            labels = _format_labels(self.labelnames, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: MetricT) -> MetricT:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+class ConsoleMetrics:
+    """The metrics exported by the container console API
+
+    Gauges read the current state through the callbacks passed in, so they
+    cost nothing until scraped.
+    """
+
+    def __init__(
+        self,
+        inflight_commands: Callable[[], int],
+        queued_commands: Callable[[], int],
+        active_sessions: Callable[[], int],
+        job_counts: Callable[[], Dict[str, int]],
+    ):
+        self.registry = MetricsRegistry()
+        self.request_duration = self.registry.register(
+            Histogram(
+                "container_console_http_request_duration_seconds",
+                "Time to produce an HTTP response, by route",
+                ("method", "route", "status"),
+                REQUEST_BUCKETS,
+            )
+        )
+        self.command_duration = self.registry.register(
+            Histogram(
+                "container_console_command_duration_seconds",
+                "Duration of pct exec commands, by container",
+                ("container_id",),
+                COMMAND_BUCKETS,
+            )
+        )
+        self.command_exits = self.registry.register(
+            Counter(
+                "container_console_commands_total",
+                "Completed pct exec commands, by container and exit code",
+                ("container_id", "exit_code"),
+            )
+        )
+        self.command_timeouts = self.registry.register(
+            Counter(
+                "container_console_command_timeouts_total",
+                "pct exec commands killed after their timeout, by container",
+                ("container_id",),
+            )
+        )
+        self.command_cpu = self.registry.register(
+            Counter(
+                "container_console_command_cpu_seconds_total",
+                "CPU time used by pct exec commands, by container and mode",
+                ("container_id", "mode"),
+            )
+        )
+        self.command_memory = self.registry.register(
+            Histogram(
+                "container_console_command_max_rss_bytes",
+                "Peak resident memory of pct exec commands, by container",
+                ("container_id",),
+                MEMORY_BUCKETS,
+            )
+        )
+        self.command_block_io = self.registry.register(
+            Counter(
+                "container_console_command_block_io_operations_total",
+                "Block I/O operations of pct exec commands, by container and "
+                "direction",
+                ("container_id", "direction"),
+            )
+        )
+        self.admission_rejections = self.registry.register(
+            Counter(
+                "container_console_admission_rejections_total",
+                "Requests refused with 429 by admission control, by reason",
+                ("reason",),
+            )
+        )
+        self.registry.register(
+            Gauge(
+                "container_console_inflight_commands",
+                "Commands currently executing",
+                inflight_commands,
+            )
+        )
+        self.registry.register(
+            Gauge(
+                "container_console_queued_commands",
+                "Commands waiting for a worker or an execution slot",
+                queued_commands,
+            )
+        )
+        self.registry.register(
+            Gauge(
+                "container_console_active_sessions",
+                "Open interactive console sessions",
+                active_sessions,
+            )
+        )
+        self.registry.register(
+            Gauge(
+                "container_console_jobs",
+                "Background jobs currently known, by status",
+                lambda: {(status,): count for status, count in job_counts().items()},
+                ("status",),
+            )
+        )
+
+    def observe_request(
+        self, method: str, route: str, status: int, seconds: float
+    ) -> None:
+        """Record the latency of an HTTP request"""
+        self.request_duration.observe(
+            seconds, method=method, route=route, status=status
+        )
+
+    def observe_rejection(self, reason: str) -> None:
+        """Record a request refused by admission control"""
+        self.admission_rejections.inc(reason=reason)
+
+    def observe_command(self, result: "CommandResult") -> None:
+        """Record a finished command; usable as a manager result listener"""
+        container_id = result.container_id
+        self.command_duration.observe(result.execution_time, container_id=container_id)
+        self.command_exits.inc(container_id=container_id, exit_code=result.exit_code)
+        if result.timed_out:
+            self.command_timeouts.inc(container_id=container_id)
+        usage = result.resource_usage
+        if usage is not None:
+            self.command_cpu.inc(
+                usage.user_cpu_time, container_id=container_id, mode="user"
+            )
+            self.command_cpu.inc(
+                usage.system_cpu_time, container_id=container_id, mode="system"
+            )
+            self.command_memory.observe(
+                usage.max_rss_kb * 1024, container_id=container_id
+            )
+            self.command_block_io.inc(
+                usage.block_input_ops, container_id=container_id, direction="read"
+            )
+            self.command_block_io.inc(
+                usage.block_output_ops, container_id=container_id, direction="write"
+            )
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format"""
+        return self.registry.render()
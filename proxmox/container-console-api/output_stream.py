@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Output Stream
+Bounded hand-off of live command output to a Server-Sent Events response
+"""
+
+import json
+import queue
+import subprocess
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from container_console_service import terminate_process_group
+
+
+class StreamClosed(Exception):
+    """Raised to the producer when the consuming client has gone away"""
+
+    pass
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class OutputStream:
+    """Bridges command output from a worker thread to a streaming response
+
+    ``write`` blocks while ``max_chunks`` chunks are waiting to be sent, so a
+    slow client stalls the command on its own pipe instead of making the server
+    buffer its output. When the client disconnects the command is killed.
+    """
+
+    def __init__(self, max_chunks: int = 64, heartbeat: float = 15.0):
+        self.heartbeat = heartbeat
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(
+            maxsize=max_chunks
+        )
+        self._closed = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def attach_process(self, process: subprocess.Popen) -> None:
+        """Remember the running process; usable as an ``on_spawn`` callback"""
+        with self._lock:
+            self._process = process
+        if self.closed:
+            terminate_process_group(process)
+
+    def _put(self, item: Tuple[str, Dict[str, Any]]) -> None:
+        while True:
+            if self.closed:
+                raise StreamClosed("Client disconnected")
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, stream: str, text: str) -> None:
+        """Queue an output chunk; usable as an ``on_output`` callback"""
+        self._put((stream, {"data": text}))
+
+    def finish(self, frame: Dict[str, Any], event: str = "exit") -> None:
+        """Queue the final frame; the event stream ends after it is sent"""
+        try:
+            self._put((event, frame))
+        except StreamClosed:
+            pass
+
+    def close(self) -> None:
+        """Stop streaming and kill the command if it is still running"""
+        self._closed.set()
+        with self._lock:
+            process = self._process
+        if process is not None:
+            terminate_process_group(process)
+
+    def events(self) -> Iterator[str]:
+        """Yield SSE frames until the final frame has been sent"""
+        try:
+            while True:
+                try:
+                    event, data = self._queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Comment line keeps idle connections and proxies alive
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(event, data)
+                if event not in ("stdout", "stderr"):
+                    return
+        finally:
+            self.close()
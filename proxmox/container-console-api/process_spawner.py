@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Process Spawner
+Small helper process that launches pct commands with posix_spawn
+
+The API process is large (Flask, the app, caches) and forking it for every
+``pct exec`` copies its page tables each time. Instead a helper, started
+once from a fresh interpreter that imports only the standard library,
+listens on a Unix socket. For each command the API sends the argv and the
+write ends of its stdout/stderr pipes (``SCM_RIGHTS``), preceded by the
+read end of a stdin pipe for interactive commands; the helper starts
+the command with ``posix_spawn`` in a new session, replies with the PID,
+reaps it, and sends back the exit status and resource usage.
+
+Run directly only for debugging: ``python3 process_spawner.py <socket>``.
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+HEADER_BYTES = 8
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+START_TIMEOUT = 10.0
+# After the helper fails to start, spawn directly for this long
+RESTART_BACKOFF = 60.0
+
+RUSAGE_FIELDS = ("ru_utime", "ru_stime", "ru_maxrss", "ru_inblock", "ru_oublock")
+
+
+class SpawnerUnavailable(Exception):
+    """Raised when the helper cannot be started or reached"""
+
+    pass
+
+
+# Helper process -------------------------------------------------------
+
+
+def _send(conn: socket.socket, message: Dict[str, Any]) -> None:
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _handle(conn: socket.socket, devnull: int) -> None:
+    with conn:
+        # An 8-byte length carrying the descriptors, then the JSON request
+        try:
+            header, fds, _, _ = socket.recv_fds(
+                conn, HEADER_BYTES, 3, socket.MSG_CMSG_CLOEXEC
+            )
+        except OSError:
+            return
+        try:
+            length = int.from_bytes(header, "big") if len(header) == HEADER_BYTES else 0
+            if not 0 < length <= MAX_MESSAGE_BYTES:
+                raise ValueError("bad request header")
+            data = b""
+            while len(data) < length:
+                chunk = conn.recv(length - len(data))
+                if not chunk:
+                    raise ValueError("truncated request")
+                data += chunk
+            request = json.loads(data)
+            if len(fds) not in (2, 3):
+                raise ValueError("expected stdout and stderr descriptors")
+            # An optional stdin pipe comes first
+            stdin = fds[0] if len(fds) == 3 else devnull
+            argv = [str(arg) for arg in request["argv"]]
+            pid = os.posix_spawnp(
+                argv[0],
+                argv,
+                os.environ,
+                file_actions=[
+                    (os.POSIX_SPAWN_DUP2, stdin, 0),
+                    (os.POSIX_SPAWN_DUP2, fds[-2], 1),
+                    (os.POSIX_SPAWN_DUP2, fds[-1], 2),
+                ],
+                setsid=True,
+            )
+        except Exception as e:
+            _send(conn, {"error": f"{type(e).__name__}: {e}"})
+            return
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+        try:
+            _send(conn, {"pid": pid})
+        except OSError:
+            pass
+        _, status, rusage = os.wait4(pid, 0)
+        try:
+            _send(
+                conn,
+                {
+                    "status": status,
+                    "rusage": {name: getattr(rusage, name) for name in RUSAGE_FIELDS},
+                },
+            )
+        except OSError:
+            pass
+
+
+def serve(socket_path: str) -> None:
+    """Accept spawn requests on ``socket_path`` until stdin is closed"""
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(128)
+
+    # Exit together with the API process, which holds the other end of stdin
+    def watch_parent() -> None:
+        sys.stdin.buffer.read()
+        os._exit(0)
+
+    threading.Thread(target=watch_parent, daemon=True).start()
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+    while True:
+        conn, _ = server.accept()
+        threading.Thread(target=_handle, args=(conn, devnull), daemon=True).start()
+
+
+# API side -------------------------------------------------------------
+
+
+class SpawnedProcess:
+    """A command started by the helper, shaped like ``subprocess.Popen``
+
+    ``stdout``/``stderr`` are the read ends of the output pipes, ``stdin``
+    the write end of the input pipe if one was asked for, and ``pid`` leads
+    a new process group, so the usual readers and ``terminate_process_group``
+    work unchanged. The process is not a child of this one: :meth:`wait4`
+    waits for the helper's exit report instead.
+    """
+
+    def __init__(
+        self,
+        args: Sequence[str],
+        pid: int,
+        stdout: Any,
+        stderr: Any,
+        conn: socket.socket,
+        replies: Any,
+        stdin: Any = None,
+    ):
+        self.args = list(args)
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self._conn = conn
+        self._replies = replies
+
+    def wait4(self) -> Tuple[int, Any]:
+        """Block until the command exits; returns ``(status, rusage)``"""
+        try:
+            line = self._replies.readline()
+        finally:
+            self._replies.close()
+            self._conn.close()
+        if not line:
+            raise ChildProcessError(f"Spawner lost track of process {self.pid}")
+        reply = json.loads(line)
+        return reply["status"], SimpleNamespace(**reply["rusage"])
+
+    def wait(self) -> int:
+        """Block until the command exits and return its exit code"""
+        try:
+            status, _ = self.wait4()
+            self.returncode = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            self.returncode = -1
+        return self.returncode
+
+
+class ProcessSpawner:
+    """Starts the helper on first use and sends it commands to launch
+
+    One helper serves one API process; it is restarted if it dies.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._helper: Optional[subprocess.Popen] = None
+        self._socket_path: Optional[str] = None
+        self._failed_at = float("-inf")
+
+    @classmethod
+    def from_env(cls) -> Optional["ProcessSpawner"]:
+        """A spawner if CONTAINER_CONSOLE_SPAWNER asks for one
+
+        ``1`` always uses the helper and ``0`` never does. The default,
+        ``auto``, uses it on Python before 3.10, whose ``subprocess`` really
+        forks the API process; newer versions start commands with ``vfork``,
+        which shares the parent's memory instead of copying its page tables
+        and is faster than a round trip to the helper.
+        """
+        setting = os.getenv("CONTAINER_CONSOLE_SPAWNER", "auto").lower()
+        if setting == "auto":
+            enabled = sys.version_info < (3, 10)
+        else:
+            enabled = setting not in ("0", "false", "no")
+        return cls() if enabled else None
+
+    def _ensure_helper(self) -> str:
+        with self._lock:
+            if self._helper is not None and self._helper.poll() is None:
+                return self._socket_path  # type: ignore[return-value]
+            if time.monotonic() - self._failed_at < RESTART_BACKOFF:
+                raise SpawnerUnavailable("Spawner helper is not running")
+            socket_path = os.path.join(
+                tempfile.mkdtemp(prefix="console-spawner-"), "spawner.sock"
+            )
+            # -S skips site-packages, so the helper stays a bare interpreter
+            helper = subprocess.Popen(
+                [sys.executable, "-S", os.path.abspath(__file__), socket_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            ready: List[bytes] = []
+            reader = threading.Thread(
+                target=lambda: ready.append(helper.stdout.readline()),  # type: ignore
+                daemon=True,
+            )
+            reader.start()
+            reader.join(START_TIMEOUT)
+            if ready != [b"ready\n"]:
+                helper.kill()
+                self._failed_at = time.monotonic()
+                raise SpawnerUnavailable("Spawner helper failed to start")
+            print(f"🧬 Started process spawner (pid {helper.pid})")
+            self._helper, self._socket_path = helper, socket_path
+            return socket_path
+
+    def spawn(self, argv: Sequence[str], stdin: bool = False) -> SpawnedProcess:
+        """Start ``argv`` with piped stdout/stderr
+
+        stdin is /dev/null, or a pipe when ``stdin`` is set. Raises
+        SpawnerUnavailable if the helper cannot be used, and OSError (e.g.
+        FileNotFoundError) if the command itself could not be started.
+        """
+        socket_path = self._ensure_helper()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stdin_r, stdin_w = os.pipe() if stdin else (None, None)
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        # The child's ends; ours are closed on failure below
+        child_fds = [fd for fd in (stdin_r, stdout_w, stderr_w) if fd is not None]
+        try:
+            try:
+                conn.connect(socket_path)
+                request = json.dumps({"argv": list(argv)}).encode()
+                socket.send_fds(
+                    conn,
+                    [len(request).to_bytes(HEADER_BYTES, "big")],
+                    child_fds,
+                )
+                conn.sendall(request)
+            except OSError as e:
+                raise SpawnerUnavailable(f"Spawner unreachable: {e}")
+            finally:
+                for fd in child_fds:
+                    os.close(fd)
+            replies = conn.makefile("r")
+            line = replies.readline()
+            if not line:
+                raise SpawnerUnavailable("Spawner closed the connection")
+            reply = json.loads(line)
+            if "error" in reply:
+                replies.close()
+                raise OSError(reply["error"])
+        except BaseException:
+            conn.close()
+            for fd in (stdin_w, stdout_r, stderr_r):
+                if fd is not None:
+                    os.close(fd)
+            raise
+        return SpawnedProcess(
+            argv,
+            reply["pid"],
+            open(stdout_r, "rb", buffering=0),
+            open(stderr_r, "rb", buffering=0),
+            conn,
+            replies,
+            open(stdin_w, "wb", buffering=0) if stdin_w is not None else None,
+        )
+
+    def close(self) -> None:
+        """Stop the helper; commands it started keep running"""
+        with self._lock:
+            helper, self._helper = self._helper, None
+        if helper is not None:
+            helper.stdin.close()  # type: ignore[union-attr]
+            try:
+                helper.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                helper.kill()
+            if self._socket_path:
+                shutil.rmtree(os.path.dirname(self._socket_path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
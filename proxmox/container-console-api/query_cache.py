@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Query Cache
+Memoized results of read-only commands, invalidated by mutating ones
+"""
+
+import os
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from container_console_service import CommandResult
+
+# Commands that only report state; extend with CONTAINER_CONSOLE_READ_ONLY_COMMANDS
+DEFAULT_READ_ONLY_COMMANDS = frozenset(
+    {
+        "hostname -I",
+        "ps aux | head -10",
+        "docker ps",
+        "docker ps | grep librechat",
+        "uptime",
+        "df -h",
+        "free -h",
+        "free -m",
+        "uname -a",
+        "cat /etc/os-release",
+    }
+)
+
+# Programs a command flagged read-only by a client may run. Programs that can
+# also change state are limited to the listed leading arguments.
+READ_ONLY_PROGRAMS: Dict[str, Optional[FrozenSet[Tuple[str, ...]]]] = {
+    **dict.fromkeys(
+        "cat head tail grep egrep fgrep cut wc ls stat df du free uptime uname id "
+        "whoami ps pgrep echo test true which getent lsblk findmnt nproc".split()
+    ),
+    "hostname": frozenset(tuple(args.split()) for args in ("-I", "-i", "-f", "-s")),
+    "docker": frozenset(
+        tuple(args.split())
+        for args in (
+            "ps",
+            "images",
+            "inspect",
+            "logs",
+            "version",
+            "info",
+            "image inspect",
+            "image ls",
+            "container inspect",
+            "container ls",
+        )
+    ),
+    "systemctl": frozenset(
+        tuple(args.split())
+        for args in (
+            "status",
+            "is-active",
+            "is-enabled",
+            "is-failed",
+            "list-units",
+            "show",
+        )
+    ),
+    "dpkg": frozenset(
+        tuple(args.split()) for args in ("-l", "-s", "-L", "--print-architecture")
+    ),
+}
+COMMAND_SEPARATORS = ("|", "||", "&&", ";")
+
+
+def looks_read_only(command: str) -> bool:
+    """Whether every part of a command only runs a known read-only program
+
+    Redirections, background jobs, command substitution and variable
+    assignments are refused, so a client cannot pass off a change as a read.
+    """
+    if "$(" in command or "`" in command:
+        return False
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        tokens = list(lexer)
+    except ValueError:
+        return False
+    segments: List[List[str]] = [[]]
+    for token in tokens:
+        if token in COMMAND_SEPARATORS:
+            segments.append([])
+        elif token and set(token) <= set(lexer.punctuation_chars):
+            # >, >>, <, &, ...
+            return False
+        else:
+            segments[-1].append(token)
+    for segment in segments:
+        if not segment or "=" in segment[0]:
+            return False
+        program, args = os.path.basename(segment[0]), tuple(segment[1:])
+        if program not in READ_ONLY_PROGRAMS:
+            return False
+        allowed = READ_ONLY_PROGRAMS[program]
+        if allowed is not None and not any(
+            args[: len(prefix)] == prefix for prefix in allowed
+        ):
+            return False
+    return True
+
+
+class QueryCache:
+    """TTL and LRU bounded cache of command results per container
+
+    Only commands in ``read_only_commands``, or flagged read-only by the
+    caller and passing :func:`looks_read_only`, are cached. Any other command
+    that finishes in a container is assumed to have changed it and drops that
+    container's entries. A read that overlapped such a command is not stored,
+    since it may have seen the container half-way through the change.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 5.0,
+        max_entries: int = 1024,
+        read_only_commands: Iterable[str] = DEFAULT_READ_ONLY_COMMANDS,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.read_only_commands: Set[str] = set(read_only_commands)
+        self._lock = threading.Lock()
+        # (container ID, command) -> (expires at, result), least recent first
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, CommandResult]]"
+        self._entries = OrderedDict()
+        # Bumped whenever a mutating command finishes in the container, and
+        # for all containers at once by a full invalidation
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "QueryCache":
+        """Create a cache from CONTAINER_CONSOLE_QUERY_CACHE_* variables"""
+        extra = os.getenv("CONTAINER_CONSOLE_READ_ONLY_COMMANDS", "")
+        return cls(
+            ttl=float(os.getenv("CONTAINER_CONSOLE_QUERY_CACHE_TTL", "5")),
+            max_entries=int(os.getenv("CONTAINER_CONSOLE_QUERY_CACHE_SIZE", "1024")),
+            read_only_commands=DEFAULT_READ_ONLY_COMMANDS.union(
+                command.strip() for command in extra.split(";") if command.strip()
+            ),
+        )
+
+    def is_read_only(self, command: str) -> bool:
+        return command.strip() in self.read_only_commands
+
+    def register(self, command: str) -> None:
+        """Treat ``command`` as read-only from now on"""
+        with self._lock:
+            self.read_only_commands.add(command.strip())
+
+    def generation(self, container_id: int) -> Tuple[int, int]:
+        """Token to pass to :meth:`put` for a read starting now"""
+        with self._lock:
+            return self._generation(container_id)
+
+    def _generation(self, container_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(container_id, 0)
+
+    def get(self, container_id: int, command: str) -> Optional["CommandResult"]:
+        key = (container_id, command.strip())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(
+        self,
+        container_id: int,
+        command: str,
+        result: "CommandResult",
+        generation: Tuple[int, int],
+    ) -> None:
+        """Store a result unless the container changed since ``generation``"""
+        if self.ttl <= 0 or result.timed_out or result.exit_code < 0:
+            return
+        key = (container_id, command.strip())
+        with self._lock:
+            if self._generation(container_id) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, container_id: Optional[int] = None) -> None:
+        """Drop the entries of one container, or all of them"""
+        with self._lock:
+            if container_id is None:
+                self._entries.clear()
+                self._epoch += 1
+                return
+            for key in [key for key in self._entries if key[0] == container_id]:
+                del self._entries[key]
+            self._generations[container_id] = self._generations.get(container_id, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Response Helpers
+Conditional GET, cursor pagination, field selection and compression for the API
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from flask import Response, jsonify, request
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "application/x-ndjson")
+
+
+def json_etag(data: Any) -> str:
+    """Stable hash of a JSON-serializable value"""
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+class StateCache:
+    """Caches expensive host lookups (``pct list``, ``pct config``) briefly
+
+    Each entry keeps the ETag of its value, computed once when the value is
+    loaded, so unchanged polls can be answered without serializing anything.
+    """
+
+    def __init__(self, ttl: float = 2.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any, str]] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[Any, str]:
+        """Return ``(value, etag)``, calling ``loader`` when the entry expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1], entry[2]
+
+        value = loader()
+        etag = json_etag(value)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value, etag)
+        return value, etag
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or all of them"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Parse a ``fields=a,b,c`` query parameter"""
+    if not value:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def select_fields(
+    item: Dict[str, Any], fields: Optional[Sequence[str]]
+) -> Dict[str, Any]:
+    """Keep only the requested top-level fields of an item"""
+    if fields is None:
+        return item
+    return {name: item[name] for name in fields if name in item}
+
+
+def encode_cursor(key: Any) -> str:
+    """Opaque cursor for the sort key of the last item on a page"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Inverse of :func:`encode_cursor`; raises ValueError for bad cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def paginate(
+    items: Sequence[Dict[str, Any]],
+    key: Callable[[Dict[str, Any]], Any],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    reverse: bool = False,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return the page after ``cursor`` and the cursor of the following page
+
+    ``items`` must already be sorted by ``key`` (descending with ``reverse``).
+    Keys are compared as JSON values, so tuples become lists.
+    """
+
+    def sort_key(item: Dict[str, Any]) -> Any:
+        return json.loads(json.dumps(key(item)))
+
+    page = list(items)
+    if cursor:
+        after = decode_cursor(cursor)
+        try:
+            page = [
+                item
+                for item in page
+                if (sort_key(item) < after if reverse else sort_key(item) > after)
+            ]
+        except TypeError:
+            raise ValueError("Invalid cursor")
+    if limit is None or len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(sort_key(page[-1]))
+
+
+def list_params() -> Tuple[Optional[List[str]], Optional[str], Optional[int]]:
+    """Read ``fields``, ``cursor`` and ``limit`` from the query string"""
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be positive")
+    return (
+        parse_fields(request.args.get("fields")),
+        request.args.get("cursor"),
+        limit,
+    )
+
+
+def command_params(data: Dict[str, Any], default_timeout: int) -> Tuple[int, int]:
+    """Read ``timeout`` and ``priority`` from a command request body"""
+    try:
+        timeout = int(data.get("timeout", default_timeout))
+        priority = int(data.get("priority", 0))
+    except (TypeError, ValueError):
+        raise ValueError("timeout and priority must be integers")
+    if timeout < 1:
+        raise ValueError("timeout must be positive")
+    return timeout, priority
+
+
+def conditional_json(payload: Dict[str, Any], etag: Optional[str] = None) -> Response:
+    """JSON response with an ETag, or 304 when the client's copy is current
+
+    The ETag covers ``payload`` only, not the ``timestamp`` added to the body,
+    so it changes only when the data does. Pass ``etag`` when it is already
+    known (e.g. from :class:`StateCache`) to skip hashing the payload.
+    """
+    if etag is None:
+        etag = json_etag(payload)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({**payload, "timestamp": datetime.now().isoformat()})
+    # Weak, since the body may be sent with different content encodings
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def compress_response(response: Response, min_size: int = 1024) -> Response:
+    """Compress a buffered response with zstd or gzip if the client accepts it"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    encodings = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(encodings)
+    if encoding == "zstd":
+        compressed = zstandard.ZstdCompressor(level=3).compress(body)
+    elif encoding == "gzip":
+        compressed = gzip.compress(body, compresslevel=6)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
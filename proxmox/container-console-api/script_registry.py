@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Script Registry
+Content-addressed scripts pushed once into containers and run by hash
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set, Tuple
+
+if TYPE_CHECKING:
+    from container_console_service import (
+        CommandResult,
+        ContainerConsoleManager,
+        OutputCallback,
+    )
+
+PUSH_TIMEOUT = 60
+
+# bash exits 127 when the script file is missing, e.g. the container was
+# recreated or its cache was cleaned since it was pushed
+SCRIPT_MISSING_EXIT_CODE = 127
+
+
+class ScriptError(Exception):
+    """Raised when a script cannot be placed in a container"""
+
+    pass
+
+
+def script_sha256(body: str) -> str:
+    """Content address of a script"""
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class ScriptRegistry:
+    """Scripts stored on the host by SHA-256 and cached inside containers
+
+    A script is registered once and then run by hash with arguments. The
+    first run in a container pushes it to ``cache_dir`` there; later runs
+    only send ``bash <cache_dir>/<sha256>.sh <args>``. Which containers hold
+    which scripts is remembered per process; a container that has not been
+    seen yet is checked with ``sha256sum`` before anything is pushed.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        directory: str,
+        cache_dir: str = "/var/cache/container-console/scripts",
+        max_script_bytes: int = 1024 * 1024,
+    ):
+        self.manager = manager
+        self.directory = directory
+        self.cache_dir = cache_dir.rstrip("/")
+        self.max_script_bytes = max_script_bytes
+        self._lock = threading.Lock()
+        self._scripts: Dict[str, Dict[str, Any]] = {}
+        # container ID -> hashes known to be in its cache
+        self._cached: Dict[int, Set[str]] = {}
+        self._placing: Dict[Tuple[int, str], threading.Lock] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def from_env(cls, manager: "ContainerConsoleManager") -> "ScriptRegistry":
+        """Create a registry from CONTAINER_CONSOLE_SCRIPT_* variables"""
+        directory = os.path.join(
+            os.getenv("CONTAINER_CONSOLE_STATE_DIR", "/var/lib/container-console"),
+            "scripts",
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            directory = os.path.join(tempfile.gettempdir(), "container-console-scripts")
+            print(f"⚠️  Script directory unavailable ({e}), using {directory}")
+        return cls(
+            manager,
+            directory,
+            cache_dir=os.getenv(
+                "CONTAINER_CONSOLE_SCRIPT_CACHE_DIR",
+                "/var/cache/container-console/scripts",
+            ),
+            max_script_bytes=int(
+                os.getenv("CONTAINER_CONSOLE_MAX_SCRIPT_BYTES", str(1024 * 1024))
+            ),
+        )
+
+    def _load(self) -> None:
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Skipping unreadable script record {name}: {e}")
+                continue
+            if os.path.exists(self._host_path(record["sha256"])):
+                self._scripts[record["sha256"]] = record
+
+    def _host_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, f"{sha256}.sh")
+
+    def container_path(self, sha256: str) -> str:
+        """Where a script is cached inside containers"""
+        return f"{self.cache_dir}/{sha256}.sh"
+
+    # Registration ------------------------------------------------------
+
+    def register(
+        self, body: str, name: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Store a script and return ``(record, created)``"""
+        if not isinstance(body, str) or not body.strip():
+            raise ValueError("script must be a non-empty string")
+        size = len(body.encode())
+        if size > self.max_script_bytes:
+            raise ValueError(f"Scripts are limited to {self.max_script_bytes} bytes")
+
+        sha256 = script_sha256(body)
+        with self._lock:
+            record = self._scripts.get(sha256)
+            if record is not None:
+                return dict(record), False
+
+            record = {
+                "sha256": sha256,
+                "name": name,
+                "size": size,
+                "created_at": datetime.now().isoformat(),
+            }
+            for path, content in (
+                (self._host_path(sha256), body),
+                (os.path.join(self.directory, f"{sha256}.json"), json.dumps(record)),
+            ):
+                with open(f"{path}.tmp", "w") as f:
+                    f.write(content)
+                os.replace(f"{path}.tmp", path)
+            self._scripts[sha256] = record
+        print(f"📜 Registered script {name or sha256[:12]} ({size} bytes)")
+        return dict(record), True
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._scripts.get(sha256)
+            return dict(record) if record else None
+
+    def list_scripts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(record) for record in self._scripts.values()]
+
+    # Container cache ---------------------------------------------------
+
+    def ensure(
+        self, container_id: int, sha256: str, max_wait: Optional[float] = None
+    ) -> bool:
+        """Make sure a container holds a script; returns True if it was pushed"""
+        if self.get(sha256) is None:
+            raise KeyError(sha256)
+        with self._lock:
+            if sha256 in self._cached.get(container_id, ()):
+                return False
+            placing = self._placing.setdefault((container_id, sha256), threading.Lock())
+
+        # One placement per container and script; concurrent callers wait
+        with placing:
+            with self._lock:
+                if sha256 in self._cached.get(container_id, ()):
+                    return False
+            pushed = self._place(container_id, sha256, max_wait)
+            with self._lock:
+                self._cached.setdefault(container_id, set()).add(sha256)
+                self._placing.pop((container_id, sha256), None)
+        return pushed
+
+    def _place(self, container_id: int, sha256: str, max_wait: Optional[float]) -> bool:
+        path = self.container_path(sha256)
+        probe = self.manager.execute_command(
+            container_id,
+            f"echo {shlex.quote(f'{sha256}  {path}')} | sha256sum -c --status "
+            f"2>/dev/null && echo present || mkdir -p {shlex.quote(self.cache_dir)}",
+            timeout=PUSH_TIMEOUT,
+            max_wait=max_wait,
+        )
+        if probe.exit_code != 0:
+            raise ScriptError(f"Script cache check failed: {probe.error.strip()}")
+        if probe.output.strip() == "present":
+            return False
+
+        with self.manager.command_slot(max_wait):
+            try:
+                result = subprocess.run(
+                    [
+                        "pct",
+                        "push",
+                        str(container_id),
+                        self._host_path(sha256),
+                        path,
+                        "--perms",
+                        "0600",
+                    ],
+                    capture_output=True,
+                    text=True,
+                    timeout=PUSH_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                raise ScriptError(f"pct push timed out after {PUSH_TIMEOUT}s")
+        if result.returncode != 0:
+            raise ScriptError(f"pct push failed: {result.stderr.strip()}")
+        print(f"📦 Cached script {sha256[:12]} in container {container_id}")
+        return True
+
+    def forget(self, container_id: int, sha256: Optional[str] = None) -> None:
+        """Drop what is known about a container's cache, e.g. after a rebuild"""
+        with self._lock:
+            if sha256 is None:
+                self._cached.pop(container_id, None)
+            else:
+                self._cached.get(container_id, set()).discard(sha256)
+
+    def run(
+        self,
+        container_id: int,
+        sha256: str,
+        args: Sequence[str] = (),
+        timeout: int = 300,
+        on_output: Optional["OutputCallback"] = None,
+        max_wait: Optional[float] = None,
+    ) -> Tuple["CommandResult", bool]:
+        """Run a registered script with arguments; returns ``(result, pushed)``"""
+        if not all(isinstance(arg, str) for arg in args):
+            raise ValueError("args must be a list of strings")
+        pushed = self.ensure(container_id, sha256, max_wait)
+        command = " ".join(
+            ["bash", shlex.quote(self.container_path(sha256))]
+            + [shlex.quote(arg) for arg in args]
+        )
+        result = self.manager.execute_command(
+            container_id, command, timeout, on_output=on_output, max_wait=max_wait
+        )
+        if (
+            result.exit_code == SCRIPT_MISSING_EXIT_CODE
+            and not pushed
+            and self.container_path(sha256) in result.error
+        ):
+            # Removed behind our back; place it again and retry once
+            self.forget(container_id, sha256)
+            pushed = self.ensure(container_id, sha256, max_wait)
+            result = self.manager.execute_command(
+                container_id, command, timeout, on_output=on_output, max_wait=max_wait
+            )
+        return result, pushed
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Shell Session
+Persistent shell processes in containers for low-latency interactive use
+"""
+
+import codecs
+import os
+import shlex
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from admission import AdmissionRejected
+from container_console_service import (
+    READ_CHUNK_SIZE,
+    STREAMED_OUTPUT_TAIL_CHARS,
+    CommandResult,
+    OutputCallback,
+    OutputTail,
+    terminate_process_group,
+)
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+# Time allowed for a new shell to answer its first (empty) command
+SESSION_START_TIMEOUT = 15
+
+
+class SessionBusy(Exception):
+    """Raised when a command is sent while the session is still running one"""
+
+    pass
+
+
+class SessionClosed(Exception):
+    """Raised when a command is sent to a session whose shell has exited"""
+
+    pass
+
+
+def _partial_marker_start(text: str, marker: str) -> int:
+    """Index of a possible incomplete ``marker`` at the end of ``text``
+
+    Returns ``len(text)`` when the text cannot end with the start of a marker.
+    """
+    index = text.find(marker[0], max(len(text) - len(marker) + 1, 0))
+    while index != -1:
+        if marker.startswith(text[index:]):
+            return index
+        index = text.find(marker[0], index + 1)
+    return len(text)
+
+
+class _PendingCommand:
+    """Output and completion state of the command a session is running"""
+
+    def __init__(self, on_output: Optional[OutputCallback]):
+        self.on_output = on_output
+        self.callback_failed = False
+        # Streamed output keeps only a tail, like commands run directly
+        limit = STREAMED_OUTPUT_TAIL_CHARS if on_output is not None else None
+        self.buffers = {"stdout": OutputTail(limit), "stderr": OutputTail(limit)}
+        self.streams_done: set = set()
+        self.status_line = ""
+        self.done = threading.Event()
+
+
+class ShellSession:
+    """One long-lived shell process in a container
+
+    Commands are written to the shell's stdin, so the working directory,
+    environment variables and shell functions persist between them and no
+    ``pct exec`` process is spawned per command. After each command the shell
+    prints a random end marker on stdout (followed by the exit code and the
+    working directory) and on stderr; output before the markers belongs to
+    the command. One command runs at a time.
+    """
+
+    def __init__(self, container_id: int, process: Any):
+        self.session_id = uuid.uuid4().hex
+        self.container_id = container_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.commands_run = 0
+        self.cwd: Optional[str] = None
+        # Exit code of the shell itself, once it has exited
+        self.exit_code: Optional[int] = None
+        # Errors printed before the first command, e.g. by pct itself
+        self._startup_errors: List[str] = []
+
+        self._marker = f"__console_session_{uuid.uuid4().hex}__"
+        self._run_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending: Optional[_PendingCommand] = None
+        self._open_streams = 2
+        self._closed = threading.Event()
+
+        # Started in its own process group (ContainerConsoleManager.spawn_shell)
+        # so the shell and everything it started can be killed
+        self._process = process
+        for name, pipe in (
+            ("stdout", self._process.stdout),
+            ("stderr", self._process.stderr),
+        ):
+            threading.Thread(target=self._read, args=(name, pipe), daemon=True).start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    @property
+    def busy(self) -> bool:
+        return self._run_lock.locked()
+
+    @property
+    def startup_error(self) -> str:
+        """stderr printed before the first command could run"""
+        return "".join(self._startup_errors).strip()
+
+    @property
+    def idle_seconds(self) -> float:
+        return 0.0 if self.busy else time.time() - self.last_used
+
+    # Output handling -----------------------------------------------------
+
+    def _read(self, name: str, pipe) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        marker = self._marker
+        fd = pipe.fileno()
+        carry = ""
+        while True:
+            data = os.read(fd, READ_CHUNK_SIZE)
+            text = carry + decoder.decode(data, final=not data)
+            if not data:
+                self._deliver(name, text)
+                break
+            while True:
+                index = text.find(marker)
+                end = text.find("\n", index) if index != -1 else -1
+                if end == -1:
+                    break
+                self._deliver(name, text[:index])
+                self._end_stream(name, text[index + len(marker) : end])
+                text = text[end + 1 :]
+            # Hold back a marker that may be completed by the next read
+            index = text.find(marker)
+            keep = index if index != -1 else _partial_marker_start(text, marker)
+            self._deliver(name, text[:keep])
+            carry = text[keep:]
+        pipe.close()
+        self._stream_closed()
+
+    def _deliver(self, name: str, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            pending = self._pending
+        # Output between commands, e.g. from background jobs, is dropped
+        if pending is None:
+            if name == "stderr" and not self.commands_run:
+                self._startup_errors.append(text)
+            return
+        pending.buffers[name].append(text)
+        if pending.on_output is not None and not pending.callback_failed:
+            try:
+                pending.on_output(name, text)
+            except Exception:
+                # Keep draining the pipe so the shell can't block on it
+                pending.callback_failed = True
+
+    def _end_stream(self, name: str, status: str) -> None:
+        with self._lock:
+            pending = self._pending
+            if pending is None:
+                return
+            pending.streams_done.add(name)
+            if name == "stdout":
+                pending.status_line = status.strip()
+            if len(pending.streams_done) == 2:
+                pending.done.set()
+
+    def _stream_closed(self) -> None:
+        with self._lock:
+            self._open_streams -= 1
+            if self._open_streams:
+                return
+        self.exit_code = self._process.wait()
+        self._closed.set()
+        with self._lock:
+            if self._pending is not None:
+                self._pending.done.set()
+
+    # Commands ------------------------------------------------------------
+
+    def run(
+        self,
+        command: str,
+        timeout: int = 30,
+        on_output: Optional[OutputCallback] = None,
+    ) -> CommandResult:
+        """Run a command in the shell and return its result
+
+        A command that exceeds ``timeout`` cannot be interrupted reliably
+        from outside the container, so the whole session is closed instead.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            raise SessionBusy(f"Session {self.session_id} is running a command")
+        try:
+            if self.closed:
+                raise SessionClosed(f"Session {self.session_id} has exited")
+            pending = _PendingCommand(on_output)
+            with self._lock:
+                self._pending = pending
+                if self.closed:
+                    # Exited after the check above; nothing will answer
+                    pending.done.set()
+            start_time = time.time()
+
+            # eval turns syntax errors into a failed command instead of
+            # leaving the shell waiting for the rest of an unterminated quote;
+            # stdin is the control channel, so commands must not read it
+            script = (
+                f"eval {shlex.quote(command)} </dev/null\n"
+                "__console_status=$?\n"
+                f"printf '%s\\n' {self._marker} >&2\n"
+                f"printf '%s %d %s\\n' {self._marker} "
+                '"$__console_status" "$PWD"\n'
+            )
+            try:
+                self._process.stdin.write(script.encode())
+                self._process.stdin.flush()
+            except (OSError, ValueError):
+                # The shell is gone; its exit is reported below
+                pass
+
+            finished = pending.done.wait(timeout)
+            with self._lock:
+                self._pending = None
+            self.last_used = time.time()
+            self.commands_run += 1
+            stdout = pending.buffers["stdout"].text()
+            stderr = pending.buffers["stderr"].text()
+
+            if not finished:
+                print(f"⏰ Session command timed out after {timeout}s, closing")
+                self.close()
+                exit_code = -1
+                stderr = f"Command timed out after {timeout} seconds; session closed"
+            elif pending.status_line:
+                code, _, cwd = pending.status_line.partition(" ")
+                exit_code = int(code)
+                self.cwd = cwd or self.cwd
+            else:
+                # The command ended the shell, e.g. ``exit``
+                self._closed.wait(1)
+                exit_code = self.exit_code if self.exit_code is not None else -1
+
+            return CommandResult(
+                command=command,
+                output=stdout,
+                error=stderr,
+                exit_code=exit_code,
+                execution_time=time.time() - start_time,
+                timestamp=datetime.now(),
+                container_id=self.container_id,
+                timed_out=not finished,
+            )
+        finally:
+            self._run_lock.release()
+
+    def close(self) -> None:
+        """Kill the shell and anything still running in it"""
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        terminate_process_group(self._process)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Convert session to JSON-serializable format"""
+        return {
+            "session_id": self.session_id,
+            "container_id": self.container_id,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "last_used": datetime.fromtimestamp(self.last_used).isoformat(),
+            "commands_run": self.commands_run,
+            "cwd": self.cwd,
+            "busy": self.busy,
+            "closed": self.closed,
+        }
+
+
+class SessionManager:
+    """Opens, tracks and expires the shell sessions of a console manager
+
+    Sessions are kept in the manager's ``active_sessions``. Each session
+    command takes an execution slot like any other command and is recorded
+    in the command history. Sessions idle for longer than ``idle_timeout``
+    seconds are closed the next time sessions are accessed.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        max_sessions: int = 32,
+        idle_timeout: float = 900.0,
+    ):
+        self.manager = manager
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: Dict[str, ShellSession] = manager.active_sessions
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, manager: "ContainerConsoleManager") -> "SessionManager":
+        """Create a session manager from CONTAINER_CONSOLE_SESSION* variables"""
+        return cls(
+            manager,
+            max_sessions=int(os.getenv("CONTAINER_CONSOLE_MAX_SESSIONS", "32")),
+            idle_timeout=float(
+                os.getenv("CONTAINER_CONSOLE_SESSION_IDLE_TIMEOUT", "900")
+            ),
+        )
+
+    def open(self, container_id: int, max_wait: Optional[float] = None) -> ShellSession:
+        """Start a shell in a container and wait until it answers"""
+        self.reap()
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                idle = [s.idle_seconds for s in self.sessions.values() if not s.busy]
+                raise AdmissionRejected(
+                    "Too many open shell sessions",
+                    self.idle_timeout - max(idle, default=0),
+                    "sessions",
+                )
+
+        # Starting the shell costs as much as running a command
+        with self.manager.command_slot(max_wait):
+            session, error = self._start(container_id, direct=True)
+            attach = self.manager.attach
+            if error and attach is not None:
+                # E.g. the container just stopped; only the probe ran, so
+                # starting over with pct exec repeats nothing
+                print(f"⚠️  {error}; retrying with pct exec")
+                attach.forget(container_id)
+                session, error = self._start(container_id, direct=False)
+        if error is not None:
+            raise RuntimeError(
+                f"Could not start a shell in container {container_id}: {error}"
+            )
+
+        with self._lock:
+            self.sessions[session.session_id] = session
+        print(f"🐚 Opened shell session {session.session_id} in {container_id}")
+        return session
+
+    def _start(
+        self, container_id: int, direct: bool
+    ) -> Tuple[ShellSession, Optional[str]]:
+        """Start a shell and wait for it to answer an empty command
+
+        Returns the session and None, or the closed session and the error.
+        """
+        session = ShellSession(
+            container_id, self.manager.spawn_shell(container_id, direct=direct)
+        )
+        try:
+            probe: Optional[CommandResult] = session.run(
+                ":", timeout=SESSION_START_TIMEOUT
+            )
+        except SessionClosed:
+            probe = None
+        if probe is not None and probe.exit_code == 0:
+            return session, None
+        session.close()
+        if probe is None:
+            return session, session.startup_error or "shell exited"
+        return session, (
+            session.startup_error
+            or probe.error.strip()
+            or f"exit code {probe.exit_code}"
+        )
+
+    def get(self, session_id: str) -> Optional[ShellSession]:
+        self.reap()
+        return self.sessions.get(session_id)
+
+    def list_sessions(self, container_id: Optional[int] = None) -> List[ShellSession]:
+        self.reap()
+        return [
+            session
+            for session in list(self.sessions.values())
+            if container_id is None or session.container_id == container_id
+        ]
+
+    def execute(
+        self,
+        session_id: str,
+        command: str,
+        timeout: int = 30,
+        on_output: Optional[OutputCallback] = None,
+        max_wait: Optional[float] = None,
+        priority: int = 0,
+    ) -> CommandResult:
+        """Run a command in a session; raises KeyError for unknown sessions
+
+        Exclusive commands wait for their turn in the container like any
+        other, and raise QueueTimeout if it does not come within ``timeout``.
+        """
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        if session.busy:
+            raise SessionBusy(f"Session {session_id} is running a command")
+
+        with self.manager.container_turn(
+            session.container_id, command, priority, timeout=timeout
+        ) as ticket:
+            waited = ticket.waited if ticket else 0.0
+            with self.manager.command_slot(max_wait):
+                result = session.run(command, max(int(timeout - waited), 1), on_output)
+        result.queue_wait = waited
+        # A timed-out command takes its session down with it
+        if session.closed or result.timed_out:
+            self.close(session_id)
+        return self.manager.record(result)
+
+    def close(self, session_id: str) -> bool:
+        """Close a session; returns False if it does not exist"""
+        session = self._forget(session_id)
+        if session is None:
+            return False
+        session.close()
+        print(f"🐚 Closed shell session {session_id}")
+        return True
+
+    def close_all(self) -> None:
+        for session_id in list(self.sessions):
+            self.close(session_id)
+
+    def reap(self) -> None:
+        """Close sessions that exited or sat idle past ``idle_timeout``"""
+        for session_id, session in list(self.sessions.items()):
+            if session.closed or session.idle_seconds > self.idle_timeout:
+                self.close(session_id)
+
+    def _forget(self, session_id: str) -> Optional[ShellSession]:
+        with self._lock:
+            return self.sessions.pop(session_id, None)
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Template Baker
+Golden LXC templates with LibreChat already deployed
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from file_transfer import file_sha256
+from job_queue import Job, JobQueue
+from librechat_deployment import SUCCEEDED as DEPLOYMENT_SUCCEEDED
+from librechat_deployment import LibreChatDeployer
+
+if TYPE_CHECKING:
+    from container_console_service import ContainerConsoleManager
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+ACTIVE_STATES = (PENDING, RUNNING)
+
+# Baked templates are named <os>-librechat_<version>_<arch>.tar.gz
+TEMPLATE_NAME = "librechat"
+
+HOST_TIMEOUT = 300
+EXPORT_TIMEOUT = 3600
+NETWORK_WAIT = 60
+
+# Run in the scratch container before it is exported. Stopping the Docker
+# daemon, not the LibreChat container, keeps its unless-stopped restart
+# policy so it comes up on first boot. Identity is regenerated at boot.
+SEAL_COMMAND = (
+    "systemctl stop docker.socket docker containerd; "
+    "apt-get clean && "
+    "rm -rf /var/cache/container-console /tmp/* /var/tmp/* && "
+    "rm -f /etc/ssh/ssh_host_* /var/lib/dbus/machine-id && "
+    "truncate -s 0 /etc/machine-id && "
+    "find /var/log -type f -exec truncate -s 0 {} +"
+)
+
+MANIFEST_COMMANDS = {
+    "os": '. /etc/os-release && echo "$ID-$VERSION_ID"',
+    "arch": "dpkg --print-architecture",
+    "docker_version": "docker --version",
+    "images": (
+        "docker image ls --digests "
+        "--format '{{.Repository}}:{{.Tag}} {{.Digest}} {{.ID}}'"
+    ),
+    "packages": "dpkg-query -W -f='${Package}=${Version}\\n'",
+}
+
+
+class BakeError(Exception):
+    """Raised when a bake step on the host or in the scratch container fails"""
+
+    pass
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class TemplateBaker:
+    """Bakes LibreChat into a versioned LXC template
+
+    A bake creates a scratch container from ``base_template``, runs the
+    normal LibreChat deployment in it once, records a manifest of what ended
+    up inside (OS, packages, Docker and image digests), seals it and exports
+    its root filesystem as ``<os>-librechat_<version>_<arch>.tar.gz`` into
+    ``template_dir``. That is the vztmpl directory of ``template_storage``,
+    so Proxmox lists the template as ``<storage>:vztmpl/<file>`` and
+    ``pct create`` uses it directly. The scratch container is destroyed
+    afterwards, unless ``keep_scratch`` is set.
+
+    The catalog of baked templates is kept as one JSON file per bake in
+    ``state_dir``.
+    """
+
+    def __init__(
+        self,
+        manager: "ContainerConsoleManager",
+        job_queue: JobQueue,
+        deployer: LibreChatDeployer,
+        template_dir: str = "/var/lib/vz/template/cache",
+        template_storage: str = "local",
+        state_dir: Optional[str] = None,
+    ):
+        self.manager = manager
+        self.job_queue = job_queue
+        self.deployer = deployer
+        self.template_dir = template_dir
+        self.template_storage = template_storage
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    @classmethod
+    def from_env(
+        cls,
+        manager: "ContainerConsoleManager",
+        job_queue: JobQueue,
+        deployer: LibreChatDeployer,
+    ) -> "TemplateBaker":
+        """Create a baker from CONTAINER_CONSOLE_TEMPLATE_* variables"""
+        state_dir = os.path.join(
+            os.getenv("CONTAINER_CONSOLE_STATE_DIR", "/var/lib/container-console"),
+            "templates",
+        )
+        try:
+            os.makedirs(state_dir, exist_ok=True)
+        except OSError as e:
+            print(f"⚠️  Template catalog directory unavailable ({e}), memory only")
+            state_dir = None
+        return cls(
+            manager,
+            job_queue,
+            deployer,
+            template_dir=os.getenv(
+                "CONTAINER_CONSOLE_TEMPLATE_DIR", "/var/lib/vz/template/cache"
+            ),
+            template_storage=os.getenv("CONTAINER_CONSOLE_TEMPLATE_STORAGE", "local"),
+            state_dir=state_dir,
+        )
+
+    # Persistence -------------------------------------------------------
+
+    def _load(self) -> None:
+        if not self.state_dir or not os.path.isdir(self.state_dir):
+            return
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Skipping unreadable template record {name}: {e}")
+                continue
+            if record["status"] in ACTIVE_STATES:
+                # The process died mid-bake; its scratch container may remain
+                record["status"] = INTERRUPTED
+            self._templates[record["template_id"]] = record
+
+    def _save(self, record: Dict[str, Any]) -> None:
+        record["updated_at"] = _now()
+        if not self.state_dir:
+            return
+        path = os.path.join(self.state_dir, f"{record['template_id']}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(record, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Failed to persist template {record['template_id']}: {e}")
+
+    # Queries -----------------------------------------------------------
+
+    def get(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a catalog record"""
+        with self._lock:
+            record = self._templates.get(template_id)
+            return json.loads(json.dumps(record)) if record else None
+
+    def list_templates(self) -> List[Dict[str, Any]]:
+        """Catalog records, newest first"""
+        with self._lock:
+            records = [
+                json.loads(json.dumps(record)) for record in self._templates.values()
+            ]
+        return sorted(records, key=lambda record: record["created_at"], reverse=True)
+
+    def remove(self, template_id: str) -> bool:
+        """Delete a baked template and its catalog record
+
+        Raises ValueError while the bake is still running.
+        """
+        with self._lock:
+            record = self._templates.get(template_id)
+            if record is None:
+                return False
+            if record["status"] in ACTIVE_STATES:
+                raise ValueError(f"Template {template_id} is still being baked")
+            del self._templates[template_id]
+        for path in (
+            record.get("path"),
+            (
+                os.path.join(self.state_dir, f"{template_id}.json")
+                if self.state_dir
+                else None
+            ),
+        ):
+            if path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        print(f"🗑️  Removed template {record.get('volid') or template_id}")
+        return True
+
+    # Baking ------------------------------------------------------------
+
+    def _next_version(self) -> str:
+        versions = [
+            int(record["version"])
+            for record in self._templates.values()
+            if str(record["version"]).isdigit()
+        ]
+        return str(max(versions, default=0) + 1)
+
+    def start(
+        self,
+        base_template: str,
+        version: Optional[str] = None,
+        scratch_id: Optional[int] = None,
+        rootfs_storage: str = "local-lvm",
+        disk_gb: int = 16,
+        keep_scratch: bool = False,
+    ) -> Dict[str, Any]:
+        """Add a catalog record and queue its bake as a background job"""
+        if not base_template or ":" not in base_template:
+            raise ValueError(
+                "base_template must be a template volume, e.g. "
+                "local:vztmpl/ubuntu-22.04-standard_22.04-1_amd64.tar.zst"
+            )
+        if version is not None and not re.fullmatch(r"[A-Za-z0-9.+~-]+", version):
+            raise ValueError("version may only contain letters, digits and .+~-")
+
+        with self._lock:
+            version = version or self._next_version()
+            if any(record["version"] == version for record in self._templates.values()):
+                raise ValueError(f"Template version {version} already exists")
+            record: Dict[str, Any] = {
+                "template_id": uuid.uuid4().hex,
+                "job_id": None,
+                "status": PENDING,
+                "version": version,
+                "base_template": base_template,
+                "scratch_id": scratch_id,
+                "rootfs_storage": rootfs_storage,
+                "disk_gb": disk_gb,
+                "keep_scratch": keep_scratch,
+                "deployment_id": None,
+                "filename": None,
+                "volid": None,
+                "path": None,
+                "sha256": None,
+                "size": None,
+                "manifest": None,
+                "error": None,
+                "created_at": _now(),
+                "updated_at": _now(),
+                "finished_at": None,
+            }
+            template_id = record["template_id"]
+            self._templates[template_id] = record
+            self._save(record)
+
+        try:
+            job, _ = self.job_queue.submit(
+                lambda job: self._run(template_id, job),
+                description=f"bake-template {TEMPLATE_NAME} {version}",
+            )
+        except Exception:
+            with self._lock:
+                del self._templates[template_id]
+            raise
+        with self._lock:
+            record["job_id"] = job.job_id
+            self._save(record)
+            return json.loads(json.dumps(record))
+
+    def _host(self, job: Job, args: Sequence[str], timeout: int = HOST_TIMEOUT) -> str:
+        """Run a command on the host, echoing it into the job output"""
+        job.append_output("stdout", f"$ {' '.join(args)}\n")
+        with self.manager.command_slot():
+            try:
+                result = subprocess.run(
+                    list(args), capture_output=True, text=True, timeout=timeout
+                )
+            except subprocess.TimeoutExpired:
+                raise BakeError(f"{args[0]} {args[1]} timed out after {timeout}s")
+        if result.stdout:
+            job.append_output("stdout", result.stdout)
+        if result.returncode != 0:
+            job.append_output("stderr", result.stderr)
+            raise BakeError(
+                f"{args[0]} {args[1]} failed: "
+                f"{result.stderr.strip() or f'exit code {result.returncode}'}"
+            )
+        return result.stdout
+
+    def _in_scratch(self, container_id: int, command: str, timeout: int = 60) -> str:
+        result = self.manager.execute_command(container_id, command, timeout=timeout)
+        if result.exit_code != 0:
+            raise BakeError(f"'{command}' failed: {result.error.strip()}")
+        return result.output
+
+    def _update(self, record: Dict[str, Any], **changes: Any) -> None:
+        with self._lock:
+            record.update(changes)
+            self._save(record)
+
+    def _run(self, template_id: str, job: Job) -> Dict[str, Any]:
+        with self._lock:
+            record = self._templates[template_id]
+        self._update(record, status=RUNNING)
+        scratch_id = record["scratch_id"]
+        created = False
+        try:
+            if scratch_id is None:
+                scratch_id = int(
+                    json.loads(
+                        self._host(
+                            job,
+                            [
+                                "pvesh",
+                                "get",
+                                "/cluster/nextid",
+                                "--output-format",
+                                "json",
+                            ],
+                        )
+                    )
+                )
+                self._update(record, scratch_id=scratch_id)
+
+            job.append_output("stdout", f"==> Create scratch container {scratch_id}\n")
+            self._host(
+                job,
+                [
+                    "pct",
+                    "create",
+                    str(scratch_id),
+                    record["base_template"],
+                    "--hostname",
+                    f"{TEMPLATE_NAME}-bake",
+                    "--cores",
+                    "2",
+                    "--memory",
+                    "2048",
+                    "--rootfs",
+                    f"{record['rootfs_storage']}:{record['disk_gb']}",
+                    "--net0",
+                    "name=eth0,bridge=vmbr0,ip=dhcp",
+                    "--unprivileged",
+                    "1",
+                    # Docker inside an unprivileged container
+                    "--features",
+                    "nesting=1,keyctl=1",
+                ],
+            )
+            created = True
+            self._host(job, ["pct", "start", str(scratch_id)])
+            self._in_scratch(
+                scratch_id,
+                f"for i in $(seq {NETWORK_WAIT}); do "
+                "ip route | grep -q '^default' && exit 0; sleep 1; done; exit 1",
+                timeout=NETWORK_WAIT + 10,
+            )
+
+            deployment, _ = self.deployer.prepare(
+                scratch_id, resume=False, template_id=template_id
+            )
+            self._update(record, deployment_id=deployment["deployment_id"])
+            deployment = self.deployer.run(deployment["deployment_id"], job)
+            if job.cancel_requested:
+                raise BakeError("Bake cancelled")
+            if deployment["status"] != DEPLOYMENT_SUCCEEDED:
+                raise BakeError(job.error or f"Deployment {deployment['status']}")
+
+            job.append_output("stdout", "==> Record manifest\n")
+            manifest = self._manifest(scratch_id, deployment)
+            filename = (
+                f"{manifest['os']}-{TEMPLATE_NAME}_{record['version']}_"
+                f"{manifest['arch']}.tar.gz"
+            )
+
+            job.append_output("stdout", "==> Seal\n")
+            self._in_scratch(scratch_id, SEAL_COMMAND, timeout=HOST_TIMEOUT)
+
+            job.append_output("stdout", f"==> Export {filename}\n")
+            path = os.path.join(self.template_dir, filename)
+            self._export(scratch_id, path, job)
+            self._update(
+                record,
+                status=SUCCEEDED,
+                filename=filename,
+                volid=f"{self.template_storage}:vztmpl/{filename}",
+                path=path,
+                sha256=file_sha256(path),
+                size=os.path.getsize(path),
+                manifest=manifest,
+                finished_at=_now(),
+            )
+            job.append_output("stdout", f"==> Baked {record['volid']}\n")
+            print(f"🍞 Baked template {record['volid']}")
+        except Exception as e:
+            job.error = str(e)
+            job.append_output("stderr", f"==> Bake failed: {e}\n")
+            self._update(
+                record,
+                status=CANCELLED if job.cancel_requested else FAILED,
+                error=str(e),
+                finished_at=_now(),
+            )
+        finally:
+            if created and not record["keep_scratch"]:
+                job.append_output(
+                    "stdout", f"==> Destroy scratch container {scratch_id}\n"
+                )
+                try:
+                    self._host(job, ["pct", "stop", str(scratch_id)])
+                except BakeError:
+                    pass  # Already stopped
+                try:
+                    self._host(job, ["pct", "destroy", str(scratch_id), "--purge"])
+                except BakeError as e:
+                    job.append_output("stderr", f"{e}\n")
+        return self.get(template_id)  # type: ignore[return-value]
+
+    def _manifest(
+        self, container_id: int, deployment: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """What the template contains, read from the scratch container"""
+        values = {
+            name: self._in_scratch(container_id, command).strip()
+            for name, command in MANIFEST_COMMANDS.items()
+        }
+        images = []
+        for line in values["images"].splitlines():
+            reference, digest, image_id = (line.split() + ["", "", ""])[:3]
+            images.append(
+                {
+                    "image": reference,
+                    "digest": None if digest == "<none>" else digest,
+                    "id": image_id,
+                }
+            )
+        packages = sorted(values["packages"].splitlines())
+        return {
+            "os": values["os"],
+            "arch": values["arch"],
+            "docker_version": values["docker_version"],
+            "images": images,
+            "package_count": len(packages),
+            "packages": packages,
+            "steps": {step["step"]: step["status"] for step in deployment["steps"]},
+        }
+
+    def _export(self, container_id: int, path: str, job: Job) -> None:
+        """Write the container's root filesystem to ``path`` as a template
+
+        tar runs inside the container, so an unprivileged container's files
+        are archived with the IDs it sees, as Proxmox templates expect.
+        """
+        tmp_path = f"{path}.tmp"
+        job.append_output("stdout", f"$ pct exec {container_id} -- tar ... > {path}\n")
+        try:
+            with self.manager.command_slot(), open(tmp_path, "wb") as f:
+                result = subprocess.run(
+                    [
+                        "pct",
+                        "exec",
+                        str(container_id),
+                        "--",
+                        "tar",
+                        "--create",
+                        "--gzip",
+                        "--numeric-owner",
+                        "--one-file-system",
+                        "--xattrs",
+                        "--xattrs-include=*",
+                        "--directory=/",
+                        ".",
+                    ],
+                    stdout=f,
+                    stderr=subprocess.PIPE,
+                    text=False,
+                    timeout=EXPORT_TIMEOUT,
+                )
+        except subprocess.TimeoutExpired:
+            os.remove(tmp_path)
+            raise BakeError(f"Export timed out after {EXPORT_TIMEOUT}s")
+        stderr = result.stderr.decode(errors="replace")
+        # GNU tar exits 1 when files changed while being read, e.g. sockets
+        if result.returncode not in (0, 1):
+            os.remove(tmp_path)
+            raise BakeError(f"Export failed: {stderr.strip()}")
+        if stderr:
+            job.append_output("stderr", stderr)
+        os.replace(tmp_path, path)
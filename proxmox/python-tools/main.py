@@ -6,6 +6,7 @@ Handles Proxmox API interactions and LXC container management
 
 import json
 import os
+import re
 import requests
 import urllib3
 from typing import Dict, List, Optional, Any
@@ -26,6 +27,22 @@ def get_config() -> dict:
     }
 
 
+# Templates baked by the container console API (POST /templates/bake) are
+# named <os>-librechat_<version>_<arch>.tar.gz
+GOLDEN_TEMPLATE = "golden"
+GOLDEN_TEMPLATE_PATTERN = re.compile(
+    r"vztmpl/(?P<os>[^/_]+)-librechat_(?P<version>[^_]+)_(?P<arch>[^_.]+)\.tar\.gz$"
+)
+
+
+def _version_key(version: str) -> tuple:
+    """Sort key so that version 10 comes after version 9"""
+    return tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part)
+        for part in re.split(r"[.+~-]", version)
+    )
+
+
 # Disable SSL warnings for self-signed certificates (common in home setups)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -272,8 +289,19 @@ class ProxmoxManager:
         rootfs_size: str = "8G",
         storage: str = "local-lvm",
     ) -> bool:
-        """Create a new LXC container on the specified node"""
+        """Create a new LXC container on the specified node
+
+        Pass ``template="golden"`` to use the newest baked LibreChat template,
+        which boots with LibreChat already running.
+        """
         try:
+            if template == GOLDEN_TEMPLATE:
+                golden = self.get_latest_golden_template(node)
+                if golden is None:
+                    print(f"✗ No baked LibreChat template found on {node}")
+                    return False
+                template = golden["volid"]
+
             # Container creation data
             container_data = {
                 "vmid": container_id,
@@ -285,6 +313,10 @@ class ProxmoxManager:
                 "onboot": 1,
                 "start": 1,
             }
+            if GOLDEN_TEMPLATE_PATTERN.search(template):
+                # Baked unprivileged, with Docker needing nesting
+                container_data["unprivileged"] = 1
+                container_data["features"] = "nesting=1,keyctl=1"
 
             print(f"Creating container {container_id} ({hostname}) on node {node}...")
             print(f"Template: {template}")
@@ -336,6 +368,22 @@ class ProxmoxManager:
             print(f"Failed to get templates for {node}: {e}")
             return []
 
+    def get_golden_templates(self, node: str) -> List[Dict[str, Any]]:
+        """Baked LibreChat templates on a node, newest version first"""
+        golden = []
+        for template in self.get_available_templates(node):
+            match = GOLDEN_TEMPLATE_PATTERN.search(template.get("volid") or "")
+            if match:
+                golden.append({**template, **match.groupdict()})
+        return sorted(
+            golden, key=lambda template: _version_key(template["version"]), reverse=True
+        )
+
+    def get_latest_golden_template(self, node: str) -> Optional[Dict[str, Any]]:
+        """The newest baked LibreChat template on a node, if any"""
+        golden = self.get_golden_templates(node)
+        return golden[0] if golden else None
+
     def wait_for_container_status(
         self,
         node: str,
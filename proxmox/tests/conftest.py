@@ -0,0 +1,31 @@
+"""
+Shared pytest configuration
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+# The container console API modules are imported by name, as the service does
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "container-console-api"
+    ),
+)
+
+
+@pytest.fixture(scope="session")
+def console_api(tmp_path_factory):
+    """The container console API module, with its state in a temporary directory
+
+    Configuration is read from the environment at import time, so the module
+    is imported only once the environment points at the temporary directory.
+    """
+    state_dir = tmp_path_factory.mktemp("console-state")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("CONTAINER_CONSOLE_STATE_DIR", str(state_dir))
+        patch.setenv("CONTAINER_CONSOLE_HISTORY_DB", str(state_dir / "history.db"))
+        yield importlib.import_module("container_console_api")
@@ -0,0 +1,164 @@
+"""
+Tests for AdmissionController rate limits and execution slots
+"""
+
+import threading
+import time
+
+import pytest
+from admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket"""
+
+    def test_refill_is_capped_at_burst(self):
+        """Test that tokens accumulate at ``rate`` up to ``burst``"""
+        bucket = TokenBucket(rate=2, burst=4)
+        bucket.tokens = 0
+
+        bucket.refill(bucket.updated + 1)
+        assert bucket.tokens == 2
+        bucket.refill(bucket.updated + 10)
+        assert bucket.tokens == 4
+
+    def test_wait_time(self):
+        """Test the time until enough tokens are available"""
+        bucket = TokenBucket(rate=2, burst=4)
+        bucket.tokens = 1
+
+        assert bucket.wait_time(1) == 0
+        assert bucket.wait_time(3) == 1.0
+
+
+class TestRateLimits:
+    """Test cases for AdmissionController.check_rate()"""
+
+    def test_client_burst_then_rejected(self):
+        """Test that a client is rejected once its burst is spent"""
+        admission = AdmissionController(client_rate=1, client_burst=3)
+        for _ in range(3):
+            admission.check_rate("10.0.0.1")
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            admission.check_rate("10.0.0.1")
+        assert excinfo.value.reason == "client_rate"
+        assert excinfo.value.retry_after == 1
+        # Other clients have their own bucket
+        admission.check_rate("10.0.0.2")
+
+    def test_container_rate(self):
+        """Test per-container limits, charged once per container ID"""
+        admission = AdmissionController(container_rate=1, container_burst=2)
+        admission.check_rate(container_ids=[100, 100])
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            admission.check_rate(container_ids=[100])
+        assert excinfo.value.reason == "container_rate"
+        admission.check_rate(container_ids=[101])
+
+    def test_all_or_nothing(self):
+        """Test that a rejected request charges none of its buckets"""
+        admission = AdmissionController(
+            client_rate=1, client_burst=5, container_rate=1, container_burst=1
+        )
+        admission.check_rate("client", [100])
+
+        with pytest.raises(AdmissionRejected):
+            admission.check_rate("client", [100])
+        # The client bucket was not charged for the rejected request
+        for container_id in (101, 102, 103, 104):
+            admission.check_rate("client", [container_id])
+
+    def test_zero_rate_disables_limit(self):
+        """Test that a rate of 0 turns a bucket off"""
+        admission = AdmissionController(client_rate=0, container_rate=0)
+        for _ in range(100):
+            admission.check_rate("client", [100])
+
+    def test_retry_after_rounds_up(self):
+        """Test that Retry-After is a whole number of seconds, at least 1"""
+        assert AdmissionRejected("x", 0.2, "r").retry_after == 1
+        assert AdmissionRejected("x", 2.1, "r").retry_after == 3
+
+
+class TestExecutionSlots:
+    """Test cases for AdmissionController.slot()"""
+
+    def test_slots_are_counted(self):
+        """Test that holding a slot shows up in running and stats()"""
+        admission = AdmissionController(max_concurrent=2)
+        with admission.slot():
+            assert admission.running == 1
+            assert admission.stats()["running"] == 1
+        assert admission.running == 0
+
+    def test_wait_timeout(self):
+        """Test that a bounded wait is rejected when no slot frees up"""
+        admission = AdmissionController(max_concurrent=1)
+        with admission.slot():
+            with pytest.raises(AdmissionRejected) as excinfo:
+                with admission.slot(max_wait=0.05):
+                    pass
+        assert excinfo.value.reason == "wait_timeout"
+
+    def test_queue_full(self):
+        """Test that bounded waiters beyond max_waiting are rejected at once"""
+        admission = AdmissionController(max_concurrent=1, max_waiting=0)
+        with admission.slot():
+            assert admission.saturated
+            with pytest.raises(AdmissionRejected) as excinfo:
+                with admission.slot(max_wait=5):
+                    pass
+        assert excinfo.value.reason == "queue_full"
+
+    def test_waiter_gets_freed_slot(self):
+        """Test that a waiting caller runs as soon as a slot is released"""
+        admission = AdmissionController(max_concurrent=1)
+        release = threading.Event()
+        admitted = []
+
+        def holder():
+            with admission.slot():
+                release.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        while admission.running == 0:
+            time.sleep(0.01)
+
+        def waiter():
+            with admission.slot(max_wait=5):
+                admitted.append(True)
+
+        waiting = threading.Thread(target=waiter)
+        waiting.start()
+        while admission.waiting == 0:
+            time.sleep(0.01)
+        release.set()
+        thread.join()
+        waiting.join()
+
+        assert admitted == [True]
+        assert admission.waiting == 0
+
+
+class TestAdmissionResponses:
+    """Test cases for how the API answers rejected requests"""
+
+    def test_429_with_retry_after(self, console_api, monkeypatch):
+        """Test that a rate-limited request gets 429 and a Retry-After header"""
+        monkeypatch.setattr(
+            console_api.get_console_manager(),
+            "admission",
+            AdmissionController(client_rate=0.5, client_burst=1),
+        )
+        client = console_api.app.test_client()
+
+        # Admitted, then refused for the missing base template
+        assert client.post("/templates/bake", json={}).status_code == 400
+        response = client.post("/templates/bake", json={})
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+        assert response.get_json()["success"] is False
@@ -0,0 +1,151 @@
+"""
+Tests for CommandHistory and its in-memory ring buffer
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from command_history import CommandHistory, HistoryRecord, RecentResults
+from container_console_service import CommandResult, ResourceUsage
+
+
+def make_result(container_id=100, command="uptime", output="ok", **kwargs):
+    """Build a CommandResult with sensible defaults"""
+    return CommandResult(
+        command=command,
+        output=output,
+        error=kwargs.pop("error", ""),
+        exit_code=kwargs.pop("exit_code", 0),
+        execution_time=kwargs.pop("execution_time", 0.1),
+        timestamp=kwargs.pop("timestamp", datetime.now()),
+        container_id=container_id,
+        **kwargs,
+    )
+
+
+def make_record(container_id, command):
+    """Build a HistoryRecord for ring buffer tests"""
+    return HistoryRecord(container_id, command, "", "", 0, 0.1, time.time())
+
+
+class TestRecentResults:
+    """Test cases for the RecentResults ring buffer"""
+
+    def test_rejects_zero_capacity(self):
+        """Test that a ring buffer needs room for at least one record"""
+        with pytest.raises(ValueError):
+            RecentResults(0)
+
+    def test_overwrites_oldest_when_full(self):
+        """Test that appending past capacity drops the oldest records"""
+        recent = RecentResults(3)
+        for index in range(5):
+            recent.append(make_record(100, f"cmd{index}"))
+
+        assert len(recent) == 3
+        assert [r.command for r in recent.snapshot()] == ["cmd4", "cmd3", "cmd2"]
+
+    def test_snapshot_filters_and_limits(self):
+        """Test snapshot() filtering by container and limiting the result"""
+        recent = RecentResults(10)
+        for index in range(6):
+            recent.append(make_record(100 + index % 2, f"cmd{index}"))
+
+        assert [r.command for r in recent.snapshot(container_id=101)] == [
+            "cmd5",
+            "cmd3",
+            "cmd1",
+        ]
+        assert [r.command for r in recent.snapshot(limit=2)] == ["cmd5", "cmd4"]
+
+
+class TestCommandHistory:
+    """Test cases for CommandHistory"""
+
+    @pytest.fixture
+    def history(self, tmp_path):
+        """History backed by a temporary SQLite database"""
+        store = CommandHistory(str(tmp_path / "history.db"))
+        yield store
+        store.close()
+
+    def test_memory_only_query(self):
+        """Test that without a database queries are served from memory"""
+        history = CommandHistory(None, recent_capacity=2)
+        for command in ("a", "b", "c"):
+            history.record(make_result(command=command))
+
+        assert [e["command"] for e in history.query()] == ["c", "b"]
+        assert history.stats()["persistent"] is False
+
+    def test_round_trip_compressed_output(self, history):
+        """Test that large outputs are compressed and read back intact"""
+        output = "line of output\n" * 1000
+        history.record(make_result(output=output))
+
+        entry = history.query()[0]
+        assert entry["output"] == output
+        assert history.stats()["stored_bytes"] < len(output)
+
+    def test_resource_usage_is_stored(self, history):
+        """Test that rusage columns are persisted with the result"""
+        usage = ResourceUsage(0.5, 0.25, 2048, 3, 4)
+        history.record(make_result(resource_usage=usage))
+
+        stored = history.query()[0]["resource_usage"]
+        assert stored["cpu_time"] == 0.75
+        assert stored["max_rss_kb"] == 2048
+
+    def test_query_filters(self, history):
+        """Test filtering by container, exit code, prefix and time"""
+        now = datetime.now()
+        history.record(make_result(100, "apt update", timestamp=now))
+        history.record(make_result(101, "apt upgrade", exit_code=1, timestamp=now))
+        history.record(make_result(100, "df -h", timestamp=now - timedelta(hours=2)))
+
+        assert [e["command"] for e in history.query(container_id=100)] == [
+            "apt update",
+            "df -h",
+        ]
+        assert [e["command"] for e in history.query(exit_code=1)] == ["apt upgrade"]
+        assert len(history.query(command_prefix="apt")) == 2
+        assert len(history.query(since=now - timedelta(hours=1))) == 2
+        assert "output" not in history.query(include_output=False)[0]
+
+    def test_prune_by_retention(self, history):
+        """Test that results older than the retention period are removed"""
+        history.retention_seconds = 3600
+        history.record(
+            make_result(command="old", timestamp=datetime.now() - timedelta(days=1))
+        )
+        history.record(make_result(command="new"))
+        history.prune()
+
+        assert [e["command"] for e in history.query()] == ["new"]
+        assert history.stats()["stored_count"] == 1
+
+    def test_prune_by_size(self, tmp_path):
+        """Test that the oldest results go once the byte budget is exceeded"""
+        history = CommandHistory(
+            str(tmp_path / "history.db"), max_bytes=1000, prune_interval=3600
+        )
+        for index in range(20):
+            history.record(make_result(command=f"cmd{index:02d}", output="x" * 100))
+
+        stats = history.stats()
+        assert stats["stored_bytes"] <= 1000
+        assert 0 < stats["stored_count"] < 20
+        assert history.query(limit=1)[0]["command"] == "cmd19"
+        history.close()
+
+    def test_reopen_keeps_results(self, tmp_path):
+        """Test that results survive reopening the database"""
+        path = str(tmp_path / "history.db")
+        first = CommandHistory(path)
+        first.record(make_result(command="persisted"))
+        first.close()
+
+        second = CommandHistory(path)
+        assert second.query()[0]["command"] == "persisted"
+        second.close()
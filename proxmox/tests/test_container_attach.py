@@ -0,0 +1,94 @@
+"""
+Tests for the lxc-attach fast path
+"""
+
+import os
+
+import container_attach
+import pytest
+from container_attach import ContainerAttach
+from container_console_service import ContainerConsoleManager
+
+
+class TestContainerAttach:
+    """Test cases for ContainerAttach"""
+
+    @pytest.fixture
+    def attach(self):
+        """Attach fast path, whether or not lxc-attach is installed"""
+        return ContainerAttach()
+
+    def test_running_container_is_attached(self, attach, monkeypatch):
+        """Test that a running container gets an lxc-attach command line"""
+        monkeypatch.setattr(attach, "init_pid", lambda container_id: 1234)
+
+        argv = attach.argv(100, "uptime")
+        assert argv[:3] == ["lxc-attach", "-n", "100"]
+        assert argv[-3:] == ["bash", "-c", "uptime"]
+
+    def test_stopped_container_uses_pct(self, attach, monkeypatch):
+        """Test that no fast path is offered for a stopped container"""
+        monkeypatch.setattr(attach, "init_pid", lambda container_id: None)
+
+        assert attach.argv(100, "uptime") is None
+
+    def test_cached_pid_checked_by_start_time(self, attach, monkeypatch):
+        """Test that the cached init PID is reused only while it is the same"""
+        lookups = []
+
+        def run(argv, **kwargs):
+            lookups.append(argv)
+            raise container_attach.subprocess.TimeoutExpired(argv, 5)
+
+        monkeypatch.setattr(container_attach.subprocess, "run", run)
+        pid = os.getpid()
+        attach._init[100] = (pid, container_attach._start_time(pid))
+        assert attach.init_pid(100) == pid
+        assert lookups == []
+
+        attach._init[100] = (pid, -1)
+        assert attach.init_pid(100) is None
+        assert len(lookups) == 1
+        assert 100 not in attach._init
+
+    def test_unknown_method(self):
+        """Test that only lxc-attach is accepted"""
+        with pytest.raises(ValueError):
+            ContainerAttach("nsenter")
+
+
+class TestAttachedExecution:
+    """Test cases for commands run through the fast path"""
+
+    def test_failed_attach_is_not_rerun(self, monkeypatch):
+        """Test that a command sent through lxc-attach is not repeated"""
+        attach = ContainerAttach()
+        monkeypatch.setattr(attach, "init_pid", lambda container_id: 1234)
+        manager = ContainerConsoleManager(attach=attach)
+        runs = []
+
+        def run(argv, timeout, on_output, on_spawn):
+            runs.append(argv[0])
+            return "", "lxc-attach: 100: Failed to get init pid\n", None, 1
+
+        monkeypatch.setattr(manager, "_run", run)
+        result = manager.execute_command(100, "echo once >> /tmp/log")
+
+        assert runs == ["lxc-attach"]
+        assert result.exit_code == 1
+
+    def test_stopped_container_runs_with_pct(self, monkeypatch):
+        """Test that a container found stopped beforehand uses pct exec"""
+        attach = ContainerAttach()
+        monkeypatch.setattr(attach, "init_pid", lambda container_id: None)
+        manager = ContainerConsoleManager(attach=attach)
+        runs = []
+
+        def run(argv, timeout, on_output, on_spawn):
+            runs.append(argv)
+            return "", "", None, 0
+
+        monkeypatch.setattr(manager, "_run", run)
+        manager.execute_command(100, "uptime")
+
+        assert runs == [["pct", "exec", "100", "--", "bash", "-c", "uptime"]]
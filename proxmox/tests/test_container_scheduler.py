@@ -0,0 +1,203 @@
+"""
+Tests for ContainerScheduler
+"""
+
+import threading
+import time
+
+import pytest
+from container_scheduler import ContainerScheduler, QueueTimeout
+
+
+def wait_until(predicate, timeout=2.0):
+    """Poll ``predicate`` until it holds or ``timeout`` passes"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+class TestContainerScheduler:
+    """Test cases for ContainerScheduler"""
+
+    @pytest.fixture
+    def scheduler(self):
+        """Scheduler with the default exclusive patterns"""
+        return ContainerScheduler()
+
+    def queue_behind(self, scheduler, order, container_id, command, priority):
+        """Start a thread that records ``command`` once it gets its turn"""
+
+        def run():
+            with scheduler.turn(container_id, command, priority=priority, timeout=5):
+                order.append(command)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    @pytest.mark.parametrize(
+        "command",
+        [
+            "apt-get install -y nginx",
+            "DEBIAN_FRONTEND=noninteractive apt upgrade",
+            "dnf install httpd",
+            "curl -fsSL https://get.docker.com | sh",
+            "systemctl restart nginx",
+            "service nginx reload",
+        ],
+    )
+    def test_exclusive_commands(self, scheduler, command):
+        """Test that package management and service restarts are exclusive"""
+        assert scheduler.is_exclusive(command)
+
+    @pytest.mark.parametrize(
+        "command", ["uptime", "df -h /var/log", "systemctl status nginx"]
+    )
+    def test_shared_commands(self, scheduler, command):
+        """Test that ordinary commands are not exclusive"""
+        assert not scheduler.is_exclusive(command)
+
+    def test_extra_patterns_from_env(self, monkeypatch):
+        """Test that CONTAINER_CONSOLE_EXCLUSIVE_PATTERNS adds patterns"""
+        monkeypatch.setenv("CONTAINER_CONSOLE_EXCLUSIVE_PATTERNS", r"\bpip\b; ;")
+        scheduler = ContainerScheduler.from_env()
+
+        assert scheduler.is_exclusive("pip install requests")
+        assert scheduler.is_exclusive("apt install git")
+
+    def test_priority_then_arrival_order(self, scheduler):
+        """Test that waiters run highest priority first, then first come"""
+        order = []
+        threads = []
+        with scheduler.turn(100, "apt update") as holder:
+            assert holder.exclusive
+            for command, priority in [
+                ("apt install a", 0),
+                ("apt install b", 5),
+                ("apt install c", 0),
+                ("apt install d", 5),
+            ]:
+                threads.append(
+                    self.queue_behind(scheduler, order, 100, command, priority)
+                )
+                wait_until(lambda: scheduler.waiting_count() == len(threads))
+
+            waiting = scheduler.queue(100)["waiting"]
+            assert [ticket["command"] for ticket in waiting] == [
+                "apt install b",
+                "apt install d",
+                "apt install a",
+                "apt install c",
+            ]
+            assert [ticket["position"] for ticket in waiting] == [1, 2, 3, 4]
+        for thread in threads:
+            thread.join(2)
+
+        assert order == [
+            "apt install b",
+            "apt install d",
+            "apt install a",
+            "apt install c",
+        ]
+        assert scheduler.waiting_count() == 0
+
+    def test_containers_do_not_block_each_other(self, scheduler):
+        """Test that exclusivity is per container"""
+        with scheduler.turn(100, "apt update"):
+            with scheduler.turn(101, "apt update", timeout=0.1) as ticket:
+                assert ticket.container_id == 101
+
+    def test_shared_commands_never_wait(self, scheduler):
+        """Test that non-exclusive commands run alongside the holder"""
+        with scheduler.turn(100, "apt update"):
+            with scheduler.turn(100, "uptime", timeout=0.1) as ticket:
+                queue = scheduler.queue(100)
+                assert queue["running"]["command"] == "apt update"
+                assert [t["command"] for t in queue["running_shared"]] == ["uptime"]
+                assert not ticket.exclusive
+        assert scheduler.queue(100)["running_shared"] == []
+
+    def test_caller_can_force_exclusive(self, scheduler):
+        """Test that exclusive=True queues a command the patterns miss"""
+        with scheduler.turn(100, "./deploy.sh", exclusive=True):
+            with pytest.raises(QueueTimeout):
+                with scheduler.turn(100, "uptime", exclusive=True, timeout=0.05):
+                    pass
+
+    def test_queue_timeout(self, scheduler):
+        """Test that a waiter gives up after its timeout and leaves the queue"""
+        with scheduler.turn(100, "apt upgrade -y"):
+            with pytest.raises(QueueTimeout) as excinfo:
+                with scheduler.turn(100, "apt install git", timeout=0.1):
+                    pass
+            assert scheduler.waiting_count() == 0
+
+        assert excinfo.value.waited >= 0.1
+        assert "container 100" in str(excinfo.value)
+        assert "held by: apt upgrade -y" in str(excinfo.value)
+
+    def test_timed_out_waiter_does_not_block_the_next(self, scheduler):
+        """Test that the next in line is woken when the front waiter gives up"""
+        order = []
+        errors = []
+
+        def impatient():
+            try:
+                with scheduler.turn(100, "apt install a", priority=9, timeout=0.1):
+                    order.append("apt install a")
+            except QueueTimeout as e:
+                errors.append(e)
+
+        with scheduler.turn(100, "apt update"):
+            first = threading.Thread(target=impatient, daemon=True)
+            first.start()
+            wait_until(lambda: scheduler.waiting_count() == 1)
+            second = self.queue_behind(scheduler, order, 100, "apt install b", 0)
+            first.join(2)
+            assert len(errors) == 1
+        second.join(2)
+
+        assert order == ["apt install b"]
+
+    def test_turn_released_on_error(self, scheduler):
+        """Test that an exception inside the turn frees the container"""
+        with pytest.raises(RuntimeError):
+            with scheduler.turn(100, "apt update"):
+                raise RuntimeError("boom")
+
+        assert scheduler.queue(100)["running"] is None
+        with scheduler.turn(100, "apt update", timeout=0.1):
+            pass
+
+    def test_ticket_waited(self, scheduler):
+        """Test that a ticket records how long it waited for its turn"""
+        tickets = []
+
+        def wait_for_turn():
+            with scheduler.turn(100, "apt install git", timeout=5) as ticket:
+                tickets.append(ticket)
+
+        with scheduler.turn(100, "apt update") as holder:
+            assert holder.waited < 0.1
+            thread = threading.Thread(target=wait_for_turn, daemon=True)
+            thread.start()
+            wait_until(lambda: scheduler.waiting_count() == 1)
+            time.sleep(0.1)
+        thread.join(2)
+
+        assert tickets[0].waited >= 0.1
+        waited = tickets[0].waited
+        time.sleep(0.02)
+        assert tickets[0].waited == waited
+        assert tickets[0].to_dict()["wait_seconds"] == round(waited, 3)
+
+    def test_caller_cannot_opt_out(self, scheduler):
+        """Test that exclusive=False does not exempt a matching command"""
+        with scheduler.turn(100, "apt update"):
+            with pytest.raises(QueueTimeout):
+                with scheduler.turn(
+                    100, "apt install git", exclusive=False, timeout=0.05
+                ):
+                    pass
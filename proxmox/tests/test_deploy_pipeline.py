@@ -0,0 +1,182 @@
+"""
+Tests for the dependency-ordered deploy Pipeline
+"""
+
+import threading
+from datetime import datetime
+
+import pytest
+from container_console_service import CommandResult
+from deploy_pipeline import (
+    FAILED,
+    SKIPPED,
+    SUCCEEDED,
+    Pipeline,
+    PipelineError,
+    PipelineStep,
+)
+
+
+class FakeManager:
+    """Stands in for ContainerConsoleManager.execute_command
+
+    ``exit_codes`` maps commands to their exit code (default 0); every call
+    is recorded with the ``on_spawn`` callback it received.
+    """
+
+    def __init__(self, exit_codes=None, hooks=None):
+        self.exit_codes = exit_codes or {}
+        self.hooks = hooks or {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def execute_command(
+        self, container_id, command, timeout=30, on_output=None, on_spawn=None
+    ):
+        with self.lock:
+            self.calls.append((command, on_spawn))
+        if command in self.hooks:
+            self.hooks[command]()
+        if on_output is not None:
+            on_output("stdout", f"ran {command}\n")
+        return CommandResult(
+            command=command,
+            output=f"ran {command}\n",
+            error="",
+            exit_code=self.exit_codes.get(command, 0),
+            execution_time=0.0,
+            timestamp=datetime.now(),
+            container_id=container_id,
+        )
+
+    @property
+    def commands(self):
+        return [command for command, _ in self.calls]
+
+
+def step(name, depends_on=(), probe=None):
+    """Build a step whose command is ``run-<name>``"""
+    return PipelineStep(name, f"run-{name}", tuple(depends_on), probe)
+
+
+class TestPipelineDefinition:
+    """Test cases for validating pipeline definitions"""
+
+    def test_duplicate_names(self):
+        """Test that step names must be unique"""
+        with pytest.raises(PipelineError, match="unique"):
+            Pipeline([step("a"), step("a")])
+
+    def test_unknown_dependency(self):
+        """Test that dependencies must name existing steps"""
+        with pytest.raises(PipelineError, match="unknown step"):
+            Pipeline([step("a", ["missing"])])
+
+    def test_cycle(self):
+        """Test that dependency cycles are rejected"""
+        with pytest.raises(PipelineError, match="cycle"):
+            Pipeline([step("a", ["b"]), step("b", ["a"])])
+
+    def test_topological_order(self):
+        """Test that every step comes after its dependencies"""
+        pipeline = Pipeline([step("c", ["b"]), step("b", ["a"]), step("a")])
+
+        assert [s.name for s in pipeline.order] == ["a", "b", "c"]
+        assert pipeline["b"].depends_on == ("a",)
+
+
+class TestPipelineRun:
+    """Test cases for Pipeline.run()"""
+
+    def test_runs_in_dependency_order(self):
+        """Test that a step starts only after its dependencies finished"""
+        manager = FakeManager()
+        pipeline = Pipeline(
+            [step("app", ["docker", "repo"]), step("docker"), step("repo")]
+        )
+
+        statuses = pipeline.run(manager, 100)
+
+        assert statuses == {"docker": SUCCEEDED, "repo": SUCCEEDED, "app": SUCCEEDED}
+        assert manager.commands[-1] == "run-app"
+
+    def test_independent_steps_run_in_parallel(self):
+        """Test that steps without dependencies between them overlap"""
+        barrier = threading.Barrier(2, timeout=5)
+        manager = FakeManager(hooks={"run-a": barrier.wait, "run-b": barrier.wait})
+
+        statuses = Pipeline([step("a"), step("b")]).run(manager, 100, max_parallel=2)
+
+        assert statuses == {"a": SUCCEEDED, "b": SUCCEEDED}
+
+    def test_probe_skips_step(self):
+        """Test that a passing probe skips the step's command"""
+        manager = FakeManager(exit_codes={"check-b": 1})
+        pipeline = Pipeline(
+            [step("a", probe="check-a"), step("b", ["a"], probe="check-b")]
+        )
+
+        statuses = pipeline.run(manager, 100)
+
+        assert statuses == {"a": SKIPPED, "b": SUCCEEDED}
+        assert "run-a" not in manager.commands
+        assert "run-b" in manager.commands
+
+    def test_failure_stops_dependents(self):
+        """Test that steps depending on a failed one never run"""
+        manager = FakeManager(exit_codes={"run-a": 1})
+        pipeline = Pipeline([step("a"), step("b", ["a"])])
+
+        statuses = pipeline.run(manager, 100)
+
+        assert statuses == {"a": FAILED}
+        assert "run-b" not in manager.commands
+
+    def test_completed_steps_are_not_rerun(self):
+        """Test resuming with steps already completed"""
+        manager = FakeManager()
+        pipeline = Pipeline([step("a"), step("b", ["a"])])
+
+        statuses = pipeline.run(manager, 100, completed=["a"])
+
+        assert statuses == {"b": SUCCEEDED}
+        assert manager.commands == ["run-b"]
+
+    def test_should_stop(self):
+        """Test that no new steps start once should_stop() is true"""
+        manager = FakeManager()
+        pipeline = Pipeline([step("a"), step("b", ["a"])])
+        finished = []
+
+        statuses = pipeline.run(
+            manager,
+            100,
+            on_finished=lambda s, status, result: finished.append(s.name),
+            should_stop=lambda: bool(finished),
+        )
+
+        assert statuses == {"a": SUCCEEDED}
+
+    def test_callbacks_and_on_spawn(self):
+        """Test the step hooks, and that probes receive on_spawn too"""
+        manager = FakeManager(exit_codes={"check-a": 1})
+        events = []
+
+        def on_spawn(process):
+            pass
+
+        Pipeline([step("a", probe="check-a")]).run(
+            manager,
+            100,
+            on_started=lambda s: events.append(("started", s.name)),
+            on_finished=lambda s, status, result: events.append((status, s.name)),
+            on_output=lambda s, stream, text: events.append((stream, text)),
+            on_spawn=on_spawn,
+        )
+
+        assert events == [
+            ("started", "a"),
+            ("stdout", "ran run-a\n"),
+            (SUCCEEDED, "a"),
+        ]
+        assert manager.calls == [("check-a", on_spawn), ("run-a", on_spawn)]
@@ -0,0 +1,91 @@
+"""
+Tests for staged file downloads
+"""
+
+import hashlib
+import os
+from contextlib import nullcontext
+
+import pytest
+from file_transfer import FileTransferManager
+
+
+class FakeManager:
+    """Stands in for ContainerConsoleManager.command_slot"""
+
+    def command_slot(self, max_wait=None):
+        return nullcontext()
+
+
+class TestStageDownload:
+    """Test cases for FileTransferManager.stage_download"""
+
+    @pytest.fixture
+    def transfers(self, tmp_path, monkeypatch):
+        """Transfer manager whose ``pct pull`` copies from ``contents``"""
+        manager = FileTransferManager(FakeManager(), str(tmp_path))
+        manager.contents = {"/etc/hostname": b"first\n"}
+        manager.pulls = 0
+
+        def pct(action, container_id, path, staged, max_wait=None):
+            assert action == "pull"
+            manager.pulls += 1
+            with open(staged, "wb") as f:
+                f.write(manager.contents[path])
+
+        monkeypatch.setattr(manager, "_pct", pct)
+        return manager
+
+    def test_returns_open_copy(self, transfers):
+        """Test that the staged copy is returned open with its checksum"""
+        f, sha256, size = transfers.stage_download(100, "/etc/hostname")
+        with f:
+            assert f.read() == b"first\n"
+
+        assert sha256 == hashlib.sha256(b"first\n").hexdigest()
+        assert size == 6
+
+    def test_open_copy_survives_restage(self, transfers):
+        """Test that a response keeps reading its copy after a re-stage"""
+        first, _, _ = transfers.stage_download(100, "/etc/hostname")
+        transfers.contents["/etc/hostname"] = b"second\n"
+
+        second, _, _ = transfers.stage_download(100, "/etc/hostname")
+        with first, second:
+            assert not os.path.exists(first.name)
+            assert first.read() == b"first\n"
+            assert second.read() == b"second\n"
+
+    def test_if_range_reuses_copy(self, transfers):
+        """Test that a matching If-Range is served from the staged copy"""
+        f, sha256, _ = transfers.stage_download(100, "/etc/hostname")
+        f.close()
+        transfers.contents["/etc/hostname"] = b"changed\n"
+
+        f, reused, _ = transfers.stage_download(100, "/etc/hostname", if_range=sha256)
+        with f:
+            assert f.read() == b"first\n"
+        assert reused == sha256
+        assert transfers.pulls == 1
+
+    def test_missing_copy_is_pulled_again(self, transfers):
+        """Test that a staged copy deleted from disk is pulled again"""
+        f, sha256, _ = transfers.stage_download(100, "/etc/hostname")
+        f.close()
+        os.remove(f.name)
+
+        f, again, _ = transfers.stage_download(100, "/etc/hostname", if_range=sha256)
+        with f:
+            assert f.read() == b"first\n"
+        assert again == sha256
+        assert transfers.pulls == 2
+
+    def test_expired_copy_is_deleted(self, transfers):
+        """Test that expiry removes staged copies but not open readers"""
+        transfers.ttl = 0
+        f, _, _ = transfers.stage_download(100, "/etc/hostname")
+        transfers.expire()
+
+        with f:
+            assert not os.path.exists(f.name)
+            assert f.read() == b"first\n"
@@ -0,0 +1,145 @@
+"""
+Tests for fleet rollouts on the shared job queue
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fleet_rollout import ABORTED, CANCELLED, FAILED, SUCCEEDED, FleetRollout
+from job_queue import JobQueue, JobQueueFull
+from librechat_deployment import SUCCEEDED as DEPLOYMENT_SUCCEEDED
+
+
+class FakeManager:
+    """Running containers 100-103 whose health checks pass"""
+
+    def list_containers(self):
+        return [{"id": cid, "status": "running"} for cid in range(100, 104)]
+
+    def get_container_tags(self, container_id):
+        return ["librechat"]
+
+    def execute_command(self, container_id, command, timeout=None, on_spawn=None):
+        return SimpleNamespace(exit_code=0)
+
+
+class FakeDeployer:
+    """Deployer that records how many deployments run at once"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def prepare(self, container_id, resume=True, **extra):
+        return {"deployment_id": f"deploy-{container_id}"}, True
+
+    def run(self, deployment_id, job):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        job.append_output("stdout", f"deploying {deployment_id}\n")
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        container_id = int(deployment_id.split("-")[1])
+        if container_id in self.failing:
+            job.error = "install failed"
+            return {"status": FAILED}
+        return {"status": DEPLOYMENT_SUCCEEDED}
+
+
+def wait_for(job_queue, job_id, timeout=10):
+    """Wait until a job finishes"""
+    assert job_queue.get(job_id).wait(timeout)
+
+
+class TestFleetRollout:
+    """Test cases for FleetRollout"""
+
+    @pytest.fixture
+    def job_queue(self):
+        """Job queue with three workers"""
+        job_queue = JobQueue(max_workers=3)
+        yield job_queue
+        job_queue.shutdown(cancel_pending=True, timeout=5)
+
+    def test_deployments_are_queue_jobs(self, job_queue):
+        """Test that each container is deployed as a job on the shared queue"""
+        rollouts = FleetRollout(FakeManager(), job_queue, FakeDeployer())
+        rollout = rollouts.start(container_ids=[100, 101, 102], batch_size=2)
+        wait_for(job_queue, rollout["job_id"])
+
+        rollout = rollouts.get(rollout["rollout_id"])
+        assert rollout["status"] == SUCCEEDED
+        children = [
+            job
+            for job in job_queue.list_jobs()
+            if job.description.startswith("deploy-librechat")
+        ]
+        assert sorted(job.container_id for job in children) == [100, 101, 102]
+        output = job_queue.get(rollout["job_id"]).read_output()["output"]
+        assert "[CT 101] deploying deploy-101" in output
+
+    def test_deployments_share_worker_limit(self):
+        """Test that a batch cannot run more deployments than free workers"""
+        job_queue = JobQueue(max_workers=2)
+        deployer = FakeDeployer()
+        rollouts = FleetRollout(FakeManager(), job_queue, deployer)
+        try:
+            rollout = rollouts.start(
+                container_ids=[100, 101, 102, 103], batch_size=4, canary_size=0
+            )
+            wait_for(job_queue, rollout["job_id"])
+        finally:
+            job_queue.shutdown(timeout=5)
+
+        assert rollouts.get(rollout["rollout_id"])["status"] == SUCCEEDED
+        assert deployer.peak == 1
+
+    def test_rollouts_leave_a_worker_free(self):
+        """Test that rollouts are refused once they would take every worker"""
+        job_queue = JobQueue(max_workers=1)
+        rollouts = FleetRollout(FakeManager(), job_queue, FakeDeployer())
+        try:
+            with pytest.raises(JobQueueFull):
+                rollouts.start(container_ids=[100])
+        finally:
+            job_queue.shutdown(timeout=5)
+
+        assert rollouts.list_rollouts() == []
+
+    def test_failed_canary_aborts(self, job_queue):
+        """Test that a failed canary stops the remaining containers"""
+        rollouts = FleetRollout(FakeManager(), job_queue, FakeDeployer(failing=[100]))
+        rollout = rollouts.start(container_ids=[100, 101, 102])
+        wait_for(job_queue, rollout["job_id"])
+
+        rollout = rollouts.get(rollout["rollout_id"])
+        assert rollout["status"] == FAILED
+        assert [target["status"] for target in rollout["containers"]] == [
+            FAILED,
+            ABORTED,
+            ABORTED,
+        ]
+        assert rollout["containers"][0]["error"] == "install failed"
+
+    def test_cancelled_before_start(self, job_queue):
+        """Test that a rollout cancelled while queued is marked cancelled"""
+        release = threading.Event()
+        for _ in range(3):
+            job_queue.submit(lambda job: release.wait(10))
+        rollouts = FleetRollout(FakeManager(), job_queue, FakeDeployer())
+        try:
+            rollout = rollouts.start(container_ids=[100, 101])
+            job_queue.cancel(rollout["job_id"])
+        finally:
+            release.set()
+
+        rollout = rollouts.get(rollout["rollout_id"])
+        assert rollout["status"] == CANCELLED
+        assert rollout["finished_at"] is not None
+        assert {target["status"] for target in rollout["containers"]} == {ABORTED}
@@ -0,0 +1,249 @@
+"""
+Tests for IdempotencyCache and Idempotency-Key handling in the API
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from idempotency import IdempotencyCache, IdempotencyConflict
+
+
+class Counter:
+    """Callable that counts its calls and can be held until released"""
+
+    def __init__(self, hold=None):
+        self.calls = 0
+        self.hold = hold
+
+    def __call__(self):
+        self.calls += 1
+        if self.hold is not None:
+            self.hold.wait(5)
+        return {"call": self.calls}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    """Cache kept per process, or shared through SQLite"""
+    if request.param == "memory":
+        return IdempotencyCache(ttl=60)
+    return IdempotencyCache(ttl=60, db_path=str(tmp_path / "idempotency.db"))
+
+
+class TestIdempotencyCache:
+    """Test cases for IdempotencyCache"""
+
+    def test_replays_result(self, cache):
+        """Test that a key runs once and later calls replay its result"""
+        function = Counter()
+
+        assert cache.run("key", "fp", function) == ({"call": 1}, False)
+        assert cache.run("key", "fp", function) == ({"call": 1}, True)
+        assert function.calls == 1
+
+    def test_conflicting_fingerprint(self, cache):
+        """Test that reusing a key for another request raises"""
+        cache.run("key", "fp", Counter())
+
+        with pytest.raises(IdempotencyConflict):
+            cache.run("key", "other", Counter())
+
+    def test_failures_are_not_cached(self, cache):
+        """Test that a request that raised can be retried with its key"""
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            cache.run("key", "fp", fail)
+        assert cache.run("key", "fp", Counter()) == ({"call": 1}, False)
+
+    def test_concurrent_retries_join(self, cache):
+        """Test that retries arriving mid-run wait for and share the result"""
+        release = threading.Event()
+        function = Counter(hold=release)
+        results = []
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.run("key", "fp", function))
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert function.calls == 1
+        assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+    def test_entries_expire(self, cache):
+        """Test that a key can run again after ttl"""
+        cache.ttl = 0.05
+        function = Counter()
+        cache.run("key", "fp", function)
+        time.sleep(0.1)
+
+        assert cache.run("key", "fp", function) == ({"call": 2}, False)
+
+    def test_oldest_entries_evicted(self):
+        """Test that completed entries beyond max_entries are dropped"""
+        cache = IdempotencyCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.run(key, "fp", Counter())
+
+        assert len(cache) == 2
+        assert cache.run("a", "fp", Counter())[1] is False
+
+
+class TestSharedIdempotencyCache:
+    """Test cases for keys shared between worker processes through SQLite"""
+
+    def test_other_worker_replays(self, tmp_path):
+        """Test that a second cache on the same database replays the result"""
+        path = str(tmp_path / "idempotency.db")
+        first = IdempotencyCache(db_path=path)
+        second = IdempotencyCache(db_path=path)
+
+        first.run("key", "fp", Counter())
+        function = Counter()
+
+        assert second.run("key", "fp", function) == ({"call": 1}, True)
+        assert function.calls == 0
+        with pytest.raises(IdempotencyConflict):
+            second.run("key", "other", Counter())
+
+    def test_waits_for_running_worker(self, tmp_path):
+        """Test that a retry waits for another worker's run to finish"""
+        path = str(tmp_path / "idempotency.db")
+        first = IdempotencyCache(db_path=path)
+        second = IdempotencyCache(db_path=path)
+        release = threading.Event()
+        owner = threading.Thread(
+            target=first.run, args=("key", "fp", Counter(hold=release))
+        )
+        owner.start()
+        time.sleep(0.1)
+
+        threading.Timer(0.3, release.set).start()
+        function = Counter()
+        assert second.run("key", "fp", function) == ({"call": 1}, True)
+        assert function.calls == 0
+        owner.join()
+
+    def test_dead_owner_is_taken_over(self, tmp_path):
+        """Test that a key left running by a dead worker is run again"""
+        path = str(tmp_path / "idempotency.db")
+        cache = IdempotencyCache(db_path=path)
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "INSERT INTO idempotency_keys (key, fingerprint, owner_pid) "
+            "VALUES ('key', 'fp', 12345)"
+        )
+        conn.commit()
+        conn.close()
+
+        with patch("idempotency._process_alive", return_value=False):
+            assert cache.run("key", "fp", Counter()) == ({"call": 1}, False)
+
+    def test_from_env_uses_state_dir(self, tmp_path, monkeypatch):
+        """Test that keys are stored under CONTAINER_CONSOLE_STATE_DIR"""
+        monkeypatch.setenv("CONTAINER_CONSOLE_STATE_DIR", str(tmp_path))
+
+        cache = IdempotencyCache.from_env()
+        assert cache.db_path == str(tmp_path / "idempotency.db")
+
+    def test_closed_cache_runs_locally(self, tmp_path):
+        """Test that a closed cache still runs and caches in memory"""
+        cache = IdempotencyCache(db_path=str(tmp_path / "idempotency.db"))
+        cache.close()
+
+        function = Counter()
+        assert cache.run("key", "fp", function) == ({"call": 1}, False)
+        assert cache.run("key", "fp", function) == ({"call": 1}, True)
+
+
+class TestIdempotentExecute:
+    """Test cases for Idempotency-Key on /containers/<id>/execute"""
+
+    @pytest.fixture
+    def client(self, console_api, monkeypatch):
+        """API client whose commands are counted instead of run"""
+        monkeypatch.setattr(console_api, "_idempotency_cache", IdempotencyCache(ttl=60))
+        manager = console_api.get_console_manager()
+        calls = []
+
+        def execute_command(container_id, command, timeout, **kwargs):
+            calls.append(command)
+            return _FakeResult(command, len(calls))
+
+        monkeypatch.setattr(manager, "execute_command", execute_command)
+        test_client = console_api.app.test_client()
+        test_client.calls = calls
+        return test_client
+
+    def test_cache_created_on_first_use(self, console_api, monkeypatch):
+        """Test that the cache is built lazily, under the state directory"""
+        monkeypatch.setattr(console_api, "_idempotency_cache", None)
+
+        cache = console_api.get_idempotency_cache()
+        try:
+            assert console_api.get_idempotency_cache() is cache
+            state_dir = os.environ["CONTAINER_CONSOLE_STATE_DIR"]
+            assert cache.db_path == os.path.join(state_dir, "idempotency.db")
+        finally:
+            cache.close()
+
+    def test_retry_is_replayed(self, client):
+        """Test that a retry with the same key does not run the command again"""
+        headers = {"Idempotency-Key": "abc"}
+        body = {"command": "usermod -aG docker app"}
+
+        first = client.post("/containers/100/execute", json=body, headers=headers)
+        second = client.post("/containers/100/execute", json=body, headers=headers)
+
+        assert first.status_code == second.status_code == 200
+        assert "Idempotent-Replayed" not in first.headers
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert second.get_json()["result"] == first.get_json()["result"]
+        assert client.calls == ["usermod -aG docker app"]
+
+    def test_changed_options_conflict(self, client):
+        """Test that reusing a key with different options returns 422"""
+        headers = {"Idempotency-Key": "abc"}
+        client.post("/containers/100/execute", json={"command": "ls"}, headers=headers)
+
+        response = client.post(
+            "/containers/100/execute",
+            json={"command": "ls", "priority": 5},
+            headers=headers,
+        )
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize("body", [{"timeout": "soon"}, {"priority": "high"}])
+    def test_bad_options_rejected(self, client, body):
+        """Test that non-numeric timeout or priority returns 400"""
+        response = client.post(
+            "/containers/100/execute", json={"command": "ls", **body}
+        )
+
+        assert response.status_code == 400
+        assert client.calls == []
+
+
+class _FakeResult:
+    """Minimal CommandResult stand-in for API tests"""
+
+    def __init__(self, command, number):
+        self.command = command
+        self.number = number
+
+    def to_dict(self):
+        return {"command": self.command, "run": self.number}
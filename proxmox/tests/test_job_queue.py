@@ -0,0 +1,202 @@
+"""
+Tests for JobQueue and Job output capture
+"""
+
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from container_console_service import CommandResult
+from job_queue import (
+    CANCELLED,
+    FAILED,
+    QUEUED,
+    SUCCEEDED,
+    Job,
+    JobQueue,
+    JobQueueFull,
+)
+
+
+def wait_for(predicate, timeout=5.0):
+    """Poll until ``predicate()`` is true or fail after ``timeout`` seconds"""
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+class TestJobOutput:
+    """Test cases for Job output buffering"""
+
+    def test_read_from_offset(self):
+        """Test reading output from an absolute offset with a limit"""
+        job = Job(job_id="j", target=lambda job: None)
+        for chunk in ("abc", "def", "ghi"):
+            job.append_output("stdout", chunk)
+
+        page = job.read_output(2, limit=5)
+        assert page["output"] == "cdefg"
+        assert page["next_offset"] == 7
+        assert page["truncated"] is False
+        assert job.read_output(page["next_offset"])["output"] == "hi"
+
+    def test_oldest_output_is_dropped(self):
+        """Test that output beyond max_output_chars drops the oldest text"""
+        job = Job(job_id="j", target=lambda job: None, max_output_chars=10)
+        for chunk in ("abc", "defg", "hijkl", "mnopqrst"):
+            job.append_output("stdout", chunk)
+
+        page = job.read_output(0)
+        assert page["output"] == "klmnopqrst"
+        assert page["offset"] == 10
+        assert page["truncated"] is True
+        assert job.output_end == 20
+
+    def test_single_chunk_larger_than_limit(self):
+        """Test that one oversized chunk keeps only its tail"""
+        job = Job(job_id="j", target=lambda job: None, max_output_chars=4)
+        job.append_output("stdout", "0123456789")
+
+        assert job.read_output(0)["output"] == "6789"
+
+    def test_to_dict_omits_command_output(self):
+        """Test that job records give output lengths, not the output itself"""
+        job = Job(job_id="j", target=lambda job: None)
+        job.result = CommandResult(
+            command="make",
+            output="x" * 5000,
+            error="warning\n",
+            exit_code=0,
+            execution_time=1.0,
+            timestamp=datetime.now(),
+            container_id=100,
+        )
+
+        result = job.to_dict()["result"]
+        assert "output" not in result and "error" not in result
+        assert (result["output_length"], result["error_length"]) == (5000, 8)
+        assert result["exit_code"] == 0
+
+
+class TestJobQueue:
+    """Test cases for JobQueue"""
+
+    @pytest.fixture
+    def job_queue(self):
+        """Single-worker queue, shut down after the test"""
+        jobs = JobQueue(max_workers=1, max_queued=3)
+        yield jobs
+        jobs.shutdown(cancel_pending=True, timeout=5)
+
+    @pytest.fixture
+    def blocker(self, job_queue):
+        """Occupy the only worker until the returned event is set"""
+        release = threading.Event()
+        job, _ = job_queue.submit(lambda job: release.wait(5))
+        wait_for(lambda: job.started_at is not None)
+        yield release
+        release.set()
+
+    def test_job_succeeds(self, job_queue):
+        """Test that a job's return value becomes its result"""
+        job, created = job_queue.submit(lambda job: 42)
+        wait_for(lambda: job.status == SUCCEEDED)
+
+        assert created is True
+        assert job.result == 42
+        assert job.to_dict()["status"] == SUCCEEDED
+
+    def test_job_exception_fails(self, job_queue):
+        """Test that an exception marks the job failed with its message"""
+        job, _ = job_queue.submit(lambda job: 1 / 0)
+        wait_for(lambda: job.status == FAILED)
+
+        assert "division by zero" in job.error
+
+    def test_higher_priority_runs_first(self, job_queue, blocker):
+        """Test that queued jobs start in priority order, FIFO within one"""
+        order = []
+        for name, priority in (("low", 0), ("high", 10), ("low2", 0)):
+            job_queue.submit(lambda job, n=name: order.append(n), priority=priority)
+        blocker.set()
+
+        wait_for(lambda: len(order) == 3)
+        assert order == ["high", "low", "low2"]
+
+    def test_idempotency_key_returns_existing_job(self, job_queue, blocker):
+        """Test that resubmitting with the same key does not queue again"""
+        first, created = job_queue.submit(lambda job: 1, idempotency_key="k")
+        second, created_again = job_queue.submit(lambda job: 2, idempotency_key="k")
+
+        assert created is True
+        assert created_again is False
+        assert second is first
+
+    def test_queue_full(self, job_queue, blocker):
+        """Test that submission fails once max_queued jobs are waiting"""
+        for _ in range(3):
+            job_queue.submit(lambda job: None)
+
+        with pytest.raises(JobQueueFull):
+            job_queue.submit(lambda job: None)
+
+    def test_cancel_queued_job(self, job_queue, blocker):
+        """Test that a cancelled queued job never runs"""
+        ran = []
+        job, _ = job_queue.submit(lambda job: ran.append(True))
+        assert job.status == QUEUED
+
+        job_queue.cancel(job.job_id)
+        blocker.set()
+        time.sleep(0.1)
+
+        assert job.status == CANCELLED
+        assert ran == []
+
+    def test_cancel_running_job_kills_process(self, job_queue):
+        """Test that cancelling a running job terminates its process group"""
+        processes = []
+
+        def target(job):
+            process = subprocess.Popen(["sleep", "30"], start_new_session=True)
+            processes.append(process)
+            job.attach_process(process)
+            process.wait()
+
+        job, _ = job_queue.submit(target)
+        wait_for(lambda: processes)
+        job_queue.cancel(job.job_id)
+        wait_for(lambda: job.status == CANCELLED)
+
+        assert processes[0].returncode is not None
+
+    def test_list_and_counts(self, job_queue):
+        """Test listing jobs by container and counting them by status"""
+        job, _ = job_queue.submit(lambda job: None, container_id=100)
+        job_queue.submit(lambda job: None, container_id=101)
+        wait_for(lambda: job_queue.counts() == {SUCCEEDED: 2})
+
+        assert job_queue.list_jobs(container_id=100) == [job]
+
+    def test_finished_jobs_expire(self):
+        """Test that finished jobs are forgotten after job_ttl"""
+        jobs = JobQueue(max_workers=1, job_ttl=0)
+        job, _ = jobs.submit(lambda job: None, idempotency_key="k")
+        wait_for(lambda: job.finished_at is not None)
+        time.sleep(0.01)
+
+        assert jobs.get(job.job_id) is None
+        assert jobs.submit(lambda job: None, idempotency_key="k")[1] is True
+        jobs.shutdown(timeout=5)
+
+    def test_shutdown_rejects_new_jobs(self):
+        """Test that a shut-down queue refuses work"""
+        jobs = JobQueue(max_workers=1)
+        assert jobs.shutdown(timeout=5) is True
+
+        with pytest.raises(RuntimeError):
+            jobs.submit(lambda job: None)
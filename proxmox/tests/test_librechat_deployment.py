@@ -0,0 +1,89 @@
+"""
+Tests for resuming LibreChat deployments
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from librechat_deployment import (
+    FAILED,
+    PENDING,
+    SUCCEEDED,
+    DeploymentConflict,
+    LibreChatDeployer,
+)
+
+
+class FakeJobQueue:
+    """Records submitted deployments without running them"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, target, description="", container_id=None, **kwargs):
+        self.submitted.append(description)
+        return SimpleNamespace(job_id=f"job-{len(self.submitted)}"), True
+
+
+class TestLibreChatDeployer:
+    """Test cases for LibreChatDeployer.resume"""
+
+    @pytest.fixture
+    def deployer(self):
+        """Deployer keeping its records in memory"""
+        return LibreChatDeployer(None, FakeJobQueue())
+
+    def finish(self, deployer, container_id, status):
+        """Create a deployment for the container that ended with ``status``"""
+        record, started = deployer.prepare(container_id, resume=False)
+        assert started
+        deployer._deployments[record["deployment_id"]]["status"] = status
+        return record["deployment_id"]
+
+    def test_resume_latest_failed(self, deployer):
+        """Test that the requested deployment itself is resumed"""
+        deployment_id = self.finish(deployer, 100, FAILED)
+
+        record = deployer.resume(deployment_id)
+
+        assert record["deployment_id"] == deployment_id
+        assert record["status"] == PENDING
+        assert record["resumed_count"] == 1
+        assert record["job_id"] == "job-1"
+        assert deployer.job_queue.submitted == [f"deploy-librechat {deployment_id}"]
+
+    def test_resume_unknown(self, deployer):
+        """Test that an unknown deployment is reported as missing"""
+        assert deployer.resume("missing") is None
+
+    def test_resume_succeeded_conflicts(self, deployer):
+        """Test that a succeeded deployment is not redeployed"""
+        deployment_id = self.finish(deployer, 100, SUCCEEDED)
+
+        with pytest.raises(DeploymentConflict, match="succeeded"):
+            deployer.resume(deployment_id)
+        assert deployer.job_queue.submitted == []
+        assert len(deployer.list_deployments(100)) == 1
+
+    def test_resume_superseded_conflicts(self, deployer):
+        """Test that only the latest deployment of a container is resumable"""
+        older = self.finish(deployer, 100, FAILED)
+        deployer._deployments[older]["created_at"] = "2000-01-01T00:00:00"
+        newer = self.finish(deployer, 100, FAILED)
+
+        with pytest.raises(DeploymentConflict, match="superseded"):
+            deployer.resume(older)
+        assert deployer.get(older)["status"] == FAILED
+        assert deployer.resume(newer)["deployment_id"] == newer
+
+    def test_resume_endpoint_conflict(self, console_api, deployer, monkeypatch):
+        """Test that the resume endpoint answers 409 for a finished deployment"""
+        monkeypatch.setattr(console_api, "get_deployer", lambda: deployer)
+        deployment_id = self.finish(deployer, 100, SUCCEEDED)
+        client = console_api.app.test_client()
+
+        response = client.post(f"/deployments/{deployment_id}/resume")
+
+        assert response.status_code == 409
+        assert response.get_json()["success"] is False
+        assert client.post("/deployments/missing/resume").status_code == 404
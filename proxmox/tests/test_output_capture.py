@@ -0,0 +1,94 @@
+"""
+Tests for capturing command output in the container console service
+"""
+
+import subprocess
+import sys
+from dataclasses import replace
+from datetime import datetime
+
+import container_console_service
+import pytest
+from container_console_service import (
+    TRUNCATED_MARKER,
+    CommandResult,
+    OutputTail,
+    _collect_output,
+)
+
+
+def run(script, on_output=None):
+    """Run a Python snippet and collect its output like a container command"""
+    process = subprocess.Popen(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    return _collect_output(process, 10, on_output)
+
+
+class TestOutputTail:
+    """Test cases for OutputTail"""
+
+    def test_unbounded(self):
+        """Test that without a limit all output is kept"""
+        tail = OutputTail()
+        for chunk in ("abc", "def"):
+            tail.append(chunk)
+
+        assert tail.text() == "abcdef"
+        assert not tail.truncated
+
+    def test_keeps_last_chars(self):
+        """Test that only the last ``limit`` characters are kept"""
+        tail = OutputTail(limit=4)
+        for chunk in ("abc", "def", "g"):
+            tail.append(chunk)
+
+        assert tail.truncated
+        assert tail.text() == TRUNCATED_MARKER + "defg"
+
+
+class TestCollectOutput:
+    """Test cases for _collect_output"""
+
+    @pytest.fixture
+    def small_tail(self, monkeypatch):
+        """Keep only 10 characters of streamed output"""
+        monkeypatch.setattr(container_console_service, "STREAMED_OUTPUT_TAIL_CHARS", 10)
+
+    def test_buffered_output_is_complete(self, small_tail):
+        """Test that output that is not streamed is returned in full"""
+        stdout, stderr, usage = run("print('x' * 100, end='')")
+
+        assert stdout == "x" * 100
+        assert stderr == ""
+        assert usage is not None
+
+    def test_streamed_output_keeps_tail(self, small_tail):
+        """Test that streamed output is delivered in full but only a tail kept"""
+        chunks = []
+        stdout, _, _ = run(
+            "print('x' * 100 + '0123456789', end='')",
+            lambda stream, text: chunks.append(text),
+        )
+
+        assert "".join(chunks) == "x" * 100 + "0123456789"
+        assert stdout == TRUNCATED_MARKER + "0123456789"
+
+    def test_truncated_result(self):
+        """Test that a result reports truncated streamed output"""
+        result = CommandResult(
+            command="yes | head",
+            output=TRUNCATED_MARKER + "y\n",
+            error="",
+            exit_code=0,
+            execution_time=0.1,
+            timestamp=datetime.now(),
+            container_id=100,
+        )
+
+        assert result.truncated
+        assert result.to_dict()["truncated"] is True
+        assert not replace(result, output="y\n").truncated
@@ -0,0 +1,222 @@
+"""
+Tests for QueryCache and cached read-only commands
+"""
+
+import time
+from datetime import datetime
+
+import pytest
+from container_console_service import CommandResult, ContainerConsoleManager
+from container_scheduler import ContainerScheduler
+from query_cache import QueryCache, looks_read_only
+
+
+def make_result(command="uptime", container_id=100, exit_code=0, **kwargs):
+    """Build a CommandResult with sensible defaults"""
+    return CommandResult(
+        command=command,
+        output="up 3 days",
+        error="",
+        exit_code=exit_code,
+        execution_time=0.1,
+        timestamp=datetime.now(),
+        container_id=container_id,
+        **kwargs,
+    )
+
+
+def store(cache, command="uptime", container_id=100, **kwargs):
+    """Put a result the way the manager does, with a fresh generation"""
+    result = make_result(command, container_id, **kwargs)
+    cache.put(container_id, command, result, cache.generation(container_id))
+    return result
+
+
+class TestQueryCache:
+    """Test cases for QueryCache"""
+
+    def test_hit_and_miss(self):
+        """Test that stored results are returned and counted"""
+        cache = QueryCache(ttl=60)
+        result = store(cache)
+
+        assert cache.get(100, " uptime ") is result
+        assert cache.get(101, "uptime") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_entries_expire(self):
+        """Test that results are dropped after ttl"""
+        cache = QueryCache(ttl=0.05)
+        store(cache)
+        time.sleep(0.1)
+
+        assert cache.get(100, "uptime") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry goes first"""
+        cache = QueryCache(ttl=60, max_entries=2)
+        store(cache, "uptime")
+        store(cache, "df -h")
+        cache.get(100, "uptime")
+        store(cache, "free -h")
+
+        assert cache.get(100, "df -h") is None
+        assert cache.get(100, "uptime") is not None
+        assert cache.get(100, "free -h") is not None
+
+    @pytest.mark.parametrize(
+        "kwargs", [{"exit_code": -1}, {"timed_out": True}], ids=["failed", "timeout"]
+    )
+    def test_failed_runs_not_stored(self, kwargs):
+        """Test that timeouts and failures to run are not cached"""
+        cache = QueryCache(ttl=60)
+        store(cache, **kwargs)
+
+        assert len(cache) == 0
+
+    def test_invalidate_container(self):
+        """Test that invalidating one container leaves the others"""
+        cache = QueryCache(ttl=60)
+        store(cache, container_id=100)
+        store(cache, container_id=101)
+        cache.invalidate(100)
+
+        assert cache.get(100, "uptime") is None
+        assert cache.get(101, "uptime") is not None
+
+    def test_read_overlapping_a_change_is_dropped(self):
+        """Test that a result read before an invalidation is not stored"""
+        cache = QueryCache(ttl=60)
+        generation = cache.generation(100)
+        cache.invalidate(100)
+        cache.put(100, "uptime", make_result(), generation)
+
+        assert cache.get(100, "uptime") is None
+
+    def test_full_invalidation_bumps_every_generation(self):
+        """Test that invalidate() with no container drops everything"""
+        cache = QueryCache(ttl=60)
+        store(cache, container_id=100)
+        generation = cache.generation(101)
+        cache.invalidate()
+        cache.put(101, "uptime", make_result(container_id=101), generation)
+
+        assert len(cache) == 0
+
+    def test_read_only_commands(self, monkeypatch):
+        """Test the default, registered and configured read-only commands"""
+        monkeypatch.setenv("CONTAINER_CONSOLE_READ_ONLY_COMMANDS", "ls /opt; id")
+        cache = QueryCache.from_env()
+        cache.register("docker images")
+
+        assert cache.is_read_only("uptime")
+        assert cache.is_read_only("id")
+        assert cache.is_read_only(" docker images ")
+        assert not cache.is_read_only("apt-get install -y curl")
+
+    @pytest.mark.parametrize(
+        "command",
+        [
+            "ls /opt",
+            "docker ps | grep librechat",
+            "/bin/cat /etc/hosts && df -h",
+            "systemctl status nginx",
+            "grep -c 'a;b' /etc/hosts",
+        ],
+    )
+    def test_looks_read_only(self, command):
+        """Test commands a client may flag read-only"""
+        assert looks_read_only(command)
+
+    @pytest.mark.parametrize(
+        "command",
+        [
+            "rm -rf /tmp/x",
+            "cat /etc/hosts > /tmp/x",
+            "ls; rm -rf /tmp/x",
+            "cat $(rm -rf /tmp/x)",
+            "cat `rm -rf /tmp/x`",
+            "sleep 1 &",
+            "PATH=/tmp ls",
+            "docker rm librechat",
+            "systemctl restart nginx",
+            "hostname evil",
+            "cat 'unbalanced",
+        ],
+    )
+    def test_does_not_look_read_only(self, command):
+        """Test commands whose read-only flag is ignored"""
+        assert not looks_read_only(command)
+
+
+class TestCachedExecution:
+    """Test cases for the manager serving read-only commands from the cache"""
+
+    @pytest.fixture
+    def manager(self, monkeypatch):
+        """Manager whose container commands are counted instead of run"""
+        manager = ContainerConsoleManager(query_cache=QueryCache(ttl=60))
+        manager.runs = []
+
+        def run_in_container(container_id, command, timeout, on_output, on_spawn):
+            manager.runs.append(command)
+            return f"run {len(manager.runs)}", "", None, 0
+
+        monkeypatch.setattr(manager, "_run_in_container", run_in_container)
+        return manager
+
+    def test_read_only_command_is_cached(self, manager):
+        """Test that a repeated read-only command is served from the cache"""
+        first = manager.execute_command(100, "uptime")
+        second = manager.execute_command(100, "uptime")
+
+        assert manager.runs == ["uptime"]
+        assert second.cached is True
+        assert second.output == first.output
+
+    def test_mutating_command_invalidates(self, manager):
+        """Test that any other command drops the container's cached reads"""
+        manager.execute_command(100, "uptime")
+        manager.execute_command(100, "touch /tmp/x")
+        manager.execute_command(100, "uptime")
+
+        assert manager.runs == ["uptime", "touch /tmp/x", "uptime"]
+
+    def test_flagged_read_only(self, manager):
+        """Test caching a command the caller marks read_only"""
+        manager.execute_command(100, "ls /opt", read_only=True)
+        result = manager.execute_command(100, "ls /opt", read_only=True)
+
+        assert result.cached is True
+        assert manager.runs == ["ls /opt"]
+
+    def test_flag_ignored_for_mutating_command(self, manager):
+        """Test that a read_only flag cannot hide a change from the cache"""
+        manager.execute_command(100, "uptime")
+        manager.execute_command(100, "rm -rf /tmp/x", read_only=True)
+        manager.execute_command(100, "rm -rf /tmp/x", read_only=True)
+        manager.execute_command(100, "uptime")
+
+        assert manager.runs == ["uptime", "rm -rf /tmp/x", "rm -rf /tmp/x", "uptime"]
+
+    def test_exclusive_command_takes_its_turn(self, manager):
+        """Test that a flagged read of an exclusive command is not cached"""
+        manager.scheduler = ContainerScheduler()
+        command = "cat /etc/apt/sources.list"
+        turns = []
+        turn = manager.container_turn
+
+        def container_turn(*args, **kwargs):
+            turns.append(args[1])
+            return turn(*args, **kwargs)
+
+        manager.container_turn = container_turn
+        manager.execute_command(100, "uptime")
+        manager.execute_command(100, command, read_only=True)
+        result = manager.execute_command(100, "uptime")
+
+        assert turns == [command]
+        assert manager.runs == ["uptime", command]
+        # Still a read, so the container's cached results survive it
+        assert result.cached is True
@@ -0,0 +1,187 @@
+"""
+Tests for the API response helpers
+"""
+
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+from response_helpers import (
+    StateCache,
+    command_params,
+    compress_response,
+    conditional_json,
+    decode_cursor,
+    encode_cursor,
+    json_etag,
+    list_params,
+    paginate,
+    parse_fields,
+    select_fields,
+)
+
+
+@pytest.fixture
+def app():
+    """Bare Flask app providing request contexts"""
+    return Flask(__name__)
+
+
+class TestETags:
+    """Test cases for ETags and conditional responses"""
+
+    def test_json_etag_ignores_key_order(self):
+        """Test that equal values hash the same regardless of key order"""
+        assert json_etag({"a": 1, "b": 2}) == json_etag({"b": 2, "a": 1})
+        assert json_etag({"a": 1}) != json_etag({"a": 2})
+
+    def test_conditional_json_returns_304(self, app):
+        """Test that a matching If-None-Match gets an empty 304"""
+        payload = {"success": True, "containers": [1, 2]}
+        etag = json_etag(payload)
+
+        with app.test_request_context(headers={"If-None-Match": f'W/"{etag}"'}):
+            response = conditional_json(payload)
+        assert response.status_code == 304
+        assert response.get_data() == b""
+
+        with app.test_request_context(headers={"If-None-Match": '"stale"'}):
+            response = conditional_json(payload)
+        assert response.status_code == 200
+        assert response.get_json()["containers"] == [1, 2]
+        assert response.headers["ETag"] == f'W/"{etag}"'
+
+
+class TestStateCache:
+    """Test cases for StateCache"""
+
+    def test_reuses_value_until_expired(self):
+        """Test that the loader runs once per TTL"""
+        cache = StateCache(ttl=60)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"count": len(calls)}
+
+        first = cache.get("key", loader)
+        second = cache.get("key", loader)
+
+        assert first == second
+        assert first[1] == json_etag({"count": 1})
+        assert len(calls) == 1
+
+        cache.invalidate("key")
+        assert cache.get("key", loader)[0] == {"count": 2}
+
+    def test_zero_ttl_always_reloads(self):
+        """Test that a zero TTL disables caching"""
+        cache = StateCache(ttl=0)
+        values = iter(range(10))
+
+        assert cache.get("key", lambda: next(values))[0] == 0
+        assert cache.get("key", lambda: next(values))[0] == 1
+
+
+class TestFieldsAndPagination:
+    """Test cases for field selection and cursor pagination"""
+
+    ITEMS = [{"id": n, "name": f"ct{n}", "config": "..."} for n in range(1, 8)]
+
+    def test_parse_and_select_fields(self):
+        """Test ?fields= parsing and selection"""
+        fields = parse_fields(" id, name ,,")
+
+        assert fields == ["id", "name"]
+        assert select_fields(self.ITEMS[0], fields) == {"id": 1, "name": "ct1"}
+        assert select_fields(self.ITEMS[0], None) is self.ITEMS[0]
+        assert parse_fields("") is None
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to the encoded key"""
+        assert decode_cursor(encode_cursor([3, "x"])) == [3, "x"]
+        with pytest.raises(ValueError):
+            decode_cursor("not a cursor!")
+
+    def test_walk_all_pages(self):
+        """Test that following next cursors visits every item once"""
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate(
+                self.ITEMS, key=lambda item: item["id"], cursor=cursor, limit=3
+            )
+            seen.extend(item["id"] for item in page)
+            if cursor is None:
+                break
+
+        assert seen == list(range(1, 8))
+
+    def test_reverse_order(self):
+        """Test pagination over items sorted newest first"""
+        items = list(reversed(self.ITEMS))
+        page, cursor = paginate(items, key=lambda i: i["id"], limit=2, reverse=True)
+        following, _ = paginate(
+            items, key=lambda i: i["id"], cursor=cursor, limit=2, reverse=True
+        )
+
+        assert [i["id"] for i in page] == [7, 6]
+        assert [i["id"] for i in following] == [5, 4]
+
+    def test_mismatched_cursor(self):
+        """Test that a cursor of the wrong type is rejected"""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            paginate(self.ITEMS, key=lambda i: i["id"], cursor=encode_cursor("x"))
+
+    def test_list_params(self, app):
+        """Test reading fields, cursor and limit from the query string"""
+        with app.test_request_context("/?fields=id&limit=5&cursor=abc"):
+            assert list_params() == (["id"], "abc", 5)
+        with app.test_request_context("/?limit=0"):
+            with pytest.raises(ValueError):
+                list_params()
+
+
+class TestCommandParams:
+    """Test cases for command_params()"""
+
+    def test_defaults(self):
+        """Test the default timeout and priority"""
+        assert command_params({}, 30) == (30, 0)
+
+    def test_numeric_strings(self):
+        """Test that numeric strings are accepted"""
+        assert command_params({"timeout": "60", "priority": "5"}, 30) == (60, 5)
+
+    @pytest.mark.parametrize(
+        "data",
+        [{"timeout": "soon"}, {"priority": "high"}, {"timeout": None}, {"timeout": 0}],
+    )
+    def test_invalid_values(self, data):
+        """Test that bad values raise ValueError"""
+        with pytest.raises(ValueError):
+            command_params(data, 30)
+
+
+class TestCompression:
+    """Test cases for compress_response()"""
+
+    def test_gzip_large_json(self, app):
+        """Test that large JSON bodies are gzipped when accepted"""
+        payload = {"items": ["x" * 10] * 500}
+        with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            response = compress_response(jsonify(payload))
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.get_data())) == payload
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    def test_small_or_unaccepted_bodies_untouched(self, app):
+        """Test that small bodies and clients without gzip are left alone"""
+        with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            small = compress_response(jsonify({"ok": True}))
+        with app.test_request_context():
+            plain = compress_response(jsonify({"items": ["x" * 10] * 500}))
+
+        assert "Content-Encoding" not in small.headers
+        assert "Content-Encoding" not in plain.headers